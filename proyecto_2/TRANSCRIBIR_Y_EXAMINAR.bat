@@ -0,0 +1,16 @@
+@echo off
+chcp 65001 > nul
+echo ===================================================
+echo   TRANSCRIPCION + EXAMEN (WHISPER + OLLAMA)
+echo ===================================================
+echo.
+echo Las preguntas se generan a medida que se transcribe cada parte.
+echo.
+
+python "%~dp0pipeline.py" %*
+
+echo.
+echo ===================================================
+echo   Proceso terminado. Revisa la transcripcion y el HTML.
+echo ===================================================
+pause
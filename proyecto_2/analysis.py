@@ -1,5 +1,13 @@
 import geopandas as gpd
 import pandas as pd
+import numpy as np
+import shapely
+from functools import lru_cache
+
+# Resolución de los buffers dibujados: segmentos por cuarto de círculo
+# (8 = 32 vértices por círculo, suficiente para la vista a escala país).
+# El cálculo de impacto usa distancias exactas y no depende de este valor.
+BUFFER_QUAD_SEGS = 8
 
 def calculate_impact(minas_gdf, bdpi_gdf, radius_km):
     """
@@ -12,15 +20,16 @@ def calculate_impact(minas_gdf, bdpi_gdf, radius_km):
         
     Returns:
         dict: {
-            'minas_buffered': GeoDataFrame (polígonos de influencia en 4326),
             'impact_per_mine': DataFrame (estadísticas por mina),
             'global_stats': dict (estadísticas globales unicas),
-            'affected_localities': GeoDataFrame (localidades afectadas)
+            'affected_localities': GeoDataFrame (localidades afectadas),
+            'detailed_match': GeoDataFrame (cruce completo mina-localidad)
         }
+        Ya no incluye 'minas_buffered': la zona de influencia del mapa se obtiene
+        con dissolved_influence_zone.
     """
     if minas_gdf is None or bdpi_gdf is None or radius_km <= 0:
         return {
-            'minas_buffered': minas_gdf, # Return points if no buffer
             'impact_per_mine': pd.DataFrame(),
             'global_stats': {'total_locs': 0, 'total_pop': 0},
             'affected_localities': gpd.GeoDataFrame()
@@ -30,15 +39,11 @@ def calculate_impact(minas_gdf, bdpi_gdf, radius_km):
     minas_proj = minas_gdf.to_crs(epsg=32718)
     bdpi_proj = bdpi_gdf.to_crs(epsg=32718)
     
-    # 2. Generar buffers
-    # radius_km * 1000 para pasar a metros
-    buffers_proj = minas_proj.copy()
-    buffers_proj['geometry'] = buffers_proj.geometry.buffer(radius_km * 1000)
-    
-    # 3. Spatial Join
-    # Queremos saber qué localidades están dentro de qué buffer de mina.
+    # 2. Spatial Join por distancia exacta
+    # Queremos saber qué localidades están a menos de radius_km de qué mina.
+    # 'dwithin' compara distancias reales: no depende de la resolución del polígono buffer.
     # Join 'inner' para quedarnos solo con lo que cruza.
-    joined = gpd.sjoin(bdpi_proj, buffers_proj, how='inner', predicate='within')
+    joined = gpd.sjoin(bdpi_proj, minas_proj, how='inner', predicate='dwithin', distance=radius_km * 1000)
     
     # 4. Estadísticas por Mina
     # Agrupamos por identificador de mina (asumimos 'unidad_minera' es único o agrupamos por él)
@@ -59,27 +64,146 @@ def calculate_impact(minas_gdf, bdpi_gdf, radius_km):
         'total_pop': unique_affected_locs['poblacion'].sum()
     }
     
-    # 6. Preparar datos para retorno (reproyectar a 4326 para mapeo)
-    buffers_4326 = buffers_proj.to_crs(epsg=4326)
-    
+    # 6. Preparar datos para retorno (la zona de influencia del mapa se arma aparte,
+    # ver dissolved_influence_zone)
     # Limpiar columnas duplicadas o innecesarias para el GeoJSON
     # Nos quedamos solo con lo necesario para el tooltip y el mapa
     # Usamos .copy() para evitar SettingWithCopyWarning
-    cols_to_keep = ['geometry', 'poblacion']
-    if 'nombre_cp' in unique_affected_locs.columns:
-        cols_to_keep.append('nombre_cp')
+    # Si minas también trae la columna, sjoin le agrega el sufijo '_left' (lado BDPI)
+    cols_to_keep = {'geometry': 'geometry', 'poblacion': 'poblacion'}
+    for col in ('nombre_cp', 'departamento_geo'):
+        for src in (col, f'{col}_left'):
+            if src in unique_affected_locs.columns:
+                cols_to_keep[src] = col
+                break
     
-    final_affected_locs = unique_affected_locs[cols_to_keep].copy()
+    final_affected_locs = unique_affected_locs[list(cols_to_keep)].rename(columns=cols_to_keep)
 
     # Para la Matriz: Necesitamos el join completo (Mina <-> Localidad), no el deduplicado
     # 'joined' tiene geometria de BDPI (puntos) con datos de mina adjuntos.
     match_detailed = joined.to_crs(epsg=4326).copy()
     
-    # Retornamos las geometrías de buffers y el resumen
+    # Retornamos el resumen
     return {
-        'minas_buffered': buffers_4326,
         'impact_per_mine': impact_per_mine,
         'global_stats': global_stats,
         'affected_localities': final_affected_locs.to_crs(epsg=4326),
         'detailed_match': match_detailed
     }
+
+def assign_departamento(points_gdf, deps_gdf, name_col='departamento', max_distance_deg=0.1):
+    """
+    Asigna cada punto al polígono de departamento que lo contiene (atribución
+    espacial, independiente de las columnas de texto del Excel).
+
+    Se indexan los PUNTOS en un STRtree y se consulta con los polígonos
+    preparados: cada uno de los ~26 departamentos se prepara una sola vez y se
+    evalúa solo contra los puntos de su caja envolvente. Los puntos que caen
+    fuera de todo polígono (costa, bordes simplificados) se asignan al
+    departamento más cercano dentro de 'max_distance_deg' grados.
+
+    Args:
+        points_gdf (GeoDataFrame): Puntos (EPSG:4326).
+        deps_gdf (GeoDataFrame): Polígonos de departamentos (EPSG:4326).
+        name_col (str): Columna de 'deps_gdf' con el nombre a asignar.
+        max_distance_deg (float): Distancia máxima para el respaldo por cercanía.
+
+    Returns:
+        Series: nombre de departamento por punto (None si no se pudo asignar),
+        con el mismo índice que 'points_gdf'.
+    """
+    if points_gdf is None:
+        return None
+    result = np.full(len(points_gdf), None, dtype=object)
+    if deps_gdf is None or len(points_gdf) == 0:
+        return pd.Series(result, index=points_gdf.index, dtype=object)
+
+    points = points_gdf.geometry.values
+    polys = deps_gdf.geometry.values
+    names = deps_gdf[name_col].to_numpy(dtype=object)
+    shapely.prepare(polys)
+
+    tree = shapely.STRtree(points)
+    poly_idx, point_idx = tree.query(polys, predicate='contains_properly')
+    result[point_idx] = names[poly_idx]
+
+    # Respaldo: puntos en el borde o ligeramente fuera (costa).
+    # Se trabaja con polígonos simplificados: primero una franja (buffer) que
+    # descarta rápido los puntos lejanos, luego el más cercano solo para el resto.
+    missing = np.flatnonzero(pd.isna(result))
+    if len(missing) and max_distance_deg > 0:
+        simple = shapely.simplify(polys, max_distance_deg / 10)
+        band = shapely.buffer(simple, max_distance_deg, quad_segs=2)
+        shapely.prepare(band)
+        _, cand = shapely.STRtree(points[missing]).query(band, predicate='contains')
+        cand = missing[np.unique(cand)]
+        if len(cand):
+            near_point, near_poly = shapely.STRtree(simple).query_nearest(
+                points[cand], max_distance=max_distance_deg, all_matches=False
+            )
+            result[cand[near_point]] = names[near_poly]
+
+    return pd.Series(result, index=points_gdf.index, dtype=object)
+
+def exposure_by_departamento(affected_locs_gdf, deps_gdf, name_col='departamento'):
+    """
+    Población y número de localidades afectadas por departamento (según 'departamento_geo').
+
+    Returns:
+        GeoDataFrame: 'deps_gdf' reducido a [name_col, 'geometry'] más las columnas
+        'poblacion_afectada' y 'localidades_afectadas' (0 donde no hay impacto).
+    """
+    deps = deps_gdf[[name_col, 'geometry']].copy()
+    if affected_locs_gdf is None or affected_locs_gdf.empty or 'departamento_geo' not in affected_locs_gdf.columns:
+        deps['poblacion_afectada'] = 0
+        deps['localidades_afectadas'] = 0
+        return deps
+
+    stats = affected_locs_gdf.groupby('departamento_geo').agg(
+        poblacion_afectada=('poblacion', 'sum'),
+        localidades_afectadas=('poblacion', 'count')
+    )
+    deps = deps.join(stats, on=name_col)
+    deps[['poblacion_afectada', 'localidades_afectadas']] = (
+        deps[['poblacion_afectada', 'localidades_afectadas']].fillna(0).astype(int)
+    )
+    return deps
+
+def dissolved_influence_zone(minas_gdf, radius_km, quad_segs=BUFFER_QUAD_SEGS):
+    """
+    Zona de influencia disuelta: la unión de los buffers de todas las minas.
+    En zonas con muchas minas cercanas reemplaza decenas de círculos superpuestos
+    por uno o pocos polígonos (menos vértices y GeoJSON más liviano).
+
+    Args:
+        minas_gdf (GeoDataFrame): Puntos de minas (EPSG:4326).
+        radius_km (float): Radio de influencia en kilómetros.
+        quad_segs (int): Resolución de los círculos antes de unirlos.
+
+    Returns:
+        GeoDataFrame: Una fila (EPSG:4326) con 'radio_km', 'n_minas' y la geometría
+        unida, o None si no hay minas o el radio no es positivo.
+    """
+    if minas_gdf is None or minas_gdf.empty or radius_km <= 0:
+        return None
+
+    coords = shapely.get_coordinates(minas_gdf.geometry.to_crs(epsg=32718).values)
+    # Minas en la misma coordenada aportan el mismo círculo
+    coords = np.unique(coords, axis=0)
+    geom = _dissolve_buffers(coords.tobytes(), float(radius_km), quad_segs)
+
+    return gpd.GeoDataFrame(
+        {'radio_km': [radius_km], 'n_minas': [len(minas_gdf)]},
+        geometry=[geom], crs="EPSG:4326"
+    )
+
+@lru_cache(maxsize=32)
+def _dissolve_buffers(coords_bytes, radius_km, quad_segs):
+    """
+    Unión en cascada (GEOS unary union) de los buffers, cacheada por el conjunto
+    de coordenadas UTM (en bytes, para que sea hasheable), el radio y la resolución.
+    """
+    coords = np.frombuffer(coords_bytes).reshape(-1, 2)
+    buffers = shapely.buffer(shapely.points(coords), radius_km * 1000, quad_segs=quad_segs)
+    union = shapely.union_all(buffers)
+    return gpd.GeoSeries([union], crs="EPSG:32718").to_crs(epsg=4326).iloc[0]
@@ -1,15 +1,13 @@
 import streamlit as st
-import pandas as pd
-import folium
-from streamlit_folium import st_folium
-from folium.plugins import FastMarkerCluster, MarkerCluster
-import data_loader
-import analysis
+import instrumentation
 import os
 
 # Configuración de la página
 st.set_page_config(layout="wide", page_title="Análisis de Impacto Minero")
 
+# Tiempos de cada etapa del rerun (se registran siempre; el panel es opcional)
+timer = instrumentation.RerunTimer()
+
 # Rutas
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
@@ -39,16 +37,41 @@ BDPI_PATH = os.path.join(DATA_DIR, 'bdpi.xlsx')
 MINAS_PATH = os.path.join(DATA_DIR, 'minas.xlsx')
 DEP_DIR = os.path.join(DATA_DIR, 'departamentos')
 
-# Carga de Datos (Cacheada)
+def dataset_version():
+    """Fechas de modificación de los archivos de datos: cambian al actualizar cualquiera de ellos."""
+    # Sin la carpeta de departamentos se sigue igual: load_departamentos avisa del error
+    dep_files = sorted(os.listdir(DEP_DIR)) if os.path.isdir(DEP_DIR) else []
+    paths = [BDPI_PATH, MINAS_PATH] + [os.path.join(DEP_DIR, f) for f in dep_files]
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in paths)
+
+# Las librerías geoespaciales (geopandas, shapely) se importan recién aquí: el
+# navegador ya recibió la página y los estilos mientras se cargan. En los reruns
+# ya están en memoria y no cuestan nada.
+with timer.span("importaciones"):
+    import pandas as pd
+    import data_loader
+    import analysis
+    import filters
+
+# Carga de Datos (Cacheada por versión de los archivos)
 @st.cache_data
-def load_all_data():
+def load_all_data(version):
     with st.spinner('Cargando datos...'):
         bdpi = data_loader.load_bdpi(BDPI_PATH)
         minas = data_loader.load_minas(MINAS_PATH)
         deps = data_loader.load_departamentos(DEP_DIR)
+        # Atribución espacial al polígono de departamento (independiente del texto del Excel)
+        if deps is not None:
+            if bdpi is not None:
+                bdpi['departamento_geo'] = analysis.assign_departamento(bdpi, deps)
+            if minas is not None:
+                minas['departamento_geo'] = analysis.assign_departamento(minas, deps)
     return bdpi, minas, deps
 
-bdpi, minas, deps = load_all_data()
+with timer.span("carga_datos"):
+    bdpi, minas, deps = load_all_data(dataset_version())
+timer.size("bdpi_filas", len(bdpi) if bdpi is not None else 0)
+timer.size("minas_filas", len(minas) if minas is not None else 0)
 
 # --- Sidebar ---
 st.sidebar.title("Configuración")
@@ -58,65 +81,49 @@ st.sidebar.divider()
 st.sidebar.subheader("Filtros de Ubicación")
 
 # Lógica de Filtros en Cascada
-# 1. Filtro Departamento
-# Obtenemos departamentos únicos de ambos datasets para tener una lista completa
-deptos_bdpi = bdpi['departamento'].dropna().unique() if bdpi is not None else []
-deptos_minas = minas['departamento'].dropna().unique() if minas is not None else []
-all_deptos = sorted(list(set(deptos_bdpi) | set(deptos_minas)))
-
-selected_depto = st.sidebar.multiselect("Departamento", options=all_deptos)
-
-# Filtrado preliminar para opciones siguientes
+timer.start("filtros")
+# Cada nivel ofrece solo las opciones compatibles con los niveles anteriores.
+# Multiselect vacío = todos.
 idx_bdpi = bdpi.index
 idx_minas = minas.index
 
-if selected_depto:
-    idx_bdpi = bdpi[bdpi['departamento'].isin(selected_depto)].index
-    idx_minas = minas[minas['departamento'].isin(selected_depto)].index
+# 1. Filtro Departamento
+# Obtenemos departamentos únicos de ambos datasets para tener una lista completa
+all_deptos = filters.opciones_nivel(bdpi, minas, idx_bdpi, idx_minas, 'departamento')
+selected_depto = st.sidebar.multiselect("Departamento", options=all_deptos)
+idx_bdpi = filters.filtrar_nivel(bdpi, idx_bdpi, 'departamento', selected_depto)
+idx_minas = filters.filtrar_nivel(minas, idx_minas, 'departamento', selected_depto)
 
 # 2. Filtro Provincia (Basado en Depto)
-provs_bdpi = bdpi.loc[idx_bdpi, 'provincia'].dropna().unique()
-provs_minas = minas.loc[idx_minas, 'provincia'].dropna().unique()
-all_provs = sorted(list(set(provs_bdpi) | set(provs_minas)))
-
+all_provs = filters.opciones_nivel(bdpi, minas, idx_bdpi, idx_minas, 'provincia')
 selected_prov = st.sidebar.multiselect("Provincia", options=all_provs)
-
-if selected_prov:
-    # Refinamos índices
-    idx_bdpi = bdpi.loc[idx_bdpi][bdpi.loc[idx_bdpi, 'provincia'].isin(selected_prov)].index
-    idx_minas = minas.loc[idx_minas][minas.loc[idx_minas, 'provincia'].isin(selected_prov)].index
+idx_bdpi = filters.filtrar_nivel(bdpi, idx_bdpi, 'provincia', selected_prov)
+idx_minas = filters.filtrar_nivel(minas, idx_minas, 'provincia', selected_prov)
 
 # 3. Filtro Distrito (Basado en Prov)
-dists_bdpi = bdpi.loc[idx_bdpi, 'distrito'].dropna().unique()
-dists_minas = minas.loc[idx_minas, 'distrito'].dropna().unique()
-all_dists = sorted(list(set(dists_bdpi) | set(dists_minas)))
-
+all_dists = filters.opciones_nivel(bdpi, minas, idx_bdpi, idx_minas, 'distrito')
 selected_dist = st.sidebar.multiselect("Distrito", options=all_dists)
-
-if selected_dist:
-    idx_bdpi = bdpi.loc[idx_bdpi][bdpi.loc[idx_bdpi, 'distrito'].isin(selected_dist)].index
-    idx_minas = minas.loc[idx_minas][minas.loc[idx_minas, 'distrito'].isin(selected_dist)].index
+idx_bdpi = filters.filtrar_nivel(bdpi, idx_bdpi, 'distrito', selected_dist)
+idx_minas = filters.filtrar_nivel(minas, idx_minas, 'distrito', selected_dist)
 
 # 4. Filtro Unidad Minera (Específico)
-minas_disponibles = sorted(minas.loc[idx_minas, 'unidad_minera'].unique())
+minas_disponibles = filters.opciones_nivel(None, minas, idx_bdpi, idx_minas, 'unidad_minera')
 selected_mina = st.sidebar.multiselect("Unidad Minera", options=minas_disponibles)
-
-if selected_mina:
-    idx_minas = minas.loc[idx_minas][minas.loc[idx_minas, 'unidad_minera'].isin(selected_mina)].index
+idx_minas = filters.filtrar_nivel(minas, idx_minas, 'unidad_minera', selected_mina)
 
 # 5. Filtro Centro Poblado (Específico)
 # Limitamos opciones a lo ya filtrado para no saturar
-cps_disponibles = sorted(bdpi.loc[idx_bdpi, 'nombre_cp'].unique())
-# Usamos selectbox con busqueda o multiselect. Multiselect vacio = todos.
+cps_disponibles = filters.opciones_nivel(bdpi, None, idx_bdpi, idx_minas, 'nombre_cp')
 selected_cp = st.sidebar.multiselect("Centro Poblado", options=cps_disponibles)
-
-if selected_cp:
-    idx_bdpi = bdpi.loc[idx_bdpi][bdpi.loc[idx_bdpi, 'nombre_cp'].isin(selected_cp)].index
+idx_bdpi = filters.filtrar_nivel(bdpi, idx_bdpi, 'nombre_cp', selected_cp)
 
 
 # APLICAR FILTROS FINALES
 bdpi_filtered = bdpi.loc[idx_bdpi].copy()
 minas_filtered = minas.loc[idx_minas].copy()
+timer.stop("filtros")
+timer.size("bdpi_filtradas", len(bdpi_filtered))
+timer.size("minas_filtradas", len(minas_filtered))
 
 # Filtros visuales opcionales
 st.sidebar.divider()
@@ -124,25 +131,43 @@ st.sidebar.subheader("Capas")
 show_all_locs = st.sidebar.checkbox("Ver TODAS las localidades (Filtradas)", value=False)
 radius_km = float(radius_km) # Asegurar float
 
+st.sidebar.divider()
+st.sidebar.subheader("Diagnóstico")
+show_perf_panel = st.sidebar.checkbox("Panel de rendimiento", value=False)
+# Se llena al final del script, cuando ya se midieron todas las etapas
+perf_panel = st.sidebar.container()
+
+def report_timings():
+    """Registra los tiempos del rerun en el log y, si se pidió, los muestra en el sidebar."""
+    timer.log()
+    if show_perf_panel:
+        with perf_panel:
+            st.caption(f"Rerun: {timer.total() * 1000:,.0f} ms")
+            st.dataframe(pd.DataFrame(timer.rows()), use_container_width=True, hide_index=True)
+            st.json(timer.sizes, expanded=False)
+
 # --- Análisis con datos filtrados ---
 if not minas_filtered.empty and not bdpi_filtered.empty:
-    results = analysis.calculate_impact(minas_filtered, bdpi_filtered, radius_km)
+    with timer.span("calculate_impact"):
+        results = analysis.calculate_impact(minas_filtered, bdpi_filtered, radius_km)
     
     impact_df = results['impact_per_mine']
     global_stats = results['global_stats']
-    buffers_gdf = results['minas_buffered']
     affected_locs_gdf = results['affected_localities']
 elif minas_filtered.empty:
     st.warning("No hay unidades mineras que coincidan con los filtros seleccionados.")
+    report_timings()
     st.stop()
 else:
     # No hay BDPI pero sí minas (puede pasar en zonas sin poblacion indigena)
-    results = analysis.calculate_impact(minas_filtered, bdpi_filtered, radius_km) # Maneja dataframes vacios
+    with timer.span("calculate_impact"):
+        results = analysis.calculate_impact(minas_filtered, bdpi_filtered, radius_km) # Maneja dataframes vacios
     impact_df = results['impact_per_mine']
     global_stats = results['global_stats']
-    buffers_gdf = results['minas_buffered']
     affected_locs_gdf = results['affected_localities']
 
+timer.size("localidades_afectadas", len(affected_locs_gdf))
+
 
 # --- Layout Principal ---
 st.title("Monitor de Impacto Social Minero")
@@ -153,63 +178,36 @@ col1, col2 = st.columns(2)
 col1.metric("Total Localidades Afectadas", f"{global_stats['total_locs']:,}")
 col2.metric("Población Afectada (Aprox.)", f"{global_stats['total_pop']:,}")
 
-# Pestañas de Navegación
-tab_mapa, tab_matriz = st.tabs(["🗺️ Mapa Interactivo", "📋 Matriz de Datos"])
+# Selector de vista. A diferencia de st.tabs, que ejecuta todas las pestañas en cada
+# rerun, solo se ejecuta la vista elegida: folium y el mapa se cargan al abrir el mapa.
+VISTA_MAPA, VISTA_MATRIZ = "🗺️ Mapa Interactivo", "📋 Matriz de Datos"
+vista = st.radio("Vista", [VISTA_MAPA, VISTA_MATRIZ], horizontal=True,
+                 label_visibility="collapsed", key="vista")
 
 # --- VISTA 1: MAPA ---
-with tab_mapa:
+if vista == VISTA_MAPA:
     col_map, col_report = st.columns([2, 1])
 
     with col_map:
         st.subheader("Visualización Geoespacial")
-        # Centro aproximado de Perú
-        m = folium.Map(location=[-9.19, -75.015], zoom_start=5, tiles="CartoDB positron")
-        
-        # 1. Capa Departamentos
-        if deps is not None:
-            folium.GeoJson(
-                deps,
-                name="Departamentos",
-                style_function=lambda x: {'fillColor': '#ffffff00', 'color': 'gray', 'weight': 1}
-            ).add_to(m)
-        
-        # 2. Capa Todas las Localidades (Opcional o Clustered)
-        if show_all_locs and not bdpi_filtered.empty:
-            # Usamos FastMarkerCluster para optimizar
-            FastMarkerCluster(
-                data=list(zip(bdpi_filtered.geometry.y, bdpi_filtered.geometry.x)),
-                name="Todas las Localidades (Filtradas)"
-            ).add_to(m)
-
-        # 3. Capa Localidades Afectadas (Puntos destacados)
-        if not affected_locs_gdf.empty:
-            # GeoJson con CircleMarker
-            folium.GeoJson(
-                affected_locs_gdf,
-                name="Localidades Afectadas",
-                marker=folium.CircleMarker(radius=3, fill_color="orange", fill_opacity=0.7, color="black", weight=0.5),
-                tooltip=folium.GeoJsonTooltip(fields=['nombre_cp', 'poblacion'], aliases=['Localidad:', 'Población:'])
-            ).add_to(m)
-
-        # 4. Capas Buffers
-        if buffers_gdf is not None:
-            folium.GeoJson(
-                buffers_gdf,
-                name="Radio de Influencia",
-                style_function=lambda x: {'fillColor': 'red', 'color': 'red', 'weight': 1, 'fillOpacity': 0.2}
-            ).add_to(m)
-
-        # 5. Capa Minas
-        if not minas_filtered.empty:
-            for idx, row in minas_filtered.iterrows():
-                folium.Marker(
-                    location=[row.geometry.y, row.geometry.x],
-                    popup=row['unidad_minera'],
-                    icon=folium.Icon(color='red', icon='info-sign')
-                ).add_to(m)
-
-        folium.LayerControl().add_to(m)
-        st_folium(m, width=None, height=600, use_container_width=True)
+        # folium solo hace falta para el mapa
+        with timer.span("importaciones_mapa"):
+            import map_builder
+            from streamlit_folium import st_folium
+        with timer.span("mapa_construccion"):
+            dep_exposure = analysis.exposure_by_departamento(affected_locs_gdf, deps) if deps is not None else None
+            # Zona de influencia disuelta: un polígono en vez de un círculo por mina
+            influence_zone = analysis.dissolved_influence_zone(minas_filtered, radius_km)
+            m = map_builder.build_map(
+                deps, bdpi_filtered, affected_locs_gdf, influence_zone, minas_filtered,
+                show_all_locs=show_all_locs, dep_exposure=dep_exposure
+            )
+        with timer.span("mapa_st_folium"):
+            st_folium(m, width=None, height=600, use_container_width=True)
+        if show_perf_panel:
+            # Renderizar otra vez el mapa cuesta: solo con el panel de rendimiento abierto
+            with timer.span("mapa_payload"):
+                timer.size("mapa_payload_chars", map_builder.rendered_payload_size(m))
         st.caption("Fuente: Elaboración propia.")
 
     with col_report:
@@ -228,7 +226,7 @@ with tab_mapa:
             st.info("No hay localidades afectadas en este radio.")
 
 # --- VISTA 2: MATRIZ ---
-with tab_matriz:
+else:
     st.subheader("Detalle de Impacto: Relación Mina - Localidad")
     
     detailed_data = results.get('detailed_match')
@@ -287,3 +285,5 @@ with tab_matriz:
 
 st.markdown("---")
 st.markdown("**Fuente:** Elaboración propia.")
+
+report_timings()
@@ -0,0 +1,229 @@
+import json
+import os
+import shutil
+import subprocess
+import wave
+from pathlib import Path
+
+import numpy as np
+
+import media_manifest
+
+# Whisper trabaja con audio mono a 16 kHz
+SAMPLE_RATE = 16000
+# Ventana (a cada lado del corte ideal) donde se busca el silencio más profundo
+SEARCH_SECONDS = 30
+FRAME_SECONDS = 0.03
+# Cuadros del suavizado de la energía (~0,3 s)
+SMOOTH_FRAMES = 10
+
+def media_duration(path):
+    """
+    Duración en segundos: WAV con la librería estándar, el resto con ffprobe
+    (viene con ffmpeg, que Whisper ya necesita). None si no se puede determinar.
+    """
+    if str(path).lower().endswith(".wav"):
+        try:
+            with wave.open(str(path), "rb") as w:
+                return w.getnframes() / float(w.getframerate())
+        except (wave.Error, OSError, EOFError):
+            pass
+    if shutil.which("ffprobe"):
+        try:
+            out = subprocess.run(
+                ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "json", str(path)],
+                capture_output=True, text=True, timeout=60
+            )
+            return float(json.loads(out.stdout)["format"]["duration"])
+        except (OSError, ValueError, KeyError, subprocess.SubprocessError):
+            pass
+    return None
+
+def load_audio_range(path, start=0.0, duration=None):
+    """
+    Audio mono 16 kHz en float32 (como whisper.load_audio) desde 'start' segundos,
+    opcionalmente solo 'duration' segundos. Los WAV ya en 16 kHz/16 bits/mono se leen
+    directamente; el resto se decodifica con ffmpeg.
+    """
+    if str(path).lower().endswith(".wav"):
+        try:
+            with wave.open(str(path), "rb") as w:
+                if (w.getframerate(), w.getnchannels(), w.getsampwidth()) == (SAMPLE_RATE, 1, 2):
+                    w.setpos(min(int(start * SAMPLE_RATE), w.getnframes()))
+                    n = w.getnframes() - w.tell() if duration is None else int(duration * SAMPLE_RATE)
+                    data = w.readframes(n)
+                    return np.frombuffer(data, np.int16).flatten().astype(np.float32) / 32768.0
+        except (wave.Error, EOFError):
+            pass
+
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-ss", f"{start:.3f}"]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.3f}"]
+    cmd += ["-i", str(path), "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Error decodificando audio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+def find_split_points(read_audio, duration, segment_seconds, search_seconds=SEARCH_SECONDS):
+    """
+    Cortes cada ~'segment_seconds', movidos al tramo más silencioso dentro de
+    ±'search_seconds' (energía RMS suavizada en ~0,3 s), así no se corta una palabra.
+    Solo se lee el audio de la ventana alrededor de cada corte, no la grabación entera.
+
+    Args:
+        read_audio (callable): (inicio, duración) en segundos -> audio mono 16 kHz.
+        duration (float): Duración total en segundos.
+
+    Returns:
+        list: [(inicio, fin)] en segundos, contiguos y cubriendo todo el audio.
+    """
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    n_frames = int(duration / FRAME_SECONDS)
+    if duration <= segment_seconds * 1.5 or n_frames == 0:
+        return [(0.0, round(duration, 3))]
+    # La ventana no pasa de medio segmento: si no, un tramo silencioso largo
+    # acercaría cada corte al anterior
+    search_seconds = min(search_seconds, segment_seconds / 2)
+
+    cuts = []
+    cut_frame = 0
+    target = segment_seconds
+    while target < duration - segment_seconds * 0.5:
+        lo = max(int((target - search_seconds) / FRAME_SECONDS), 1, cut_frame + 1)
+        hi = min(int((target + search_seconds) / FRAME_SECONDS), n_frames - 1)
+        if hi <= lo:
+            break
+        # Margen a cada lado para que el suavizado del borde sea el mismo que con todo el audio
+        first = max(lo - SMOOTH_FRAMES, 0)
+        last = min(hi + SMOOTH_FRAMES, n_frames)
+        audio = read_audio(first * FRAME_SECONDS, (last - first) * FRAME_SECONDS)
+        n = len(audio) // frame
+        if n == 0:
+            break
+        energy = np.sqrt(np.mean(audio[:n * frame].reshape(n, frame) ** 2, axis=1))
+        smooth = np.convolve(energy, np.ones(SMOOTH_FRAMES) / SMOOTH_FRAMES, mode="same")
+        window = smooth[lo - first:hi - first]
+        if len(window) == 0:
+            break
+        # Entre tramos igual de silenciosos (p. ej. silencio digital), el más cercano al corte ideal
+        quietest = np.flatnonzero(window <= window.min())
+        cut_frame = lo + int(quietest[np.argmin(np.abs(quietest + lo - target / FRAME_SECONDS))])
+        cuts.append(cut_frame * FRAME_SECONDS)
+        target = cuts[-1] + segment_seconds
+
+    bounds = [0.0] + cuts + [duration]
+    return [(round(a, 3), round(b, 3)) for a, b in zip(bounds, bounds[1:])]
+
+def checkpoint_dir(media_path):
+    """Carpeta '<nombre>.segments' junto al archivo con el plan y un JSON por segmento terminado."""
+    return Path(media_manifest.output_base(media_path) + ".segments")
+
+def _write_json(path, data):
+    tmp = str(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _media_signature(media_path, model_size, segment_seconds):
+    stat = os.stat(media_path)
+    return {'media_size': stat.st_size, 'media_mtime': int(stat.st_mtime),
+            'model': model_size, 'segment_seconds': segment_seconds}
+
+def plan_segments(media_path, segment_seconds, model_size):
+    """
+    Plan de segmentos del archivo. Si ya existe uno para el mismo archivo, modelo y
+    duración de segmento, se reutiliza (y con él los segmentos ya transcritos);
+    si no, se descartan los checkpoints viejos y se calculan los cortes.
+
+    Returns:
+        dict: {'segments': [[inicio, fin], ...], ...}
+    """
+    folder = checkpoint_dir(media_path)
+    plan_file = folder / "plan.json"
+    signature = _media_signature(media_path, model_size, segment_seconds)
+    if plan_file.exists():
+        try:
+            with open(plan_file, "r", encoding="utf-8") as f:
+                plan = json.load(f)
+            if all(plan.get(k) == v for k, v in signature.items()):
+                return plan
+        except (OSError, ValueError):
+            pass
+        shutil.rmtree(folder, ignore_errors=True)
+
+    duration = media_duration(media_path)
+    if duration is not None:
+        def read_audio(start, length):
+            return load_audio_range(media_path, start, length)
+    else:
+        # Sin ffprobe no se conoce la duración: se decodifica una vez completo
+        audio = load_audio_range(media_path)
+        duration = len(audio) / SAMPLE_RATE
+
+        def read_audio(start, length):
+            return audio[int(start * SAMPLE_RATE):int((start + length) * SAMPLE_RATE)]
+    segments = find_split_points(read_audio, duration, segment_seconds)
+    plan = dict(signature, segments=[list(s) for s in segments])
+    folder.mkdir(parents=True, exist_ok=True)
+    _write_json(plan_file, plan)
+    return plan
+
+def segment_file(media_path, index):
+    return checkpoint_dir(media_path) / f"seg_{index:04d}.json"
+
+def pending_segments(media_path, plan):
+    """Índices de los segmentos que todavía no tienen checkpoint."""
+    return [i for i in range(len(plan['segments'])) if not segment_file(media_path, i).exists()]
+
+def transcribe_segment(model, media_path, plan, index, verbose=None):
+    """
+    Transcribe un segmento y guarda su checkpoint con los tiempos ya desplazados
+    al inicio del segmento dentro del archivo completo.
+
+    Returns:
+        float: Segundos de audio del segmento.
+    """
+    start, end = plan['segments'][index]
+    audio = load_audio_range(media_path, start, end - start)
+    result = model.transcribe(audio, verbose=verbose)
+    segments = [
+        {'start': round(start + s['start'], 3), 'end': round(start + s['end'], 3), 'text': s['text']}
+        for s in result.get('segments') or []
+    ]
+    _write_json(segment_file(media_path, index),
+                {'index': index, 'start': start, 'end': end, 'text': result['text'], 'segments': segments})
+    return end - start
+
+def stitch(media_path, plan):
+    """
+    Une los checkpoints en orden.
+
+    Returns:
+        tuple: (texto como el de model.transcribe, lista de segmentos con tiempos absolutos,
+        largo en caracteres del texto de cada checkpoint)
+    """
+    texts, segments = [], []
+    for i in range(len(plan['segments'])):
+        with open(segment_file(media_path, i), "r", encoding="utf-8") as f:
+            part = json.load(f)
+        texts.append(part['text'])
+        segments.extend(part['segments'])
+    return "".join(texts), segments, [len(t) for t in texts]
+
+def clear_checkpoints(media_path):
+    shutil.rmtree(checkpoint_dir(media_path), ignore_errors=True)
+
+def _srt_time(seconds):
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+def write_srt(path, segments):
+    """Subtítulos SRT (tiempos absolutos) a partir de los segmentos de Whisper."""
+    with open(path, "w", encoding="utf-8") as f:
+        for n, s in enumerate(segments, 1):
+            f.write(f"{n}\n{_srt_time(s['start'])} --> {_srt_time(s['end'])}\n{s['text'].strip()}\n\n")
@@ -0,0 +1,219 @@
+"""
+Benchmarks del monitor minero con datos sintéticos.
+
+Mide load_bdpi, load_minas, assign_departamento, calculate_impact, la unión de
+buffers (varios radios), la cascada de filtros del sidebar y la serialización
+del mapa folium. Los resultados se guardan en JSON para
+poder compararlos contra una corrida anterior:
+
+    python benchmark.py --sizes 1000 10000 --output bench_nuevo.json
+    python benchmark.py --sizes 1000 10000 --compare bench_base.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import data_loader
+import analysis
+import filters
+import map_builder
+import synthetic_data
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_RADII = [5, 10, 50]
+
+def time_call(func, repeat):
+    """Ejecuta func() 'repeat' veces. Devuelve (tiempos, último resultado)."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - t0)
+    return times, result
+
+def make_record(name, rows, times, **params):
+    return {
+        'benchmark': name,
+        'rows': rows,
+        'params': params,
+        'best_s': min(times),
+        'median_s': statistics.median(times),
+        'repeat': len(times),
+    }
+
+def record_key(rec):
+    return (rec['benchmark'], rec['rows'], json.dumps(rec['params'], sort_keys=True))
+
+def n_minas_for(rows, ratio):
+    """Número de minas usado en el análisis para un tamaño de BDPI dado."""
+    return max(100, int(rows * ratio))
+
+def run_size(rows, args):
+    """Corre todos los benchmarks para un tamaño de dataset."""
+    records = []
+    print(f"\n=== {rows:,} filas ===")
+
+    if args.skip_excel:
+        bdpi = synthetic_data.make_bdpi_gdf(rows, seed=args.seed)
+        minas = synthetic_data.make_minas_gdf(rows, seed=args.seed + 1)
+    else:
+        bdpi_path, minas_path = synthetic_data.ensure_excel_dataset(rows, args.data_dir, seed=args.seed)
+
+        times, bdpi = time_call(lambda: data_loader.load_bdpi(bdpi_path), args.repeat)
+        records.append(make_record('load_bdpi', rows, times))
+        times, minas = time_call(lambda: data_loader.load_minas(minas_path), args.repeat)
+        records.append(make_record('load_minas', rows, times))
+
+    minas = minas.iloc[:n_minas_for(rows, args.minas_ratio)]
+
+    # Atribución espacial a departamentos (STRtree + polígonos preparados)
+    if args.deps is not None:
+        times, dep_geo = time_call(lambda: analysis.assign_departamento(bdpi, args.deps), args.repeat)
+        records.append(make_record('assign_departamento', rows, times))
+        bdpi = bdpi.assign(departamento_geo=dep_geo)
+
+    # Cascada de filtros: sin selección (rerun por defecto) y con depto + provincia
+    times, _ = time_call(lambda: filters.aplicar_cascada(bdpi, minas, {}), args.repeat)
+    records.append(make_record('filter_cascade', rows, times, scenario='sin_seleccion'))
+
+    depto = sorted(bdpi['departamento'].unique())[0]
+    prov = sorted(bdpi.loc[bdpi['departamento'] == depto, 'provincia'].unique())[0]
+    seleccion = {'departamento': [depto], 'provincia': [prov]}
+    times, _ = time_call(lambda: filters.aplicar_cascada(bdpi, minas, seleccion), args.repeat)
+    records.append(make_record('filter_cascade', rows, times, scenario='depto_provincia'))
+
+    results_by_radius = {}
+    for radius in args.radii:
+        times, results = time_call(
+            lambda: analysis.calculate_impact(minas, bdpi, float(radius)), args.repeat
+        )
+        results_by_radius[radius] = results
+        records.append(make_record('calculate_impact', rows, times,
+                                   radius_km=radius, n_minas=len(minas)))
+
+    # Zona de influencia disuelta (sin caché: se mide la unión completa)
+    def dissolve():
+        analysis._dissolve_buffers.cache_clear()
+        return analysis.dissolved_influence_zone(minas, float(radius))
+
+    zones = {}
+    for radius in args.radii:
+        times, zones[radius] = time_call(dissolve, args.repeat)
+        records.append(make_record('dissolve_buffers', rows, times,
+                                   radius_km=radius, n_minas=len(minas)))
+
+    # Serialización del mapa con la zona disuelta, como en app.py (solo el radio
+    # más pequeño: el payload crece con el radio)
+    radius = min(args.radii)
+    results = results_by_radius[radius]
+    buffer_layers = {'disuelto': zones[radius]}
+
+    for variant, buffers in buffer_layers.items():
+        def render_map():
+            dep_exposure = None
+            if args.deps is not None:
+                dep_exposure = analysis.exposure_by_departamento(results['affected_localities'], args.deps)
+            m = map_builder.build_map(
+                args.deps, bdpi, results['affected_localities'], buffers, minas,
+                dep_exposure=dep_exposure
+            )
+            return m.get_root().render()
+
+        times, html = time_call(render_map, args.repeat)
+        rec = make_record('map_render', rows, times, radius_km=radius, n_minas=len(minas), buffers=variant)
+        rec['payload_bytes'] = len(html.encode('utf-8'))
+        rec['buffers_payload_bytes'] = len(buffers.to_json().encode('utf-8'))
+        records.append(rec)
+
+    for rec in records:
+        print(f"  {rec['benchmark']:<18} {json.dumps(rec['params'], sort_keys=True):<45} "
+              f"best={rec['best_s']:.4f}s median={rec['median_s']:.4f}s")
+    return records
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+def compare(records, baseline_path, tolerance):
+    """
+    Compara contra un JSON previo. Devuelve la lista de regresiones
+    (best_s mayor que baseline * (1 + tolerance)).
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {record_key(r): r for r in json.load(f)['results']}
+
+    regressions = []
+    for rec in records:
+        base = baseline.get(record_key(rec))
+        if base is None:
+            continue
+        ratio = rec['best_s'] / base['best_s'] if base['best_s'] > 0 else 1.0
+        if ratio > 1 + tolerance:
+            regressions.append((rec, base, ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks con datos sintéticos del monitor minero.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--radii', type=float, nargs='+', default=DEFAULT_RADII)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--minas-ratio', type=float, default=0.001,
+                        help="Minas usadas en el análisis por cada fila de BDPI (mínimo 100).")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'monitor_minero_bench'),
+                        help="Carpeta donde se generan (y reutilizan) los Excel sintéticos.")
+    parser.add_argument('--skip-excel', action='store_true',
+                        help="Genera GeoDataFrames en memoria y omite load_bdpi/load_minas.")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="JSON de una corrida anterior para detectar regresiones.")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    args.deps = data_loader.load_departamentos(os.path.join(base_dir, 'data', 'departamentos'))
+
+    records = []
+    for rows in args.sizes:
+        records.extend(run_size(rows, args))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'results': records,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {args.output}")
+
+    if args.compare:
+        regressions = compare(records, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regresiones (tolerancia {args.tolerance:.0%}):")
+            for rec, base, ratio in regressions:
+                print(f"  {rec['benchmark']} rows={rec['rows']} {rec['params']}: "
+                      f"{base['best_s']:.4f}s -> {rec['best_s']:.4f}s (x{ratio:.2f})")
+            return 1
+        print("Sin regresiones respecto a la línea base.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
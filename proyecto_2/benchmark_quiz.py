@@ -0,0 +1,93 @@
+"""
+Benchmark de generación de exámenes contra el servidor Ollama simulado.
+
+Mide fragmentos por minuto con distintos niveles de concurrencia y verifica que
+los resultados se entregan en el orden de los fragmentos:
+
+    python benchmark_quiz.py --chunks 40 --delay 0.5 --parallel 4 --workers 1 2 4 8
+
+Con --batch-ctx también se mide el modo por lotes (varios fragmentos por petición)
+y se compara tiempo total y tokens de prompt con el modo de un fragmento por petición:
+
+    python benchmark_quiz.py --chunk-size 800 --workers 2 --batch-ctx 8192 --prompt-tps 2000
+"""
+import argparse
+import json
+import sys
+import time
+
+import question_generator
+import fake_ollama_server
+
+def synthetic_chunks(n, size=3000):
+    """Fragmentos distinguibles por su inicio ('Bloque 0007 ...')."""
+    filler = "El derecho administrativo regula la organización de la Administración pública. "
+    return [(f"Bloque {i:04d}. " + filler * (size // len(filler) + 1))[:size] for i in range(n)]
+
+def run(chunks, url, workers, retries, batch_ctx=None):
+    question_generator.reset_usage()
+    t0 = time.perf_counter()
+    results = list(question_generator.generate_concurrently(
+        chunks, model="fake", workers=workers, retries=retries, backoff=0.1, timeout=60, host=url,
+        batch_ctx=batch_ctx
+    ))
+    elapsed = time.perf_counter() - t0
+    usage = question_generator.usage_stats()
+
+    in_order = all(
+        quiz and chunk[:40] in quiz['open_ended']['question']
+        for chunk, quiz in zip(chunks, results)
+    )
+    return {
+        'mode': f'lotes (ctx {batch_ctx})' if batch_ctx else 'individual',
+        'workers': workers,
+        'chunks': len(chunks),
+        'requests': usage['requests'],
+        'prompt_tokens': usage['prompt_tokens'],
+        'seconds': round(elapsed, 3),
+        'chunks_per_min': round(len(chunks) / elapsed * 60, 1),
+        'failed': sum(1 for q in results if not q),
+        'in_order': in_order,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fragmentos/minuto del generador de exámenes.")
+    parser.add_argument('--chunks', type=int, default=40)
+    parser.add_argument('--chunk-size', type=int, default=3000, help="Caracteres por fragmento.")
+    parser.add_argument('--delay', type=float, default=0.5, help="Segundos por respuesta del servidor simulado.")
+    parser.add_argument('--parallel', type=int, default=4, help="Capacidad paralela del servidor simulado.")
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--retries', type=int, default=2)
+    parser.add_argument('--batch-ctx', type=int, default=None,
+                        help="Medir también el modo por lotes con esta ventana de contexto.")
+    parser.add_argument('--prompt-tps', type=float, default=0.0,
+                        help="Tokens de prompt por segundo del servidor simulado (0 = gratis).")
+    parser.add_argument('--output', default='benchmark_quiz_results.json')
+    args = parser.parse_args(argv)
+
+    server, url = fake_ollama_server.start_server(
+        delay=args.delay, parallel=args.parallel, fail_rate=args.fail_rate, prompt_tps=args.prompt_tps
+    )
+    chunks = synthetic_chunks(args.chunks, size=args.chunk_size)
+    records = []
+    try:
+        for workers in args.workers:
+            for batch_ctx in [None] + ([args.batch_ctx] if args.batch_ctx else []):
+                rec = run(chunks, url, workers, args.retries, batch_ctx)
+                records.append(rec)
+                print(f"workers={workers:<3} {rec['mode']:<18} {rec['chunks_per_min']:>8.1f} fragmentos/min  "
+                      f"({rec['seconds']}s, {rec['requests']} peticiones, {rec['prompt_tokens']} tokens de prompt, "
+                      f"fallidos={rec['failed']}, en orden={rec['in_order']})")
+    finally:
+        server.shutdown()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({'server': {'delay': args.delay, 'parallel': args.parallel, 'fail_rate': args.fail_rate,
+                              'prompt_tps': args.prompt_tps},
+                   'results': records}, f, indent=2)
+    print(f"Resultados guardados en {args.output}")
+    return 0 if all(r['in_order'] for r in records if not r['failed']) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -134,6 +134,11 @@ def load_departamentos(dirpath):
         elif gdf.crs is None:
              # Asumir WGS84 si no tiene CRS, común en archivos geogpsperu
             gdf.set_crs("EPSG:4326", inplace=True)
+
+        # Nombre normalizado (Mayúsculas y Sin tildes) como en BDPI/Minas
+        if 'NAME_1' in gdf.columns:
+            gdf['departamento'] = gdf['NAME_1'].astype(str).str.upper().str.strip().apply(remove_accents)
+            gdf['departamento'] = gdf['departamento'].replace({'PROVINCIA CONSTITUCIONAL DEL CALLAO': 'CALLAO'})
             
         return gdf
     except Exception as e:
@@ -0,0 +1,237 @@
+import html
+import json
+import os
+import pathlib
+import webbrowser
+
+# Preguntas por página: los exámenes muy grandes se dividen en páginas enlazadas
+DEFAULT_QUESTIONS_PER_PAGE = 200
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Examen: {source_name}{page_label}</title>
+    <style>
+        body {{ font-family: 'Segoe UI', sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; background-color: #f5f5f5; }}
+        .quiz-container {{ background: white; padding: 30px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
+        h1 {{ color: #2c3e50; text-align: center; }}
+        .question-card {{ border-bottom: 1px solid #eee; padding: 20px 0; }}
+        .question-text {{ font-size: 1.1em; font-weight: 600; color: #34495e; }}
+        .options {{ margin-top: 10px; }}
+        .option {{ display: block; margin: 5px 0; padding: 10px; background: #f8f9fa; border: 1px solid #ddd; border-radius: 5px; cursor: pointer; transition: 0.2s; }}
+        .option:hover {{ background: #e9ecef; }}
+        .answer-key {{ display: none; margin-top: 10px; padding: 10px; background-color: #d4edda; color: #155724; border-radius: 5px; }}
+        .show-btn {{ background-color: #007bff; color: white; border: none; padding: 5px 15px; border-radius: 4px; cursor: pointer; margin-top: 10px; font-size: 0.9em; }}
+        .show-btn:hover {{ background-color: #0056b3; }}
+        .open-question {{ background-color: #fff3cd; border: 1px solid #ffeeba; padding: 15px; border-radius: 5px; margin-top: 20px; }}
+        .error-card {{ background-color: #ffe6e6; padding: 10px; border: 1px solid #ffcccc; color: #cc0000; display: none; }}
+        .pager {{ display: flex; justify-content: space-between; margin: 20px 0; }}
+    </style>
+    <script>
+        function toggleAnswer(id) {{
+            var x = document.getElementById(id);
+            if (x.style.display === "none") {{ x.style.display = "block"; }} else {{ x.style.display = "none"; }}
+        }}
+    </script>
+</head>
+<body>
+    <div class="quiz-container">
+        <h1>Examen Generado con IA</h1>
+        <p>Fuente: <strong>{source_name}</strong>{page_label}</p>
+        {prev_link}
+        <hr>
+"""
+
+PAGE_TAIL = """
+        <div class="pager">{prev_link}{next_link}</div>
+    </div>
+</body>
+</html>
+"""
+
+def _esc(value):
+    return html.escape(str(value), quote=False)
+
+def render_batch(batch, block_index, first_number):
+    """
+    Tarjetas HTML de un bloque de preguntas, robusto a respuestas mal formadas.
+
+    Args:
+        batch (dict): Bloque generado por la IA (puede venir vacío).
+        block_index (int): Posición del bloque en el documento (0-based).
+        first_number (int): Número de la primera pregunta de opción múltiple.
+
+    Returns:
+        tuple: (html, preguntas de opción múltiple escritas)
+    """
+    if not isinstance(batch, dict) or not batch:
+        return "", 0
+
+    parts = []
+    count = first_number
+    # Multiple Choice
+    multiple_choice = batch.get('multiple_choice')
+    for q in multiple_choice if isinstance(multiple_choice, list) else []:
+        # VALIDATION: Ensure q is a dictionary
+        if not isinstance(q, dict):
+            continue
+
+        # SAFETY CHECK: Si la IA alucinó y no puso 'options', saltamos
+        options = q.get('options', [])
+        if not options or not isinstance(options, list):
+            continue
+
+        q_id = f"q_{count}"
+        options_html = "".join(
+            f"<label class='option'><input type='radio' name='{q_id}'> {_esc(opt)}</label>" for opt in options
+        )
+        parts.append(f"""
+        <div class="question-card">
+            <div class="question-text">{count}. {_esc(q.get('question', 'Pregunta sin texto'))}</div>
+            <div class="options">{options_html}</div>
+            <button class="show-btn" onclick="toggleAnswer('ans_{q_id}')">Ver Respuesta</button>
+            <div id="ans_{q_id}" class="answer-key">
+                <strong>Correcta:</strong> {_esc(q.get('answer', '?'))}<br>
+                <em>{_esc(q.get('explanation', ''))}</em>
+            </div>
+        </div>
+        """)
+        count += 1
+
+    # Open Ended
+    oq = batch.get('open_ended')
+    if isinstance(oq, dict) and 'question' in oq:
+        key_points = oq.get('key_points', [])
+        points = ''.join(f'<li>{_esc(p)}</li>' for p in key_points) if isinstance(key_points, list) else ''
+        parts.append(f"""
+        <div class="open-question">
+            <strong>Pregunta de Desarrollo {block_index + 1}:</strong><br>
+            {_esc(oq.get('question', ''))}
+            <br><br>
+            <details>
+                <summary>Ver Puntos Clave Sugeridos</summary>
+                <ul>
+                    {points}
+                </ul>
+            </details>
+        </div>
+        """)
+    return "".join(parts), count - first_number
+
+def page_path(output_filename, page):
+    """Archivo de la página 'page' (1 = el archivo principal, luego EXAMEN_x.p2.html, ...)."""
+    if page == 1:
+        return output_filename
+    base, ext = os.path.splitext(output_filename)
+    return f"{base}.p{page}{ext or '.html'}"
+
+class ExamWriter:
+    """
+    Escribe el examen HTML en disco a medida que llegan los bloques: cada tarjeta
+    se agrega al archivo y se vacía el buffer, así el examen parcial se puede abrir
+    (y recargar) en el navegador durante la generación. No guarda los bloques en
+    memoria. Al superar 'questions_per_page' preguntas se cierra la página con un
+    enlace a la siguiente.
+
+    Uso:
+        with ExamWriter("EXAMEN_doc.html", "doc.pdf") as writer:
+            for batch in bloques:
+                writer.write(batch)
+    """
+
+    def __init__(self, output_filename, source_name, questions_per_page=DEFAULT_QUESTIONS_PER_PAGE):
+        self.output_filename = output_filename
+        self.source_name = source_name
+        self.questions_per_page = max(1, questions_per_page)
+        self.page = 0
+        self.blocks = 0
+        self.questions = 0
+        self._page_questions = 0
+        self._file = None
+        self._open_page()
+
+    def _link(self, page, text):
+        return f'<a href="{html.escape(os.path.basename(page_path(self.output_filename, page)))}">{text}</a>'
+
+    def _open_page(self):
+        self.page += 1
+        self._page_questions = 0
+        prev_link = self._link(self.page - 1, "&larr; Página anterior") if self.page > 1 else ""
+        self._file = open(page_path(self.output_filename, self.page), "w", encoding="utf-8")
+        self._file.write(PAGE_HEAD.format(
+            source_name=_esc(self.source_name),
+            page_label=f" (página {self.page})" if self.page > 1 else "",
+            prev_link=prev_link,
+        ))
+        self._file.flush()
+
+    def _close_page(self, has_next):
+        prev_link = self._link(self.page - 1, "&larr; Página anterior") if self.page > 1 else "<span></span>"
+        next_link = self._link(self.page + 1, "Página siguiente &rarr;") if has_next else ""
+        self._file.write(PAGE_TAIL.format(prev_link=prev_link, next_link=next_link))
+        self._file.close()
+        self._file = None
+
+    def write(self, batch):
+        """Agrega las preguntas de un bloque (en el orden del documento)."""
+        if self._page_questions >= self.questions_per_page:
+            self._close_page(has_next=True)
+            self._open_page()
+        content, n = render_batch(batch, self.blocks, self.questions + 1)
+        self.blocks += 1
+        if content:
+            self._file.write(content)
+            self._file.flush()
+            self.questions += n
+            self._page_questions += n
+
+    def close(self):
+        if self._file is not None:
+            self._close_page(has_next=False)
+            # Páginas sobrantes de una ejecución anterior más larga
+            extra = self.page + 1
+            while os.path.exists(page_path(self.output_filename, extra)):
+                os.remove(page_path(self.output_filename, extra))
+                extra += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_recovery(recovery_file, limit=None):
+    """Lee los bloques del archivo de recuperación JSONL de a uno (sin cargarlo entero)."""
+    if not os.path.exists(recovery_file):
+        return
+    with open(recovery_file, "r", encoding="utf-8") as f:
+        n = 0
+        for line in f:
+            if limit is not None and n >= limit:
+                break
+            if line.strip():
+                n += 1
+                yield json.loads(line)
+
+def build_from_recovery(recovery_file, output_filename, source_name,
+                        questions_per_page=DEFAULT_QUESTIONS_PER_PAGE, transform=None):
+    """
+    Reconstruye el examen desde el archivo de recuperación en una sola pasada.
+    'transform' (opcional) se aplica a cada bloque antes de escribirlo (p. ej. quitar duplicados).
+
+    Returns:
+        ExamWriter: Ya cerrado, con el total de bloques, preguntas y páginas.
+    """
+    with ExamWriter(output_filename, source_name, questions_per_page) as writer:
+        for batch in iter_recovery(recovery_file):
+            writer.write(transform(batch) if transform else batch)
+    return writer
+
+def open_in_browser(path):
+    """Abre el archivo en el navegador por defecto (Windows, macOS o Linux)."""
+    try:
+        webbrowser.open(pathlib.Path(path).resolve().as_uri())
+    except Exception as e:
+        print(f"No se pudo abrir el navegador: {e}")
@@ -1,42 +1,18 @@
-
-from pypdf import PdfReader
 import re
+import pdf_extract
 
-def extract_clean_text(pdf_path, output_txt_path):
+def extract_clean_text(pdf_path, output_txt_path, workers=None):
     print(f"Procesando: {pdf_path}")
-    reader = PdfReader(pdf_path)
     full_text = []
-    
-    total_pages = len(reader.pages)
-    print(f"Total de páginas: {total_pages}")
 
-    for i, page in enumerate(reader.pages):
-        text = page.extract_text()
-        
-        if text:
-            # Limpieza básica por página
-            lines = text.split('\n')
-            cleaned_lines = []
-            for line in lines:
-                # 1. Eliminar espacios en blanco extremos
-                line = line.strip()
-                
-                # 2. Saltar líneas que son solo números (números de página)
-                if line.isdigit():
-                    continue
-                
-                # 3. Saltar líneas muy cortas (ruido, letras sueltas) - ej: menos de 3 caracteres
-                if len(line) < 4:
-                    continue
-                
-                cleaned_lines.append(line)
-            
-            # Unir líneas limpias
-            page_content = "\n".join(cleaned_lines)
-            full_text.append(page_content)
+    # Extracción y limpieza por línea en paralelo (rangos de páginas en procesos),
+    # en orden de página y con caché por hash del archivo.
+    for i, text in enumerate(pdf_extract.iter_pages(pdf_path, workers=workers, clean=True)):
+        if text is not None:
+            full_text.append(text)
         
         if (i + 1) % 50 == 0:
-            print(f"Procesado {i + 1}/{total_pages} páginas...")
+            print(f"Procesado {i + 1} páginas...")
 
     # Guardar todo en un solo txt
     final_content = "\n\n".join(full_text)
@@ -0,0 +1,155 @@
+"""
+Servidor HTTP que imita la API /api/chat de Ollama, para probar y medir el
+generador de exámenes sin GPU ni modelo real.
+
+    python fake_ollama_server.py --port 11435 --delay 1.5 --parallel 4
+    set OLLAMA_HOST=http://127.0.0.1:11435   (o --host en generate_quiz.py)
+
+Cada respuesta es un cuestionario válido cuyo texto cita el inicio del fragmento
+recibido, para poder verificar que los resultados quedan en el orden correcto.
+
+Las duraciones siguen a Ollama: 'total_duration' incluye la espera por un slot,
+'prompt_eval_duration' es el prefill simulado (--prompt-tps) y 'eval_duration' el
+resto del servicio. La espera en cola va aparte en 'queue_duration' (campo propio
+de este servidor, Ollama no lo informa).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def fake_quiz(chunk_text):
+    """Cuestionario con el formato de SYSTEM_PROMPT, derivado del fragmento."""
+    head = chunk_text[:40]
+    return {
+        "multiple_choice": [
+            {
+                "question": f"¿Qué afirma el texto que empieza con '{head}'? ({k + 1})",
+                "options": ["A) Uno", "B) Dos", "C) Tres", "D) Cuatro"],
+                "answer": "B",
+                "explanation": "Respuesta simulada."
+            }
+            for k in range(3)
+        ],
+        "open_ended": {
+            "question": f"Sintetiza el fragmento '{head}'.",
+            "key_points": ["Punto clave 1", "Punto clave 2"]
+        }
+    }
+
+def extract_chunk(messages):
+    """Recupera el fragmento del mensaje de usuario armado por question_generator."""
+    content = messages[-1].get('content', '') if messages else ''
+    parts = content.split("---\n")
+    return parts[1].rsplit("\n", 1)[0] if len(parts) >= 3 else content
+
+def extract_batch(messages):
+    """Fragmentos de un mensaje de lote ('TEXTO n:' de question_generator.build_batch_message)."""
+    content = messages[-1].get('content', '') if messages else ''
+    return re.findall(r'TEXTO \d+:\n---\n(.*?)\n---', content, re.DOTALL)
+
+def garble(content):
+    """Respuesta mal formada típica: texto alrededor del JSON o JSON cortado a la mitad."""
+    if random.random() < 0.5:
+        return f"Claro, aquí tienes el cuestionario:\n```json\n{content}\n```\nEspero que sirva."
+    return content[:len(content) * 2 // 3]
+
+def make_handler(delay, jitter, slots, fail_rate, prompt_tps=0.0, garble_rate=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if self.path != '/api/chat':
+                self.send_error(404)
+                return
+
+            messages = body.get('messages', [])
+            # Todo el prompt (sistema + usuario) cuenta, como en Ollama
+            prompt_tokens = sum(len(m.get('content', '')) for m in messages) // 4
+            batch = extract_batch(messages) if '"blocks"' in (messages[0].get('content', '') if messages else '') else None
+
+            # Los 'slots' emulan OLLAMA_NUM_PARALLEL: el resto espera en cola
+            t0 = time.perf_counter()
+            with slots:
+                t_start = time.perf_counter()
+                prefill = prompt_tokens / prompt_tps if prompt_tps else 0.0
+                time.sleep(max(0.0, delay + prefill + random.uniform(-jitter, jitter)))
+
+            if random.random() < fail_rate:
+                content = "Lo siento, no puedo generar el JSON."
+            elif batch is not None:
+                blocks = [dict(fake_quiz(chunk), id=i) for i, chunk in enumerate(batch, 1)]
+                content = json.dumps({"blocks": blocks}, ensure_ascii=False)
+            else:
+                content = json.dumps(fake_quiz(extract_chunk(messages)), ensure_ascii=False)
+            if random.random() < garble_rate:
+                content = garble(content)
+
+            t_end = time.perf_counter()
+            total_ns = int((t_end - t0) * 1e9)
+            queue_ns = int((t_start - t0) * 1e9)
+            prefill_ns = min(int(prefill * 1e9), int((t_end - t_start) * 1e9))
+            payload = {
+                "model": body.get('model', ''),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "message": {"role": "assistant", "content": content},
+                "done": True,
+                "done_reason": "stop",
+                "total_duration": total_ns,
+                "load_duration": 0,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": prefill_ns,
+                "eval_count": len(content) // 4,
+                "eval_duration": max(1, total_ns - queue_ns - prefill_ns),
+                "queue_duration": queue_ns,
+            }
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def start_server(port=0, delay=1.0, jitter=0.0, parallel=4, fail_rate=0.0, prompt_tps=0.0, garble_rate=0.0):
+    """
+    Arranca el servidor en un hilo de fondo.
+
+    Returns:
+        tuple: (servidor, url). Detener con servidor.shutdown().
+    """
+    handler = make_handler(delay, jitter, threading.Semaphore(max(1, parallel)), fail_rate, prompt_tps, garble_rate)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor Ollama simulado.")
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--delay', type=float, default=1.0, help="Segundos por respuesta.")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--parallel', type=int, default=4, help="Peticiones atendidas a la vez.")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Fracción de respuestas no-JSON.")
+    parser.add_argument('--garble-rate', type=float, default=0.0,
+                        help="Fracción de respuestas con texto extra alrededor del JSON o cortadas.")
+    parser.add_argument('--prompt-tps', type=float, default=0.0,
+                        help="Tokens de prompt procesados por segundo (0 = el prompt no suma tiempo).")
+    args = parser.parse_args()
+
+    server, url = start_server(args.port, args.delay, args.jitter, args.parallel, args.fail_rate, args.prompt_tps,
+                               args.garble_rate)
+    print(f"Servidor Ollama simulado en {url} (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,61 @@
+import pandas as pd
+
+# Orden de la cascada de filtros del sidebar: (columna, datasets a los que aplica)
+NIVELES_CASCADA = [
+    ('departamento', ('bdpi', 'minas')),
+    ('provincia', ('bdpi', 'minas')),
+    ('distrito', ('bdpi', 'minas')),
+    ('unidad_minera', ('minas',)),
+    ('nombre_cp', ('bdpi',)),
+]
+
+def opciones_nivel(bdpi, minas, idx_bdpi, idx_minas, columna):
+    """
+    Devuelve la lista ordenada de valores únicos de 'columna' entre las filas
+    ya filtradas de ambos datasets (solo los que tienen esa columna).
+    """
+    valores = set()
+    for df, idx in ((bdpi, idx_bdpi), (minas, idx_minas)):
+        if df is not None and columna in df.columns:
+            valores.update(df.loc[idx, columna].dropna().unique())
+    return sorted(valores)
+
+def filtrar_nivel(df, idx, columna, seleccion):
+    """
+    Refina los índices 'idx' de 'df' a las filas cuyo valor en 'columna' está en 'seleccion'.
+    Selección vacía = no filtra.
+    """
+    if not seleccion or df is None or columna not in df.columns:
+        return idx
+    valores = df.loc[idx, columna]
+    return valores.index[valores.isin(seleccion)]
+
+def aplicar_cascada(bdpi, minas, selecciones):
+    """
+    Aplica toda la cascada de filtros sin interfaz (útil para benchmarks y scripts).
+
+    Args:
+        bdpi, minas (GeoDataFrame): Datos completos.
+        selecciones (dict): {columna: lista de valores seleccionados}.
+
+    Returns:
+        tuple: (bdpi_filtrado, minas_filtrado, opciones) donde 'opciones' es
+        {columna: lista de opciones ofrecidas en ese nivel}.
+    """
+    idx_bdpi = bdpi.index if bdpi is not None else pd.Index([])
+    idx_minas = minas.index if minas is not None else pd.Index([])
+    opciones = {}
+
+    for columna, datasets in NIVELES_CASCADA:
+        opciones[columna] = opciones_nivel(
+            bdpi if 'bdpi' in datasets else None,
+            minas if 'minas' in datasets else None,
+            idx_bdpi, idx_minas, columna
+        )
+        seleccion = selecciones.get(columna)
+        if 'bdpi' in datasets:
+            idx_bdpi = filtrar_nivel(bdpi, idx_bdpi, columna, seleccion)
+        if 'minas' in datasets:
+            idx_minas = filtrar_nivel(minas, idx_minas, columna, seleccion)
+
+    return bdpi.loc[idx_bdpi].copy(), minas.loc[idx_minas].copy(), opciones
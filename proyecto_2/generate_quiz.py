@@ -4,142 +4,224 @@ import os
 import sys
 import json
 import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 import input_handler
 import question_generator
+import llm_cache
+import exam_writer
+import llm_metrics
 
-def save_intermediate_progress(batch_data, recovery_file):
-    """Guarda un lote de preguntas en un archivo JSONL (una línea por bloque)."""
+class DocumentReadError(Exception):
+    """Error leyendo o segmentando el texto de entrada (PDF, TXT o transcripción)."""
+
+def _guard_read(chunks):
+    """Entrega los bloques tal cual; un error al producirlos sale como DocumentReadError."""
+    try:
+        yield from chunks
+    except Exception as e:
+        raise DocumentReadError(e) from e
+
+def save_intermediate_progress(batch_data, recovery_file, chunk_key=None):
+    """
+    Guarda un lote de preguntas en un archivo JSONL (una línea por bloque).
+    'chunk_key' (hash del fragmento) se anota en paralelo en '<recovery>.keys'
+    para poder validar la recuperación si el documento o la segmentación cambian.
+    """
     with open(recovery_file, "a", encoding="utf-8") as f:
         f.write(json.dumps(batch_data, ensure_ascii=False) + "\n")
+    if chunk_key is not None:
+        with open(recovery_file + ".keys", "a", encoding="utf-8") as f:
+            f.write(chunk_key + "\n")
 
-def load_recovery(recovery_file):
-    """Carga el progreso previo si existe."""
+def count_recovery(recovery_file):
+    """Cantidad de bloques ya procesados en el archivo de recuperación (se lee línea a línea)."""
     if not os.path.exists(recovery_file):
-        return []
+        return 0
     
-    recovered_data = []
     print(f"--> ¡Encontrado archivo de recuperación! {recovery_file}")
     try:
         with open(recovery_file, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    recovered_data.append(json.loads(line))
-        print(f"--> Se recuperaron {len(recovered_data)} bloques ya procesados. Saltando...")
-        return recovered_data
+            recovered = sum(1 for line in f if line.strip())
+        print(f"--> Se recuperaron {recovered} bloques ya procesados. Saltando...")
+        return recovered
     except Exception as e:
         print(f"--> Error leyendo recuperación: {e}. Se empezará de cero.")
-        return []
-
-def save_to_html(quiz_data, output_filename, source_name):
-    """Genera un archivo HTML interactivo con las preguntas, robusto a errores."""
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="es">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Examen: {source_name}</title>
-        <style>
-            body {{ font-family: 'Segoe UI', sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; background-color: #f5f5f5; }}
-            .quiz-container {{ background: white; padding: 30px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
-            h1 {{ color: #2c3e50; text-align: center; }}
-            .question-card {{ border-bottom: 1px solid #eee; padding: 20px 0; }}
-            .question-text {{ font-size: 1.1em; font-weight: 600; color: #34495e; }}
-            .options {{ margin-top: 10px; }}
-            .option {{ display: block; margin: 5px 0; padding: 10px; background: #f8f9fa; border: 1px solid #ddd; border-radius: 5px; cursor: pointer; transition: 0.2s; }}
-            .option:hover {{ background: #e9ecef; }}
-            .answer-key {{ display: none; margin-top: 10px; padding: 10px; background-color: #d4edda; color: #155724; border-radius: 5px; }}
-            .show-btn {{ background-color: #007bff; color: white; border: none; padding: 5px 15px; border-radius: 4px; cursor: pointer; margin-top: 10px; font-size: 0.9em; }}
-            .show-btn:hover {{ background-color: #0056b3; }}
-            .open-question {{ background-color: #fff3cd; border: 1px solid #ffeeba; padding: 15px; border-radius: 5px; margin-top: 20px; }}
-            .error-card {{ background-color: #ffe6e6; padding: 10px; border: 1px solid #ffcccc; color: #cc0000; display: none; }}
-        </style>
-        <script>
-            function toggleAnswer(id) {{
-                var x = document.getElementById(id);
-                if (x.style.display === "none") {{ x.style.display = "block"; }} else {{ x.style.display = "none"; }}
-            }}
-        </script>
-    </head>
-    <body>
-        <div class="quiz-container">
-            <h1>Examen Generado con IA</h1>
-            <p>Fuente: <strong>{source_name}</strong></p>
-            <hr>
+        return 0
+
+def save_key_only(recovery_file, chunk_key):
+    with open(recovery_file + ".keys", "a", encoding="utf-8") as f:
+        f.write(chunk_key + "\n")
+
+def load_recovery_keys(recovery_file):
+    """Hashes de los fragmentos ya procesados, o None si la recuperación es de formato antiguo."""
+    keys_file = recovery_file + ".keys"
+    if not os.path.exists(keys_file):
+        return None
+    with open(keys_file, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def truncate_recovery(recovery_file, keep, keys):
+    """Reescribe la recuperación dejando solo los primeros 'keep' bloques (el prefijo todavía válido)."""
+    tmp = recovery_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as out:
+        for batch in exam_writer.iter_recovery(recovery_file, limit=keep):
+            out.write(json.dumps(batch, ensure_ascii=False) + "\n")
+    os.replace(tmp, recovery_file)
+    with open(recovery_file + ".keys", "w", encoding="utf-8") as f:
+        for key in keys:
+            f.write(key + "\n")
+
+def failed_recovery_blocks(recovery_file):
+    """Posiciones de los bloques guardados vacíos (la generación falló) en la recuperación."""
+    return {i for i, batch in enumerate(exam_writer.iter_recovery(recovery_file)) if not batch}
+
+def patch_recovery(recovery_file, replacements):
+    """Reemplaza los bloques {posición: bloque} de la recuperación (reescritura en una pasada)."""
+    tmp = recovery_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as out:
+        for i, batch in enumerate(exam_writer.iter_recovery(recovery_file)):
+            out.write(json.dumps(replacements.get(i, batch), ensure_ascii=False) + "\n")
+    os.replace(tmp, recovery_file)
+
+def retry_failed_blocks(queue, recovery_file, args, cache=None, num_ctx=None, metrics=None):
     """
-    
-    count = 1
-    for i, batch in enumerate(quiz_data):
-        if not batch: continue
-        
-        # Multiple Choice
-        if 'multiple_choice' in batch:
-            for q in batch['multiple_choice']:
-                # VALIDATION: Ensure q is a dictionary
-                if not isinstance(q, dict):
-                    continue
+    Cola de reintentos: al final de la generación vuelve a pedir los bloques que
+    fallaron (el servidor pudo estar saturado o el modelo respondió mal varias veces)
+    y los guarda en su posición de la recuperación. Los que sigan fallando quedan
+    vacíos y se reintentan en la próxima ejecución.
 
-                # SAFETY CHECK: Si la IA alucinó y no puso 'options', saltamos o ponemos default
-                options = q.get('options', [])
-                if not options:
-                    continue # Saltamos preguntas mal formadas
-                
-                q_id = f"q_{count}"
-                options_html = ""
-                for opt in options:
-                    options_html += f"<label class='option'><input type='radio' name='{q_id}'> {opt}</label>"
-                
-                html_content += f"""
-                <div class="question-card">
-                    <div class="question-text">{count}. {q.get('question', 'Pregunta sin texto')}</div>
-                    <div class="options">{options_html}</div>
-                    <button class="show-btn" onclick="toggleAnswer('ans_{q_id}')">Ver Respuesta</button>
-                    <div id="ans_{q_id}" class="answer-key">
-                        <strong>Correcta:</strong> {q.get('answer', '?')}<br>
-                        <em>{q.get('explanation', '')}</em>
-                    </div>
-                </div>
-                """
-                count += 1
-        
-        # Open Ended
-        if 'open_ended' in batch:
-            oq = batch.get('open_ended', {})
-            if oq and 'question' in oq:
-                html_content += f"""
-                <div class="open-question">
-                    <strong>Pregunta de Desarrollo {i+1}:</strong><br>
-                    {oq.get('question', '')}
-                    <br><br>
-                    <details>
-                        <summary>Ver Puntos Clave Sugeridos</summary>
-                        <ul>
-                            {''.join([f'<li>{p}</li>' for p in oq.get('key_points', [])])}
-                        </ul>
-                    </details>
-                </div>
-                """
-
-    html_content += """
-        </div>
-    </body>
-    </html>
+    Args:
+        queue (list): [(posición, fragmento, clave)] de los bloques fallidos.
+
+    Returns:
+        int: Bloques recuperados.
     """
-    
-    try:
-        with open(output_filename, "w", encoding="utf-8") as f:
-            f.write(html_content)
-        print(f"\n¡Examen guardado en HTML! -> {output_filename}")
-        os.startfile(output_filename) # Abrir automáticamente
-    except Exception as e:
-        print(f"Error escribiendo archivo HTML: {e}")
+    client = question_generator.get_client(host=args.host, timeout=args.timeout)
+
+    def attempt(item):
+        _, chunk, key = item
+        quiz_data = question_generator.generate_with_retry(
+            chunk, model=args.model, client=client, retries=args.retries, num_ctx=num_ctx,
+            metrics=metrics, prior_attempts=args.retries + 1, deferred=True
+        )
+        if cache is not None:
+            cache.put(key, args.model, quiz_data)
+        return quiz_data
+
+    replacements = {}
+    pending = list(queue)
+    for round_number in range(1, args.retry_failed + 1):
+        if not pending:
+            break
+        print(f"\n   Cola de reintentos (ronda {round_number}): {len(pending)} bloques fallidos...")
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            results = list(pool.map(attempt, pending))
+        still_failing = []
+        for item, quiz_data in zip(pending, results):
+            if quiz_data:
+                replacements[item[0]] = quiz_data
+            else:
+                still_failing.append(item)
+        pending = still_failing
+
+    if replacements:
+        patch_recovery(recovery_file, replacements)
+    print(f"   Cola de reintentos: {len(replacements)} de {len(queue)} bloques recuperados"
+          + (f"; {len(pending)} siguen vacíos (se reintentarán en la próxima ejecución)" if pending else ""))
+    return len(replacements)
+
+class QuestionDeduper:
+    """
+    Quita de cada bloque las preguntas casi idénticas a otra ya vista (misma pregunta
+    reformulada en bloques distintos). Compara enunciado + opciones con MinHash de
+    3 palabras. Se aplica bloque a bloque, así sirve mientras se escribe el examen;
+    no modifica los bloques recibidos (la recuperación conserva todo lo generado).
+    """
+
+    def __init__(self, threshold=0.8):
+        self.mc_index = input_handler.NearDuplicateIndex(threshold=threshold, k=3)
+        self.open_index = input_handler.NearDuplicateIndex(threshold=threshold, k=3)
+        self.removed = 0
+
+    def __call__(self, batch):
+        if not isinstance(batch, dict) or not batch:
+            return batch
+        batch = dict(batch)
+        if isinstance(batch.get('multiple_choice'), list):
+            kept = []
+            for q in batch['multiple_choice']:
+                if isinstance(q, dict):
+                    options = q.get('options') if isinstance(q.get('options'), list) else []
+                    text = f"{q.get('question', '')} {' '.join(map(str, options))}"
+                    if self.mc_index.find(text) is not None:
+                        self.removed += 1
+                        continue
+                    self.mc_index.add(text)
+                kept.append(q)
+            batch['multiple_choice'] = kept
+        oq = batch.get('open_ended')
+        if isinstance(oq, dict) and oq.get('question'):
+            if self.open_index.find(oq['question']) is not None:
+                del batch['open_ended']
+                self.removed += 1
+            else:
+                self.open_index.add(oq['question'])
+        return batch
+
+def add_quiz_arguments(parser):
+    """Opciones de generación (compartidas con pipeline.py)."""
+    parser.add_argument('--model', default="llama3")
+    parser.add_argument('--workers', type=int, default=2,
+                        help="Peticiones simultáneas a Ollama (ver OLLAMA_NUM_PARALLEL en el servidor).")
+    parser.add_argument('--retries', type=int, default=2, help="Reintentos por bloque si la respuesta falla.")
+    parser.add_argument('--retry-failed', type=int, default=1,
+                        help="Rondas de la cola de reintentos al final para los bloques que fallaron (0 = ninguna).")
+    parser.add_argument('--timeout', type=float, default=300, help="Segundos máximos por petición.")
+    parser.add_argument('--host', default=None, help="Servidor Ollama (por defecto OLLAMA_HOST o local).")
+    parser.add_argument('--cache', default=llm_cache.DEFAULT_CACHE_PATH,
+                        help="Caché SQLite de respuestas, compartida entre documentos.")
+    parser.add_argument('--cache-max-mb', type=float, default=llm_cache.DEFAULT_MAX_BYTES / (1024 * 1024))
+    parser.add_argument('--no-cache', action='store_true', help="No consultar ni guardar en la caché.")
+    parser.add_argument('--chunker', choices=['tokens', 'chars'], default='tokens',
+                        help="Segmentar por presupuesto de tokens (por defecto) o por caracteres (3000/300).")
+    parser.add_argument('--num-ctx', type=int, default=4096,
+                        help="Ventana de contexto del modelo en tokens (se pasa a Ollama como num_ctx).")
+    parser.add_argument('--max-tokens', type=int, default=None,
+                        help="Tope de tokens por bloque (por defecto, lo que cabe en --num-ctx).")
+    parser.add_argument('--chars-per-token', type=float, default=None,
+                        help="Caracteres por token para estimar los bloques en lugar de tiktoken "
+                             "(el valor medido aparece en el resumen de llm_metrics.py).")
+    parser.add_argument('--response-tokens', type=int, default=1024,
+                        help="Tokens reservados para la respuesta JSON del modelo.")
+    parser.add_argument('--batch', action='store_true',
+                        help="Agrupar varios bloques cortos por petición (hasta llenar --num-ctx).")
+    parser.add_argument('--dedup-threshold', type=float, default=0.8,
+                        help="Similitud (0-1) a partir de la cual un bloque o pregunta se considera repetido.")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="No omitir bloques ni preguntas casi duplicados.")
+    parser.add_argument('--questions-per-page', type=int, default=exam_writer.DEFAULT_QUESTIONS_PER_PAGE,
+                        help="Preguntas por página del examen HTML (las demás van en páginas enlazadas).")
+    parser.add_argument('--no-open', action='store_true', help="No abrir el examen en el navegador al terminar.")
+    parser.add_argument('--metrics', default=None,
+                        help="Archivo JSONL de métricas por petición (por defecto '<documento>.metrics.jsonl').")
+    parser.add_argument('--no-metrics', action='store_true', help="No registrar métricas de generación.")
+    return parser
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un examen HTML a partir de un PDF o TXT usando Ollama.")
+    parser.add_argument('path', nargs='?', help="Documento PDF/TXT. Si se omite, se abre el selector de archivos.")
+    add_quiz_arguments(parser)
+    return parser.parse_args(argv)
 
-def main():
+def main(argv=None):
+    args = parse_args(argv)
     print("--- GENERADOR DE EXÁMENES PROFUNDOS (GPU) - MODO SEGURO ---")
     
-    # 1. Obtener archivo
-    target_path = input_handler.get_input_target_simple()
+    # 1. Obtener archivo (argumento / arrastrar y soltar, o selector)
+    target_path = args.path or input_handler.get_input_target_simple()
     if not target_path:
         # Fallback manual
         from tkinter import Tk, filedialog
@@ -152,51 +234,194 @@ def main():
         print("No se seleccionó archivo.")
         return
 
+    # 1-2. Extracción, limpieza y segmentación en streaming: los bloques se generan
+    # página a página en un hilo de fondo y la IA empieza con el primero sin esperar
+    # al resto del documento.
+    print(f"\n1. Cargando en streaming: {os.path.basename(target_path)}")
+    try:
+        generate_exam(input_handler.iter_document(target_path), target_path, args)
+    except DocumentReadError:
+        # El motivo ya se informó; los demás errores salen con su traza
+        sys.exit(1)
+
+def generate_exam(pieces, target_path, args, flush_pieces=False):
+    """
+    Segmenta, genera y escribe el examen a partir de un texto que llega por partes
+    ('pieces': páginas, bloques de archivo o segmentos de una transcripción en curso).
+    'target_path' da nombre a la recuperación, las métricas y el HTML: con el mismo
+    texto, generate_quiz.py y pipeline.py comparten recuperación y caché.
+    Con 'flush_pieces' los bloques se cierran en los bordes de las partes (ver
+    input_handler.iter_token_chunks).
+    """
     # Archivo de recuperación basado en el nombre del input
     recovery_filename = f"{target_path}.recovery.jsonl"
+    num_ctx = None
+    if args.chunker == 'tokens':
+        # Cada bloque ocupa lo que queda del contexto tras el prompt y la respuesta
+        count_tokens = lambda text: input_handler.estimate_tokens(text, args.chars_per_token)
+        budget = input_handler.chunk_token_budget(
+            args.num_ctx, question_generator.prompt_overhead_tokens(count_tokens),
+            response_tokens=args.response_tokens
+        )
+        if args.max_tokens:
+            budget = min(budget, args.max_tokens)
+        num_ctx = args.num_ctx
+        print(f"2. Segmentando documento por tokens (~{budget} por bloque, contexto {num_ctx}) a medida que se lee...")
+        segmented = input_handler.iter_token_chunks(
+            pieces, max_tokens=budget, overlap_tokens=min(100, budget // 10), flush_pieces=flush_pieces,
+            chars_per_token=args.chars_per_token
+        )
+    else:
+        print("2. Segmentando documento (Estrategia de Barrido) a medida que se lee...")
+        segmented = input_handler.iter_chunks(pieces, chunk_size=3000, overlap=300)
+    # Los bloques casi idénticos a uno anterior (encabezados, texto legal repetido) no se envían
+    dedup_stats = {}
+    if not args.no_dedup:
+        segmented = input_handler.iter_unique_chunks(segmented, threshold=args.dedup_threshold, stats=dedup_stats)
+    chunks = input_handler.prefetch(segmented, maxsize=2 * max(1, args.workers))
 
-    print(f"\n1. Cargando: {os.path.basename(target_path)}")
-    text_content = input_handler.load_document(target_path)
-    
-    print("\n2. Segmentando documento (Estrategia de Barrido)...")
-    chunks = input_handler.chunk_text(text_content, chunk_size=3000, overlap=300)
-    total_chunks = len(chunks)
-    print(f"-> Se generaron {total_chunks} bloques de estudio.")
-    
-    if total_chunks == 0:
+    # Cargar progreso previo. Cada bloque recuperado se valida contra el hash del
+    # fragmento actual; desde el primero que no coincide se vuelve a generar.
+    recovered = count_recovery(recovery_filename)
+    recovered_keys = load_recovery_keys(recovery_filename)
+    # Los bloques que quedaron vacíos en ejecuciones anteriores vuelven a la cola de reintentos
+    recovered_failed = failed_recovery_blocks(recovery_filename) if recovered else set()
+    cache = None if args.no_cache else llm_cache.LLMCache(args.cache, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    pending_keys = deque()
+    retry_queue = []
+    # 'complete': el texto se leyó hasta su final real (no se cortó por un error)
+    state = {'valid': recovered, 'total': 0, 'complete': False}
+
+    def chunks_to_generate():
+        for i, chunk in enumerate(_guard_read(chunks)):
+            state['total'] = i + 1
+            key = llm_cache.make_key(chunk, args.model, question_generator.SYSTEM_PROMPT)
+            if i < state['valid']:
+                if recovered_keys is None:
+                    # Recuperación antigua sin hashes: se confía en la posición
+                    save_key_only(recovery_filename, key)
+                    if i in recovered_failed:
+                        retry_queue.append((i, chunk, key))
+                    continue
+                if i < len(recovered_keys) and recovered_keys[i] == key:
+                    if i in recovered_failed:
+                        retry_queue.append((i, chunk, key))
+                    continue
+                print(f"\n--> El bloque {i+1} cambió (documento, segmentación o modelo). "
+                      f"Se regenera desde aquí.")
+                truncate_recovery(recovery_filename, i, recovered_keys[:i])
+                state['valid'] = i
+            pending_keys.append((i, chunk, key))
+            yield chunk
+        state['complete'] = True
+
+    metrics = None
+    if not args.no_metrics:
+        metrics = llm_metrics.MetricsRecorder(
+            args.metrics or f"{target_path}.metrics.jsonl", chunker=args.chunker, workers=args.workers,
+            batch=args.batch, num_ctx=num_ctx or (args.num_ctx if args.batch else None)
+        )
+
+    print(f"\n3. Generando preguntas con IA (Ollama/{args.model}, {args.workers} en paralelo)...")
+    if state['valid']:
+        print(f"   Retomando después del bloque {state['valid']} (si el documento no cambió)")
+    print("   (Las preguntas se guardan automáticamente por seguridad)\n")
+
+    # Los resultados llegan en orden de bloque.
+    results = question_generator.generate_concurrently(
+        chunks_to_generate(), model=args.model, workers=args.workers,
+        retries=args.retries, timeout=args.timeout, host=args.host, cache=cache, num_ctx=num_ctx,
+        batch_ctx=args.num_ctx if args.batch else None, metrics=metrics
+    )
+    # El examen se escribe a medida que llegan los bloques (se puede abrir y recargar durante la generación)
+    output_filename = f"EXAMEN_{os.path.basename(target_path)}.html"
+    source_name = os.path.basename(target_path)
+    deduper = None if args.no_dedup else QuestionDeduper(args.dedup_threshold)
+    writer = None
+    generated = 0
+    try:
+        for quiz_batch in tqdm(results, unit="bloque"):
+            # Aunque falle/venga vacío, lo guardamos (como Dict vacío) para avanzar el índice
+            # y no quedarnos en bucle infinito en un bloque malo; el bloque pasa a la cola de reintentos.
+            item = pending_keys.popleft()
+            if not quiz_batch:
+                quiz_batch = {}
+                retry_queue.append(item)
+        
+            save_intermediate_progress(quiz_batch, recovery_filename, item[2])
+            if writer is None:
+                # Con el primer bloque nuevo el prefijo recuperado ya está validado: va primero al examen
+                writer = exam_writer.ExamWriter(output_filename, source_name, args.questions_per_page)
+                print(f"   Examen parcial en {output_filename} (recargar en el navegador para ver el avance)")
+                for batch in exam_writer.iter_recovery(recovery_filename, limit=state['valid']):
+                    writer.write(deduper(batch) if deduper else batch)
+            writer.write(deduper(quiz_batch) if deduper else quiz_batch)
+            generated += 1
+    except Exception as e:
+        # Lo ya generado queda en la recuperación (se escribe bloque a bloque) y no se
+        # recorta: la próxima ejecución retoma desde ahí. El error sigue hacia arriba.
+        if isinstance(e, DocumentReadError):
+            print(f"\nError leyendo {os.path.basename(target_path)}: {e}")
+        else:
+            print(f"\nError generando el examen de {os.path.basename(target_path)}: {e}")
+        print(f"   Se conservan los {state['valid'] + generated} bloques de {recovery_filename}; "
+              f"vuelve a ejecutar para continuar.")
+        for resource in (writer, cache, metrics):
+            if resource is not None:
+                resource.close()
+        raise
+
+    if state['total'] == 0:
         print("El documento parece vacío.")
         return
-
-    # Cargar progreso previo
-    all_quiz_data = load_recovery(recovery_filename)
-    start_index = len(all_quiz_data)
-    
-    if start_index >= total_chunks:
+    if state['complete'] and state['total'] < state['valid']:
+        # El documento ahora es más corto que la recuperación (y se leyó hasta el final)
+        truncate_recovery(recovery_filename, state['total'], (load_recovery_keys(recovery_filename) or [])[:state['total']])
+        retry_queue = [item for item in retry_queue if item[0] < state['total']]
+    if generated == 0:
         print("\n¡Parece que este documento ya fue procesado completamente!")
         print("Generando HTML directamente...")
-    else:
-        print(f"\n3. Generando preguntas con IA (Ollama/Llama3)...")
-        print(f"   Retomando desde el bloque {start_index+1}/{total_chunks}")
-        print("   (Las preguntas se guardan automáticamente por seguridad)\n")
-        
-        # Iterar desde donde nos quedamos
-        for i in tqdm(range(start_index, total_chunks), unit="bloque"):
-            chunk = chunks[i]
-            quiz_batch = question_generator.generate_questions_from_chunk(chunk)
-            
-            # Aunque falle/venga vacío, lo guardamos (como None/Dict vacío) para avanzar el índice
-            # y no quedarnos en bucle infinito en un bloque malo.
-            if not quiz_batch:
-                quiz_batch = {} 
-            
-            all_quiz_data.append(quiz_batch)
-            save_intermediate_progress(quiz_batch, recovery_filename)
-    
-    print(f"\n4. Finalizado. Procesados {len(all_quiz_data)} bloques.")
+
+    late = 0
+    if retry_queue and args.retry_failed > 0:
+        late = retry_failed_blocks(retry_queue, recovery_filename, args, cache=cache,
+                                   num_ctx=num_ctx or (args.num_ctx if args.batch else None), metrics=metrics)
+    elif retry_queue:
+        print(f"\n   {len(retry_queue)} bloques fallidos quedan vacíos (--retry-failed 0).")
     
-    # Exportar
-    output_filename = f"EXAMEN_{os.path.basename(target_path)}.html"
-    save_to_html(all_quiz_data, output_filename, os.path.basename(target_path))
+    # Exportar: cerrar el examen en vivo, o reconstruirlo desde la recuperación en una pasada
+    # (también si la cola de reintentos completó bloques que en el examen en vivo quedaron vacíos)
+    try:
+        if writer is not None:
+            writer.close()
+        if writer is None or late:
+            deduper = None if args.no_dedup else QuestionDeduper(args.dedup_threshold)
+            writer = exam_writer.build_from_recovery(recovery_filename, output_filename, source_name,
+                                                     args.questions_per_page, transform=deduper)
+    except Exception as e:
+        print(f"Error escribiendo archivo HTML: {e}")
+        return
+
+    print(f"\n4. Finalizado. Procesados {writer.blocks} bloques ({generated} nuevos).")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"   Caché: {stats['hits']} aciertos, {stats['misses']} fallos "
+              f"({stats['hit_rate']:.0%}); {stats['entries']} entradas, {stats['bytes'] / 1e6:.1f} MB")
+        cache.close()
+    if metrics is not None:
+        summary = metrics.summary()
+        if summary:
+            print(llm_metrics.format_summary(summary))
+            print(f"   Métricas por petición en {metrics.path} (ejecución {metrics.run_id})")
+        metrics.close()
+    if deduper is not None:
+        print(f"   Duplicados: {dedup_stats.get('skipped', 0)} bloques omitidos antes de generar, "
+              f"{deduper.removed} preguntas repetidas quitadas del examen")
+
+    print(f"\n¡Examen guardado en HTML! -> {output_filename} "
+          f"({writer.questions} preguntas, {writer.page} página{'s' if writer.page > 1 else ''})")
+    if not args.no_open:
+        exam_writer.open_in_browser(output_filename)
     
     # Opcional: Limpiar recovery si todo salió bien
     # os.remove(recovery_filename) 
@@ -1,12 +1,16 @@
 
 import os
-from pypdf import PdfReader
 import re
-import tkinter as tk
-from tkinter import filedialog
+import queue
+import random
+import threading
+import zlib
 
 def get_input_target_simple():
     """Abre un diálogo para seleccionar PDF o TXT."""
+    # tkinter solo se carga si hace falta el diálogo (las ejecuciones con ruta no lo tocan)
+    import tkinter as tk
+    from tkinter import filedialog
     root = tk.Tk()
     root.withdraw()
     file_path = filedialog.askopenfilename(
@@ -22,14 +26,10 @@ def clean_text_basic(text):
     return text
 
 def load_text_from_pdf(pdf_path):
-    """Extrae texto crudo de un PDF."""
+    """Extrae texto crudo de un PDF (en paralelo y con caché, ver pdf_extract)."""
+    import pdf_extract  # pypdf solo para PDFs
     try:
-        reader = PdfReader(pdf_path)
-        full_text = []
-        for page in reader.pages:
-            t = page.extract_text()
-            if t:
-                full_text.append(t)
+        full_text = [t for t in pdf_extract.iter_pages(pdf_path) if t]
         return "\n".join(full_text)
     except Exception as e:
         print(f"Error leyendo PDF {pdf_path}: {e}")
@@ -50,51 +50,501 @@ def load_document(path):
         print(f"Formato no soportado: {ext}")
         return ""
 
+def iter_pdf_pages(pdf_path):
+    """
+    Genera el texto de cada página del PDF a medida que se extrae (omite páginas vacías).
+    Un error de lectura se propaga: cortar el texto en silencio haría que el
+    documento parezca más corto de lo que es.
+    """
+    import pdf_extract
+    try:
+        for t in pdf_extract.iter_pages(pdf_path):
+            if t:
+                yield t
+    except Exception as e:
+        print(f"Error leyendo PDF {pdf_path}: {e}")
+        raise
+
+def iter_document(path, block_size=1024 * 1024):
+    """
+    Versión en streaming de load_document: genera trozos de texto cuya
+    concatenación es igual al string que devolvería load_document.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No existe: {path}")
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        for i, page in enumerate(iter_pdf_pages(path)):
+            # load_text_from_pdf une las páginas con "\n"
+            yield page if i == 0 else "\n" + page
+    elif ext == ".txt":
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                yield block
+    else:
+        print(f"Formato no soportado: {ext}")
+
+def _chunk_end(text, start, chunk_size, is_last):
+    """
+    Fin del bloque que empieza en 'start'. Si no es el final del texto, intenta
+    cortar en un punto (o espacio) dentro de los últimos 100 caracteres.
+    """
+    end = start + chunk_size
+    if not is_last:
+        # Buscar el último punto en el rango para cortar bien
+        # Buscamos en los últimos 100 caracteres del chunk ideal
+        search_window = text[end-100:end]
+        last_period = search_window.rfind('.')
+
+        if last_period != -1:
+            # Ajustar el final al periodo encontrado
+            end = (end - 100) + last_period + 1
+        else:
+            # Si no hay punto, buscar espacio
+            last_space = search_window.rfind(' ')
+            if last_space != -1:
+                end = (end - 100) + last_space
+    return end
+
+def iter_chunks(pieces, chunk_size=2000, overlap=200):
+    """
+    Limpia y divide en bloques un texto que llega por partes (páginas, bloques de archivo),
+    con las mismas reglas que chunk_text aunque un bloque cruce el borde entre páginas.
+    Solo mantiene en memoria el texto desde el inicio del bloque actual.
+    """
+    buf = ""        # Texto limpio pendiente (desde 'offset' en el documento completo)
+    offset = 0
+    start = 0
+    first = True
+
+    for piece in pieces:
+        piece = re.sub(r'\s+', ' ', piece)
+        if first:
+            piece = piece.lstrip()
+            if piece:
+                first = False
+        if buf.endswith(' ') and piece.startswith(' '):
+            piece = piece[1:]
+        buf += piece
+
+        # Un bloque se puede cerrar cuando después de su fin ideal hay al menos un
+        # carácter que no es espacio: entonces seguro no es el final del texto.
+        while offset + len(buf) >= start + chunk_size + 2:
+            end = _chunk_end(buf, start - offset, chunk_size, is_last=False) + offset
+            yield buf[start - offset:end - offset]
+            # Avanzar el inicio, pero retrocediendo el overlap
+            new_start = end - overlap
+            # Seguridad para evitar bucles infinitos si overlap >= chunk_size
+            if new_start >= end:
+                new_start = end
+            start = new_start
+            buf = buf[start - offset:]
+            offset = start
+
+    # Resto del documento: ya se conoce el largo final
+    buf = buf.rstrip()
+    text_len = offset + len(buf)
+    while start < text_len:
+        end = _chunk_end(buf, start - offset, chunk_size, is_last=start + chunk_size >= text_len) + offset
+        yield buf[start - offset:end - offset]
+        new_start = end - overlap
+        if new_start >= end:
+            new_start = end
+        start = new_start
+
+def prefetch(iterable, maxsize=4):
+    """
+    Consume 'iterable' en un hilo de fondo y entrega sus elementos a través de
+    una cola acotada: la extracción del PDF sigue avanzando mientras el hilo
+    principal espera respuestas del LLM, sin acumular más de 'maxsize' elementos.
+    """
+    q = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+
+    def producer():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                q.put(item)
+        except Exception as e:
+            q.put(e)
+        finally:
+            q.put(done)
+
+    threading.Thread(target=producer, daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # Desbloquear al productor si quedó esperando espacio en la cola
+        while not q.empty():
+            q.get_nowait()
+
+# Estimación de tokens cuando no hay tokenizador local: caracteres por token.
+# Valor conservador para español con tokenizadores tipo Llama 3 (sobreestima un poco,
+# así los bloques no se pasan del contexto). Se puede cambiar por el valor medido
+# (calibrate_chars_per_token, ver 'llm_metrics.py') con --chars-per-token.
+CHARS_PER_TOKEN = 3.2
+
+_tokenizer_lock = threading.Lock()
+_tokenizer = {}
+
+def get_tokenizer():
+    """
+    Tokenizador local opcional (tiktoken, parecido al de Llama 3), o None si no está
+    instalado. Se carga en el primer uso y no al importar: get_encoding puede
+    descargar el vocabulario, y el divisor por caracteres no lo necesita.
+    """
+    if 'encoding' not in _tokenizer:
+        with _tokenizer_lock:
+            if 'encoding' not in _tokenizer:
+                try:
+                    import tiktoken
+                    _tokenizer['encoding'] = tiktoken.get_encoding("cl100k_base")
+                except Exception:
+                    _tokenizer['encoding'] = None
+    return _tokenizer['encoding']
+
+def estimate_tokens(text, chars_per_token=None):
+    """Tokens de 'text': exactos con tiktoken si está disponible, si no, estimados por caracteres."""
+    tokenizer = get_tokenizer() if chars_per_token is None else None
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, disallowed_special=()))
+    return int(len(text) / (chars_per_token or CHARS_PER_TOKEN)) + 1
+
+def calibrate_chars_per_token(samples):
+    """
+    Calcula la relación caracteres/token a partir de pares (caracteres del fragmento,
+    tokens medidos), por ejemplo el 'prompt_eval_count' que devuelve Ollama para cada
+    fragmento. Esos tokens incluyen la parte fija del prompt (sistema, plantilla), así
+    que se usa la pendiente de una regresión lineal y no el cociente directo.
+    Sin fragmentos de largos distintos no se puede estimar: retorna None.
+    """
+    samples = [(c, n) for c, n in samples if c and n]
+    if len(samples) < 2:
+        return None
+    mean_c = sum(c for c, _ in samples) / len(samples)
+    mean_n = sum(n for _, n in samples) / len(samples)
+    var_c = sum((c - mean_c) ** 2 for c, _ in samples)
+    cov = sum((c - mean_c) * (n - mean_n) for c, n in samples)
+    if not var_c or cov <= 0:
+        return None
+    return var_c / cov
+
+def chunk_token_budget(num_ctx, prompt_overhead_tokens, response_tokens=1024):
+    """
+    Tokens disponibles para el fragmento: contexto del modelo menos el prompt de
+    sistema/instrucciones y lo reservado para la respuesta JSON.
+    """
+    return max(256, num_ctx - prompt_overhead_tokens - response_tokens)
+
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_SENTENCE_RE = re.compile(r'(?<=[.!?…:;])\s+')
+
+def _iter_paragraphs(pieces, max_chars=None, piece_breaks=False):
+    """
+    Tramos (texto, termina_párrafo, termina_parte) de un texto que llega por partes.
+
+    Los párrafos se separan por líneas en blanco. Además, el borde de cada parte
+    (página del PDF, segmento de la transcripción) es un corte suave: se entrega lo
+    pendiente hasta la última oración completa, y nunca se acumulan más de
+    'max_chars' caracteres (se corta en el último espacio). Así un texto sin líneas
+    en blanco también sale a medida que se lee. En cada parte solo se busca en el
+    texto nuevo. Con 'piece_breaks' el borde de cada parte es además fin de párrafo
+    y se entrega todo lo pendiente.
+    """
+    pending = ""
+    for piece in pieces:
+        # Los cortes pueden empezar en el espacio final de lo que ya estaba pendiente
+        search_from = len(pending.rstrip())
+        pending += piece
+        last = 0
+        for m in _PARAGRAPH_RE.finditer(pending, search_from):
+            yield pending[last:m.start()], True, False
+            last = m.end()
+        if last:
+            pending = pending[last:]
+            search_from = 0
+        if piece_breaks:
+            yield pending, True, True
+            pending = ""
+            continue
+        cut = None
+        for m in _SENTENCE_RE.finditer(pending, search_from):
+            cut = m
+        if cut is not None:
+            yield pending[:cut.start()], False, False
+            pending = pending[cut.end():]
+        if max_chars and len(pending) > max_chars:
+            space = pending.rfind(' ')
+            space = space if space > 0 else len(pending)
+            yield pending[:space], False, False
+            pending = pending[space:]
+    yield pending, True, True
+
+def _split_long(sentence, max_tokens, count):
+    """Parte por palabras una oración más larga que el presupuesto."""
+    current, used = [], 0
+    for word in sentence.split(' '):
+        n = count(word + ' ')
+        if current and used + n > max_tokens:
+            yield ' '.join(current)
+            current, used = [], 0
+        current.append(word)
+        used += n
+    if current:
+        yield ' '.join(current)
+
+def iter_token_chunks(pieces, max_tokens=1500, overlap_tokens=100, min_fill=0.75, count_tokens=None,
+                      flush_pieces=False, chars_per_token=None):
+    """
+    Divide en bloques de hasta 'max_tokens' tokens respetando oraciones y párrafos.
+
+    Se llenan los bloques oración a oración; si al cerrar un bloque hubo un corte de
+    párrafo después de 'min_fill' del presupuesto, se corta ahí en lugar de en la
+    última oración. Las últimas oraciones (hasta 'overlap_tokens') se repiten al
+    inicio del bloque siguiente para no perder contexto. Con 'flush_pieces' el bloque
+    también se cierra al final de cada parte si ya tiene 'min_fill' del presupuesto
+    (segmentos de una transcripción en curso: no esperan al segmento siguiente).
+
+    Args:
+        pieces (iterable[str]): Texto por partes (ver iter_document).
+        max_tokens (int): Presupuesto de tokens por bloque (ver chunk_token_budget).
+        overlap_tokens (int): Tokens repetidos entre bloques consecutivos.
+        min_fill (float): Fracción mínima del presupuesto para preferir un corte de párrafo.
+        count_tokens (callable): Contador de tokens; por defecto estimate_tokens.
+        flush_pieces (bool): Cerrar bloques en los bordes de las partes.
+        chars_per_token (float): Estimar los tokens con esta relación en lugar de tiktoken/CHARS_PER_TOKEN.
+    """
+    count = count_tokens or (lambda text: estimate_tokens(text, chars_per_token))
+    # Texto pendiente acotado a unas pocas veces el presupuesto (ver _iter_paragraphs)
+    max_chars = int(max_tokens * (chars_per_token or CHARS_PER_TOKEN) * 2)
+    sentences = []          # [(texto, tokens, es_fin_de_parrafo)]
+    total = 0
+    carried = 0             # oraciones al inicio de 'sentences' que ya salieron en el bloque anterior
+
+    def emit(n, incoming):
+        """
+        Emite las primeras n oraciones y deja el solapamiento al inicio del siguiente
+        bloque ('incoming' = tokens de la oración que se va a agregar).
+        """
+        nonlocal sentences, total, carried
+        chunk = ' '.join(text for text, _, _ in sentences[:n])
+        rest = sentences[n:]
+        overlap, ov_tokens = [], 0
+        for sent in reversed(sentences[:n]):
+            if ov_tokens + sent[1] > overlap_tokens:
+                break
+            overlap.insert(0, sent)
+            ov_tokens += sent[1]
+        sentences = overlap + rest
+        carried = len(overlap)
+        total = sum(t for _, t, _ in sentences)
+        # Si el solapamiento no deja lugar para lo que sigue, se descarta
+        if overlap and total + incoming > max_tokens:
+            sentences = rest
+            carried = 0
+            total = sum(t for _, t, _ in sentences)
+        return chunk
+
+    for paragraph, paragraph_end, piece_end in _iter_paragraphs(pieces, max_chars, flush_pieces):
+        paragraph = clean_text_basic(paragraph)
+        parts = _SENTENCE_RE.split(paragraph) if paragraph else []
+        for k, sentence in enumerate(parts):
+            # Se cuenta con el espacio que las une dentro del bloque
+            n = count(sentence + ' ')
+            pieces_ = [sentence] if n <= max_tokens else list(_split_long(sentence, max_tokens, count))
+            for j, piece in enumerate(pieces_):
+                n = count(piece + ' ') if len(pieces_) > 1 else n
+                while len(sentences) > carried and total + n > max_tokens:
+                    # Preferir el último fin de párrafo si el bloque ya está suficientemente lleno
+                    cut = len(sentences)
+                    acc = 0
+                    for idx, (_, t, end_par) in enumerate(sentences):
+                        acc += t
+                        if end_par and idx >= carried and acc >= min_fill * max_tokens:
+                            cut = idx + 1
+                    yield emit(cut, n)
+                if total + n > max_tokens:
+                    # Solo queda solapamiento y no cabe junto a la oración nueva
+                    sentences, total, carried = [], 0, 0
+                is_par_end = paragraph_end and (k == len(parts) - 1) and (j == len(pieces_) - 1)
+                sentences.append((piece, n, is_par_end))
+                total += n
+        if flush_pieces and piece_end and total - sum(t for _, t, _ in sentences[:carried]) >= min_fill * max_tokens:
+            yield emit(len(sentences), 0)
+
+    # Último bloque (si no es solo el solapamiento del anterior)
+    if len(sentences) > carried:
+        yield ' '.join(text for text, _, _ in sentences)
+
+def count_llm_calls(path, chunk_size=3000, overlap=300, max_tokens=1500, overlap_tokens=100, chars_per_token=None):
+    """
+    Compara cuántas llamadas al LLM requiere un documento con el divisor por
+    caracteres (chunk_text) y con el divisor por tokens (iter_token_chunks).
+    """
+    char_chunks = list(iter_chunks(iter_document(path), chunk_size=chunk_size, overlap=overlap))
+    token_chunks = list(iter_token_chunks(iter_document(path), max_tokens=max_tokens, overlap_tokens=overlap_tokens,
+                                          chars_per_token=chars_per_token))
+    char_tokens = [estimate_tokens(c, chars_per_token) for c in char_chunks]
+    token_tokens = [estimate_tokens(c, chars_per_token) for c in token_chunks]
+    return {
+        'llamadas_caracteres': len(char_chunks),
+        'llamadas_tokens': len(token_chunks),
+        'llamadas_ahorradas': len(char_chunks) - len(token_chunks),
+        'tokens_promedio_caracteres': sum(char_tokens) / len(char_tokens) if char_tokens else 0,
+        'tokens_promedio_tokens': sum(token_tokens) / len(token_tokens) if token_tokens else 0,
+        'tokens_max_tokens': max(token_tokens, default=0),
+        'tokenizador': (f'estimado ({chars_per_token} car/token)' if chars_per_token else
+                        'tiktoken' if get_tokenizer() is not None else f'estimado ({CHARS_PER_TOKEN} car/token)'),
+    }
+
+# --- Detección de casi-duplicados (MinHash sobre shingles de palabras) ---
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r'\w+')
+
+def _minhash_params(num_perm, seed=1):
+    """Coeficientes (a, b) de las permutaciones h(x) = (a*x + b) mod p. Fijos por semilla."""
+    rng = random.Random(seed)
+    return [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+def shingle_hashes(text, k=5):
+    """Conjunto de hashes de los k-gramas de palabras (en minúsculas) del texto."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))} if words else set()
+    return {zlib.crc32(' '.join(words[i:i + k]).encode('utf-8')) for i in range(len(words) - k + 1)}
+
+def minhash_signature(text, num_perm=64, k=5, params=None):
+    """
+    Firma MinHash del texto: la fracción de posiciones iguales entre dos firmas
+    estima la similitud de Jaccard de sus shingles. None si el texto no tiene palabras.
+    """
+    hashes = shingle_hashes(text, k)
+    if not hashes:
+        return None
+    params = params or _minhash_params(num_perm)
+    return tuple(min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes) for a, b in params)
+
+def signature_similarity(sig_a, sig_b):
+    """Similitud de Jaccard estimada entre dos firmas MinHash."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+class NearDuplicateIndex:
+    """
+    Índice LSH de firmas MinHash: encuentra textos casi iguales a uno ya visto
+    sin compararlo contra todos (solo contra los que comparten alguna banda).
+
+    Uso:
+        index = NearDuplicateIndex(threshold=0.8)
+        dup = index.find(texto)     # posición del texto parecido ya agregado, o None
+        index.add(texto)
+    """
+
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, k=5):
+        self.threshold = threshold
+        self.k = k
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._params = _minhash_params(self.rows * bands)
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = []
+
+    def signature(self, text):
+        return minhash_signature(text, k=self.k, params=self._params)
+
+    def _band_keys(self, sig):
+        return [sig[b * self.rows:(b + 1) * self.rows] for b in range(self.bands)]
+
+    def find(self, text, sig=None):
+        """Posición del texto agregado más parecido con similitud >= threshold, o None."""
+        sig = sig or self.signature(text)
+        if sig is None:
+            return None
+        best, best_sim = None, self.threshold
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            candidates.update(bucket.get(key, ()))
+        for idx in sorted(candidates):
+            sim = signature_similarity(sig, self._signatures[idx])
+            if sim >= best_sim:
+                best, best_sim = idx, sim
+        return best
+
+    def add(self, text, sig=None):
+        """Agrega el texto al índice y devuelve su posición."""
+        sig = sig or self.signature(text)
+        idx = len(self._signatures)
+        self._signatures.append(sig)
+        if sig is not None:
+            for bucket, key in zip(self._buckets, self._band_keys(sig)):
+                bucket.setdefault(key, []).append(idx)
+        return idx
+
+def iter_unique_chunks(chunks, threshold=0.8, stats=None, **index_kwargs):
+    """
+    Omite los bloques casi idénticos (similitud >= threshold) a uno anterior:
+    encabezados y texto legal repetidos, secciones duplicadas. El solapamiento
+    normal entre bloques consecutivos queda muy por debajo del umbral.
+
+    'stats' (dict opcional) acumula 'kept' y 'skipped' para informar al final.
+    """
+    index = NearDuplicateIndex(threshold=threshold, **index_kwargs)
+    if stats is not None:
+        stats.setdefault('kept', 0)
+        stats.setdefault('skipped', 0)
+    for chunk in chunks:
+        sig = index.signature(chunk)
+        if sig is not None and index.find(chunk, sig) is not None:
+            if stats is not None:
+                stats['skipped'] += 1
+            continue
+        index.add(chunk, sig)
+        if stats is not None:
+            stats['kept'] += 1
+        yield chunk
+
 def chunk_text(text, chunk_size=2000, overlap=200):
     """
     Divide el texto en bloques de aproximadamente 'chunk_size' caracteres.
     'overlap' asegura que no se corte contexto importante entre bloques.
     """
-    text = clean_text_basic(text)
-    if not text:
-        return []
-    
-    chunks = []
-    start = 0
-    text_len = len(text)
-    
-    while start < text_len:
-        end = start + chunk_size
-        
-        # Si no es el final, intentar cortar en un punto y seguido o espacio
-        if end < text_len:
-            # Buscar el último punto en el rango para cortar bien
-            # Buscamos en los últimos 100 caracteres del chunk ideal
-            search_window = text[end-100:end] 
-            last_period = search_window.rfind('.')
-            
-            if last_period != -1:
-                # Ajustar el final al periodo encontrado
-                end = (end - 100) + last_period + 1
-            else:
-                # Si no hay punto, buscar espacio
-                last_space = search_window.rfind(' ')
-                if last_space != -1:
-                    end = (end - 100) + last_space
-        
-        chunk = text[start:end]
-        chunks.append(chunk)
-        
-        # Avanzar el inicio, pero retrocediendo el overlap
-        start = end - overlap
-        
-        # Seguridad para evitar bucles infinitos si overlap >= chunk_size
-        if start >= end:
-            start = end
-            
-    return chunks
+    return list(iter_chunks([text], chunk_size=chunk_size, overlap=overlap))
 
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        # python input_handler.py documento.pdf [num_ctx] [caracteres_por_token]
+        # Compara las llamadas al LLM del divisor por caracteres y del divisor por tokens.
+        import question_generator
+        num_ctx = int(sys.argv[2]) if len(sys.argv) > 2 else 4096
+        chars_per_token = float(sys.argv[3]) if len(sys.argv) > 3 else None
+        budget = chunk_token_budget(
+            num_ctx, question_generator.prompt_overhead_tokens(lambda t: estimate_tokens(t, chars_per_token))
+        )
+        report = count_llm_calls(sys.argv[1], max_tokens=budget, chars_per_token=chars_per_token)
+        print(f"Contexto {num_ctx} -> presupuesto por bloque: {budget} tokens ({report['tokenizador']})")
+        print(f"Caracteres (3000/300): {report['llamadas_caracteres']} llamadas, "
+              f"~{report['tokens_promedio_caracteres']:.0f} tokens por bloque")
+        print(f"Tokens:                {report['llamadas_tokens']} llamadas, "
+              f"~{report['tokens_promedio_tokens']:.0f} tokens por bloque (máx. {report['tokens_max_tokens']})")
+        print(f"Llamadas ahorradas: {report['llamadas_ahorradas']}")
+        sys.exit(0)
+
     # Prueba rápida
     test_path = "Compendio.pdf"
     if os.path.exists(test_path):
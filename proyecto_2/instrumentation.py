@@ -0,0 +1,80 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+LOGGER_NAME = "monitor_minero.timing"
+
+def get_logger():
+    """Logger de tiempos con un handler propio (Streamlit no configura el root a nivel INFO)."""
+    logger = logging.getLogger(LOGGER_NAME)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+class RerunTimer:
+    """
+    Tramos de tiempo con nombre y tamaños de payload para una ejecución (rerun) del script.
+    Solo usa time.perf_counter y un dict, así que puede quedar activo en producción.
+
+    Uso:
+        timer = RerunTimer()
+        with timer.span("analisis"):
+            ...
+        timer.size("minas", len(minas))
+        timer.log()
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.spans = {}
+        self.sizes = {}
+        self._open = {}
+
+    @contextmanager
+    def span(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Si un tramo se repite en el mismo rerun, se acumula
+            self.spans[name] = self.spans.get(name, 0.0) + (time.perf_counter() - t0)
+
+    def start(self, name):
+        """Abre un tramo sin bloque 'with' (útil en scripts planos como app.py)."""
+        self._open[name] = time.perf_counter()
+
+    def stop(self, name):
+        t0 = self._open.pop(name, None)
+        if t0 is not None:
+            self.spans[name] = self.spans.get(name, 0.0) + (time.perf_counter() - t0)
+
+    def size(self, name, value):
+        self.sizes[name] = value
+
+    def total(self):
+        return time.perf_counter() - self._start
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total() * 1000, 2),
+            'spans_ms': {k: round(v * 1000, 2) for k, v in self.spans.items()},
+            'sizes': self.sizes,
+        }
+
+    def log(self):
+        """Emite una línea de log estructurada (JSON) con todos los tramos."""
+        get_logger().info(json.dumps(self.as_dict(), ensure_ascii=False, default=str))
+
+    def rows(self):
+        """Filas para mostrar en una tabla: (tramo, ms, % del total)."""
+        total = self.total()
+        return [
+            {'Tramo': name, 'ms': round(secs * 1000, 1),
+             '% rerun': round(100 * secs / total, 1) if total > 0 else 0.0}
+            for name, secs in self.spans.items()
+        ]
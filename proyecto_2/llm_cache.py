@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Compartida entre documentos y ejecuciones. Se puede cambiar con QUIZ_CACHE_PATH.
+DEFAULT_CACHE_PATH = os.environ.get(
+    "QUIZ_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "generador_examenes", "llm_cache.sqlite")
+)
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+def make_key(chunk_text, model, system_prompt):
+    """Hash del contenido: mismo texto + mismo modelo + mismo prompt = misma respuesta reutilizable."""
+    h = hashlib.sha256()
+    for part in (model, system_prompt, chunk_text):
+        h.update(part.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+class LLMCache:
+    """
+    Caché persistente (SQLite) de respuestas del LLM, direccionada por contenido.
+
+    No depende de la posición del fragmento en el documento: sirve aunque cambie
+    chunk_size/overlap, se edite el PDF o se procese otra edición del mismo texto.
+    Al superar 'max_bytes' se eliminan las entradas usadas hace más tiempo.
+    Es segura para usar desde varios hilos (generate_concurrently).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON entries(last_used)")
+        # Tamaño total llevado en memoria: cada put no vuelve a sumar la tabla
+        self._total = self._sum_sizes()
+
+    def _sum_sizes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key, *alternatives):
+        """
+        Devuelve el resultado guardado (dict) o None. Con 'alternatives' se prueban
+        también esas claves, en orden (cuenta como una sola consulta).
+        """
+        keys = (key,) + alternatives
+        with self._lock:
+            rows = dict(self._conn.execute(
+                f"SELECT key, result FROM entries WHERE key IN ({', '.join('?' * len(keys))})", keys
+            ).fetchall())
+            key = next((k for k in keys if k in rows), None)
+            if key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+                )
+        return json.loads(rows[key])
+
+    def put(self, key, model, result):
+        """Guarda un resultado válido. Los vacíos/None no se guardan (se reintentarán)."""
+        if not result:
+            return
+        data = json.dumps(result, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        now = time.time()
+        with self._lock, self._conn:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, model, result, size, created, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, model, data, size, now, now)
+            )
+            self._total += size - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Elimina las entradas menos usadas recientemente hasta quedar bajo el 90% del límite."""
+        # Se recalcula: otro proceso puede haber agregado o borrado entradas
+        total = self._sum_sizes()
+        if total <= self.max_bytes:
+            self._total = total
+            return
+        target = self.max_bytes * 0.9
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        self._total = total
+
+    def stats(self):
+        """Aciertos/fallos de esta sesión y tamaño actual de la caché."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,221 @@
+"""
+Métricas de generación del LLM a partir de los tiempos que devuelve Ollama.
+
+Cada petición y cada fragmento terminado se anotan como una línea JSON:
+
+    {"event": "request", "model": "llama3", "status": "ok", "attempt": 0,
+     "prompt_eval_count": 1203, "eval_count": 410, "eval_duration": 8.1e9, ...}
+    {"event": "chunk", "model": "llama3", "ok": true, "attempts": 1, "questions": 4, ...}
+
+Estados de una petición: ok, recovered (JSON rescatado de texto extra o de una
+respuesta cortada), parse_error, schema_error (JSON sin preguntas válidas) y
+request_error.
+
+Resumen de un archivo de métricas (por modelo):
+
+    python llm_metrics.py documento.pdf.metrics.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+import input_handler
+
+# Campos de tiempo/tokens de la respuesta de Ollama (duraciones en nanosegundos).
+# 'queue_duration' solo lo informa fake_ollama_server (espera por un slot).
+OLLAMA_FIELDS = ('total_duration', 'load_duration', 'prompt_eval_count', 'prompt_eval_duration',
+                 'eval_count', 'eval_duration', 'queue_duration')
+
+class MetricsRecorder:
+    """
+    Escribe los eventos en un JSONL (si se pasa 'path') y los guarda en memoria para
+    el resumen de la ejecución actual. Seguro para usar desde varios hilos.
+    """
+
+    def __init__(self, path=None, run_id=None, **run_info):
+        self.path = path
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.run_info = run_info
+        self.records = []
+        self._lock = threading.Lock()
+        self._file = None
+        if path:
+            dirname = os.path.dirname(path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, event, **fields):
+        rec = {'ts': round(time.time(), 3), 'run': self.run_id, 'event': event, **self.run_info, **fields}
+        with self._lock:
+            self.records.append(rec)
+            if self._file is not None:
+                self._file.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+    def record_response(self, model, response, status, wall_s, **fields):
+        """Petición a Ollama: copia los contadores/duraciones de la respuesta (si la hubo)."""
+        timings = {k: response.get(k) for k in OLLAMA_FIELDS} if response else {}
+        self.record('request', model=model, status=status, wall_s=round(wall_s, 4), **timings, **fields)
+
+    def summary(self):
+        with self._lock:
+            return summarize(list(self.records))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def percentile(values, q):
+    """Percentil q (0-100) por rango más cercano; None si no hay valores."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize(records):
+    """
+    Resumen por modelo: peticiones, fallos de parseo y de conexión, reintentos,
+    tasa de fallo por fragmento, tokens/seg y percentiles de latencia. También la
+    eficiencia del parseo y los reintentos: respuestas utilizables, reintentos (y
+    cola de reintentos) que terminaron bien y peticiones por pregunta utilizable, y
+    los caracteres por token medidos (ver input_handler.calibrate_chars_per_token).
+
+    Returns:
+        dict: {modelo: {...}}
+    """
+    models = {}
+    for rec in records:
+        m = models.setdefault(rec.get('model', '?'), {
+            'requests': 0, 'ok': 0, 'recovered': 0, 'parse_errors': 0, 'schema_errors': 0, 'request_errors': 0,
+            'chunks': 0, 'chunks_failed': 0, 'retries': 0, 'retried_chunks': 0, 'retried_ok': 0,
+            'deferred': 0, 'deferred_ok': 0, 'questions': 0, 'cache_hits': 0,
+            'prompt_tokens': 0, 'eval_tokens': 0, 'prompt_ns': 0, 'eval_ns': 0, 'latencies': [],
+            'token_samples': [],
+        })
+        event = rec.get('event')
+        if event == 'request':
+            m['requests'] += 1
+            status = rec.get('status')
+            if status in ('ok', 'recovered'):
+                m['ok'] += 1
+                if status == 'recovered':
+                    m['recovered'] += 1
+            elif status == 'parse_error':
+                m['parse_errors'] += 1
+            elif status == 'schema_error':
+                m['schema_errors'] += 1
+            else:
+                m['request_errors'] += 1
+            m['prompt_tokens'] += rec.get('prompt_eval_count') or 0
+            m['eval_tokens'] += rec.get('eval_count') or 0
+            m['prompt_ns'] += rec.get('prompt_eval_duration') or 0
+            m['eval_ns'] += rec.get('eval_duration') or 0
+            # Peticiones de un solo fragmento: el prompt fijo es siempre el mismo
+            if rec.get('chunks') == 1 and rec.get('prompt_eval_count'):
+                m['token_samples'].append((rec.get('chunk_chars'), rec['prompt_eval_count']))
+            # Latencia del servidor si la informó; si no, la medida en el cliente
+            total = rec.get('total_duration')
+            latency = total / 1e9 if total else rec.get('wall_s')
+            if latency is not None:
+                m['latencies'].append(latency)
+        elif event == 'chunk':
+            m['questions'] += rec.get('questions') or 0
+            if rec.get('deferred'):
+                # Cola de reintentos: el bloque ya se contó como fallido en su primera pasada
+                m['deferred'] += 1
+                m['deferred_ok'] += 1 if rec.get('ok') else 0
+                continue
+            m['chunks'] += 1
+            retries = max(0, (rec.get('attempts') or 1) - 1)
+            m['retries'] += retries
+            if retries:
+                m['retried_chunks'] += 1
+                m['retried_ok'] += 1 if rec.get('ok') else 0
+            if not rec.get('ok'):
+                m['chunks_failed'] += 1
+        elif event == 'cache_hit':
+            m['cache_hits'] += 1
+
+    result = {}
+    for model, m in models.items():
+        latencies = m.pop('latencies')
+        prompt_ns, eval_ns = m.pop('prompt_ns'), m.pop('eval_ns')
+        chars_per_token = input_handler.calibrate_chars_per_token(m.pop('token_samples'))
+        m['chars_per_token'] = round(chars_per_token, 2) if chars_per_token else None
+        m['eval_tokens_per_s'] = round(m['eval_tokens'] / (eval_ns / 1e9), 1) if eval_ns else None
+        m['prompt_tokens_per_s'] = round(m['prompt_tokens'] / (prompt_ns / 1e9), 1) if prompt_ns else None
+        answered = m['ok'] + m['parse_errors'] + m['schema_errors']
+        m['parse_failure_rate'] = round((m['parse_errors'] + m['schema_errors']) / m['requests'], 4) if m['requests'] else 0.0
+        m['parse_success_rate'] = round(m['ok'] / answered, 4) if answered else None
+        m['chunk_failure_rate'] = round(m['chunks_failed'] / m['chunks'], 4) if m['chunks'] else 0.0
+        m['retry_success_rate'] = round(m['retried_ok'] / m['retried_chunks'], 4) if m['retried_chunks'] else None
+        m['requests_per_question'] = round(m['requests'] / m['questions'], 3) if m['questions'] else None
+        for q in (50, 90, 99):
+            value = percentile(latencies, q)
+            m[f'latency_p{q}_s'] = round(value, 3) if value is not None else None
+        result[model] = m
+    return result
+
+def load_records(path, run=None):
+    """Eventos de un archivo de métricas (opcionalmente de una sola ejecución)."""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if run is None or rec.get('run') == run:
+                records.append(rec)
+    return records
+
+def format_summary(summary):
+    """Texto del resumen para imprimir en consola."""
+    lines = []
+    for model, m in summary.items():
+        tps = f"{m['eval_tokens_per_s']} tok/s" if m['eval_tokens_per_s'] is not None else "s/d"
+        lines.append(
+            f"   [{model}] {m['requests']} peticiones, {m['chunks']} bloques "
+            f"({m['cache_hits']} desde caché), generación {tps}, "
+            f"prompt {m['prompt_tokens']} tok / respuesta {m['eval_tokens']} tok"
+        )
+        if m['requests']:
+            lines.append(
+                f"   [{model}] latencia p50 {m['latency_p50_s']}s, p90 {m['latency_p90_s']}s, "
+                f"p99 {m['latency_p99_s']}s; JSON inválido {m['parse_failure_rate']:.1%}, "
+                f"errores de conexión {m['request_errors']}, reintentos {m['retries']}, "
+                f"bloques fallidos {m['chunk_failure_rate']:.1%}"
+            )
+        if m['parse_success_rate'] is not None:
+            retried = (f"{m['retried_ok']}/{m['retried_chunks']} bloques salvados por reintentos"
+                       if m['retried_chunks'] else "sin reintentos")
+            deferred = (f", cola de reintentos {m['deferred_ok']}/{m['deferred']}" if m['deferred'] else "")
+            per_question = (f"{m['requests_per_question']} peticiones por pregunta"
+                            if m['requests_per_question'] is not None else "ninguna pregunta utilizable")
+            lines.append(
+                f"   [{model}] JSON utilizable {m['parse_success_rate']:.1%} ({m['recovered']} rescatados), "
+                f"{retried}{deferred}; {per_question}"
+            )
+        if m['chars_per_token'] is not None:
+            lines.append(f"   [{model}] {m['chars_per_token']} caracteres por token (--chars-per-token)")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumen de un archivo de métricas del generador de exámenes.")
+    parser.add_argument('path')
+    parser.add_argument('--run', default=None, help="Solo la ejecución con este id.")
+    parser.add_argument('--json', action='store_true', help="Imprimir el resumen como JSON.")
+    args = parser.parse_args()
+
+    summary = summarize(load_records(args.path, run=args.run))
+    print(json.dumps(summary, indent=2, ensure_ascii=False) if args.json else format_summary(summary))
@@ -0,0 +1,106 @@
+import folium
+from folium.plugins import FastMarkerCluster
+from branca.colormap import LinearColormap
+
+# Centro aproximado de Perú
+PERU_CENTER = [-9.19, -75.015]
+
+def build_map(deps, bdpi_filtered, affected_locs_gdf, buffers_gdf, minas_filtered, show_all_locs=False,
+              dep_exposure=None):
+    """
+    Construye el mapa folium con todas las capas del monitor.
+
+    Args:
+        deps (GeoDataFrame): Polígonos de departamentos (puede ser None).
+        bdpi_filtered (GeoDataFrame): Localidades tras los filtros.
+        affected_locs_gdf (GeoDataFrame): Localidades afectadas.
+        buffers_gdf (GeoDataFrame): Polígonos de influencia, por mina o disueltos
+            (analysis.dissolved_influence_zone). Puede ser None.
+        minas_filtered (GeoDataFrame): Minas tras los filtros.
+        show_all_locs (bool): Si se dibuja el cluster con todas las localidades.
+        dep_exposure (GeoDataFrame): Salida de analysis.exposure_by_departamento. Si se
+            indica, los departamentos se dibujan como coropleta de población afectada.
+
+    Returns:
+        folium.Map
+    """
+    m = folium.Map(location=PERU_CENTER, zoom_start=5, tiles="CartoDB positron")
+
+    # 1. Capa Departamentos (coropleta de exposición o solo contornos)
+    if dep_exposure is not None and dep_exposure['poblacion_afectada'].max() > 0:
+        add_exposure_choropleth(m, dep_exposure)
+    elif deps is not None:
+        folium.GeoJson(
+            deps,
+            name="Departamentos",
+            style_function=lambda x: {'fillColor': '#ffffff00', 'color': 'gray', 'weight': 1}
+        ).add_to(m)
+
+    # 2. Capa Todas las Localidades (Opcional o Clustered)
+    if show_all_locs and not bdpi_filtered.empty:
+        # Usamos FastMarkerCluster para optimizar
+        FastMarkerCluster(
+            data=list(zip(bdpi_filtered.geometry.y, bdpi_filtered.geometry.x)),
+            name="Todas las Localidades (Filtradas)"
+        ).add_to(m)
+
+    # 3. Capa Localidades Afectadas (Puntos destacados)
+    if not affected_locs_gdf.empty:
+        # GeoJson con CircleMarker
+        folium.GeoJson(
+            affected_locs_gdf,
+            name="Localidades Afectadas",
+            marker=folium.CircleMarker(radius=3, fill_color="orange", fill_opacity=0.7, color="black", weight=0.5),
+            tooltip=folium.GeoJsonTooltip(fields=['nombre_cp', 'poblacion'], aliases=['Localidad:', 'Población:'])
+        ).add_to(m)
+
+    # 4. Capas Buffers
+    if buffers_gdf is not None:
+        folium.GeoJson(
+            buffers_gdf,
+            name="Radio de Influencia",
+            style_function=lambda x: {'fillColor': 'red', 'color': 'red', 'weight': 1, 'fillOpacity': 0.2}
+        ).add_to(m)
+
+    # 5. Capa Minas
+    if not minas_filtered.empty:
+        for idx, row in minas_filtered.iterrows():
+            folium.Marker(
+                location=[row.geometry.y, row.geometry.x],
+                popup=row['unidad_minera'],
+                icon=folium.Icon(color='red', icon='info-sign')
+            ).add_to(m)
+
+    folium.LayerControl().add_to(m)
+    return m
+
+def add_exposure_choropleth(m, dep_exposure, name_col='departamento'):
+    """Dibuja los departamentos coloreados según la población afectada."""
+    max_pop = float(dep_exposure['poblacion_afectada'].max())
+    colormap = LinearColormap(['#fff5eb', '#fdae6b', '#d94801'], vmin=0, vmax=max_pop)
+    colormap.caption = "Población afectada por departamento"
+
+    def style(feature):
+        pop = feature['properties']['poblacion_afectada']
+        return {
+            'fillColor': colormap(pop) if pop > 0 else '#ffffff00',
+            'color': 'gray', 'weight': 1, 'fillOpacity': 0.6
+        }
+
+    folium.GeoJson(
+        dep_exposure,
+        name="Exposición por Departamento",
+        style_function=style,
+        tooltip=folium.GeoJsonTooltip(
+            fields=[name_col, 'poblacion_afectada', 'localidades_afectadas'],
+            aliases=['Departamento:', 'Población afectada:', 'Localidades afectadas:']
+        )
+    ).add_to(m)
+    colormap.add_to(m)
+
+def rendered_payload_size(m):
+    """
+    Tamaño (en caracteres) del HTML/JS del mapa. Vuelve a renderizar la figura
+    completa, así que solo conviene llamarla cuando se quiere ver la medición.
+    """
+    return len(m.get_root().render())
@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+
+# Manifiesto en la carpeta escaneada: hashes de los archivos y qué transcripción salió de cada contenido
+MANIFEST_NAME = ".transcripciones.json"
+# Subcarpetas que no contienen grabaciones (checkpoints de audio_segments)
+SKIP_DIR_SUFFIXES = (".segments",)
+# Extensiones de audio y video reconocidas
+MEDIA_EXTENSIONS = {".mp4", ".mkv", ".avi", ".mov", ".mp3", ".wav", ".m4a", ".flac", ".ogg", ".wma"}
+
+# Carpeta -> (mtime_ns, {nombre sin extensión en minúsculas: [grabaciones]})
+_stem_groups_cache = {}
+
+def scan_media(root, extensions):
+    """
+    Recorre 'root' recursivamente con os.scandir (una sola pasada, sin un glob por
+    extensión) y devuelve los archivos multimedia con su tamaño y fecha de modificación.
+
+    Returns:
+        list: [(ruta, tamaño, mtime_ns)] ordenada por ruta.
+    """
+    found = []
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not entry.name.startswith(".") and not entry.name.endswith(SKIP_DIR_SUFFIXES):
+                                stack.append(entry.path)
+                        elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in extensions:
+                            st = entry.stat()
+                            found.append((entry.path, st.st_size, st.st_mtime_ns))
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"No se pudo leer {folder}: {e}")
+    found.sort()
+    return found
+
+def _stem_groups(folder):
+    """Grabaciones de 'folder' agrupadas por nombre sin extensión (se relee si la carpeta cambió)."""
+    try:
+        mtime_ns = os.stat(folder).st_mtime_ns
+    except OSError:
+        return {}
+    cached = _stem_groups_cache.get(folder)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    groups = {}
+    try:
+        with os.scandir(folder) as it:
+            for entry in it:
+                stem, ext = os.path.splitext(entry.name)
+                if ext.lower() in MEDIA_EXTENSIONS and entry.is_file():
+                    groups.setdefault(stem.lower(), []).append(entry.name)
+    except OSError:
+        return {}
+    for names in groups.values():
+        names.sort()
+    _stem_groups_cache[folder] = (mtime_ns, groups)
+    return groups
+
+def same_stem_media(media_path):
+    """
+    Nombres de las grabaciones de la misma carpeta con el mismo nombre y otra
+    extensión (clase.mp4 y clase.m4a), incluida esta; lista vacía si no hay otra.
+    """
+    folder, name = os.path.split(os.path.abspath(media_path))
+    names = _stem_groups(folder).get(os.path.splitext(name)[0].lower(), [])
+    return names if len(names) > 1 else []
+
+def output_base(media_path):
+    """
+    Ruta sin extensión de las salidas de una grabación (.txt, .srt, checkpoints):
+    '<carpeta>/<nombre>', o '<carpeta>/<nombre>.<ext>' si otra grabación de la
+    carpeta tiene el mismo nombre, para que cada una tenga su propia transcripción.
+    """
+    folder, name = os.path.split(media_path)
+    if same_stem_media(media_path):
+        return os.path.join(folder, name)
+    return os.path.join(folder, os.path.splitext(name)[0])
+
+def file_hash(path, block_size=4 * 1024 * 1024):
+    """SHA-256 del contenido del archivo (leído por bloques)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+def manifest_root(target_path):
+    """
+    Carpeta del manifiesto: la carpeta escaneada, o para un archivo suelto la
+    carpeta más cercana hacia arriba que ya tenga manifiesto (si no, la suya).
+    """
+    if os.path.isdir(target_path):
+        return target_path
+    folder = os.path.dirname(os.path.abspath(target_path))
+    current = folder
+    while True:
+        if os.path.exists(os.path.join(current, MANIFEST_NAME)):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return folder
+        current = parent
+
+class TranscriptManifest:
+    """
+    Caché de transcripciones por contenido, guardada como JSON en la carpeta raíz.
+
+    - 'files': hash de cada archivo, reutilizado mientras no cambien tamaño y fecha
+      (volver a escanear un archivo grande no lo vuelve a leer).
+    - 'outputs': de qué contenido (hash) y modelo salió cada .txt, para detectar
+      transcripciones viejas si la grabación cambió, y el largo de cada segmento.
+    - 'transcripts': hash + modelo -> .txt ya generado, para copiar la transcripción
+      de grabaciones renombradas o duplicadas en lugar de transcribirlas otra vez.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, MANIFEST_NAME)
+        self.data = {'files': {}, 'outputs': {}, 'transcripts': {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+                for key in self.data:
+                    self.data[key] = loaded.get(key, {})
+            except (OSError, ValueError) as e:
+                print(f"Manifiesto ilegible ({e}); se vuelve a crear.")
+        self._dirty = False
+
+    def _rel(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.root)).replace(os.sep, "/")
+
+    def _abs(self, rel):
+        return os.path.join(self.root, *rel.split("/"))
+
+    def media_hash(self, path, size, mtime_ns):
+        """Hash del contenido; se recalcula solo si cambió el tamaño o la fecha del archivo."""
+        rel = self._rel(path)
+        cached = self.data['files'].get(rel)
+        if cached and cached.get('size') == size and cached.get('mtime_ns') == mtime_ns:
+            return cached['hash']
+        digest = file_hash(path)
+        self.data['files'][rel] = {'size': size, 'mtime_ns': mtime_ns, 'hash': digest}
+        self._dirty = True
+        return digest
+
+    def output_source(self, txt_path):
+        """(hash, modelo) del que salió el .txt, o None si no está registrado."""
+        entry = self.data['outputs'].get(self._rel(txt_path))
+        return (entry['hash'], entry.get('model')) if entry else None
+
+    def output_segments(self, txt_path):
+        """Largo en caracteres de cada segmento del .txt, o None si no se transcribió por segmentos."""
+        entry = self.data['outputs'].get(self._rel(txt_path))
+        return entry.get('segments') if entry else None
+
+    def find_transcript(self, digest, model):
+        """Un .txt existente generado a partir del mismo contenido y modelo, o None."""
+        rel = self.data['transcripts'].get(f"{digest}:{model}")
+        if not rel:
+            return None
+        txt = self._abs(rel)
+        if os.path.exists(txt) and self.output_source(txt) == (digest, model):
+            return txt
+        return None
+
+    def record(self, digest, model, txt_path, segments=None):
+        """
+        Registra que 'txt_path' es la transcripción de ese contenido con ese modelo
+        ('segments': largo de cada segmento en el texto, si se transcribió por partes).
+        """
+        rel = self._rel(txt_path)
+        self.data['outputs'][rel] = {'hash': digest, 'model': model}
+        if segments:
+            self.data['outputs'][rel]['segments'] = segments
+        key = f"{digest}:{model}"
+        current = self.data['transcripts'].get(key)
+        if not current or self.find_transcript(digest, model) is None:
+            self.data['transcripts'][key] = rel
+        self._dirty = True
+
+    def prune(self, existing_paths):
+        """Olvida los hashes de archivos que ya no existen."""
+        keep = {self._rel(p) for p in existing_paths}
+        for rel in list(self.data['files']):
+            if rel not in keep:
+                del self.data['files'][rel]
+                self._dirty = True
+
+    def save(self):
+        """Guarda el manifiesto (escritura atómica) si hubo cambios."""
+        if not self._dirty:
+            return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError as e:
+            print(f"No se pudo guardar el manifiesto {self.path}: {e}")
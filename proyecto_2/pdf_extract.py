@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import itertools
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pypdf
+from pypdf import PdfReader
+
+# Texto extraído por hash del PDF: volver a procesar el mismo archivo no lo vuelve a leer.
+DEFAULT_CACHE_DIR = os.environ.get(
+    "PDF_TEXT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "generador_examenes", "pdf_text")
+)
+# Por debajo de esta cantidad de páginas no compensa arrancar procesos
+MIN_PAGES_PARALLEL = 40
+
+def file_hash(path, block_size=1024 * 1024):
+    """SHA-256 del contenido del archivo (leído por bloques)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+def clean_page_lines(text):
+    """
+    Limpieza por líneas de extract_pdf_content: quita números de página y
+    líneas muy cortas (ruido, letras sueltas).
+    """
+    cleaned_lines = []
+    for line in text.split('\n'):
+        # 1. Eliminar espacios en blanco extremos
+        line = line.strip()
+
+        # 2. Saltar líneas que son solo números (números de página)
+        if line.isdigit():
+            continue
+
+        # 3. Saltar líneas muy cortas (ruido, letras sueltas) - ej: menos de 3 caracteres
+        if len(line) < 4:
+            continue
+
+        cleaned_lines.append(line)
+    return "\n".join(cleaned_lines)
+
+def _iter_range(pdf_path, start, stop, clean):
+    reader = PdfReader(pdf_path)
+    for i in range(start, stop):
+        text = reader.pages[i].extract_text() or ""
+        if clean:
+            # None = página sin texto (distinto de una página que quedó vacía al limpiar)
+            text = clean_page_lines(text) if text else None
+        yield text
+
+def _extract_range(pdf_path, start, stop, clean):
+    """Extrae las páginas [start, stop). Se ejecuta en un proceso aparte."""
+    return list(_iter_range(pdf_path, start, stop, clean))
+
+def _cache_path(cache_dir, digest, clean):
+    mode = "clean" if clean else "raw"
+    return os.path.join(cache_dir, f"{digest}-{mode}-pypdf{pypdf.__version__}.json.gz")
+
+def _read_cache(path):
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class _CacheWriter:
+    """
+    Escribe la caché página a página (lista JSON dentro de un gzip) en un archivo
+    temporal que se renombra al terminar: no hace falta guardar el documento en
+    memoria, y una extracción interrumpida no deja una caché a medias.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.tmp = path + ".tmp"
+        self._file = gzip.open(self.tmp, "wt", encoding="utf-8")
+        self._file.write("[")
+        self._first = True
+
+    def add(self, text):
+        if not self._first:
+            self._file.write(",")
+        self._first = False
+        self._file.write(json.dumps(text, ensure_ascii=False))
+
+    def commit(self):
+        self._file.write("]")
+        self._file.close()
+        os.replace(self.tmp, self.path)
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp)
+        except OSError:
+            pass
+
+def iter_pages(pdf_path, workers=None, clean=False, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Genera el texto de cada página en orden (las páginas sin texto como "",
+    o None si clean=True).
+
+    Las páginas se reparten en rangos entre un pool de procesos (pypdf es CPU-bound).
+    Solo hay unos pocos rangos en curso a la vez (2 por proceso) y se entregan en
+    orden a medida que terminan, así el consumidor puede empezar antes de que se
+    extraiga todo el documento y la memoria no crece con el tamaño del PDF. El
+    resultado se guarda en disco por hash del archivo, a medida que se extrae, y la
+    siguiente vez se lee directo de la caché. Si el consumidor deja de leer, los
+    rangos pendientes se cancelan y no se guarda la caché.
+
+    Args:
+        pdf_path (str): Ruta del PDF.
+        workers (int): Procesos a usar (por defecto, todos los núcleos).
+        clean (bool): Aplicar clean_page_lines dentro de cada proceso.
+        cache_dir (str): Carpeta de caché; None para no usarla.
+    """
+    cache_file = None
+    if cache_dir:
+        cache_file = _cache_path(cache_dir, file_hash(pdf_path), clean)
+        cached = _read_cache(cache_file) if os.path.exists(cache_file) else None
+        if cached is not None:
+            yield from cached
+            return
+
+    total = len(PdfReader(pdf_path).pages)
+    workers = workers or os.cpu_count() or 1
+    writer = _CacheWriter(cache_file) if cache_file else None
+    pool = None
+    try:
+        if workers <= 1 or total < MIN_PAGES_PARALLEL:
+            for text in _iter_range(pdf_path, 0, total, clean):
+                if writer:
+                    writer.add(text)
+                yield text
+        else:
+            # Rangos más chicos que total/workers para repartir mejor la carga
+            step = max(1, -(-total // (workers * 4)))
+            ranges = iter([(start, min(start + step, total)) for start in range(0, total, step)])
+            pool = ProcessPoolExecutor(max_workers=workers)
+            in_flight = deque()
+            for start, stop in itertools.islice(ranges, workers * 2):
+                in_flight.append(pool.submit(_extract_range, pdf_path, start, stop, clean))
+            while in_flight:
+                texts = in_flight.popleft().result()
+                for start, stop in itertools.islice(ranges, 1):
+                    in_flight.append(pool.submit(_extract_range, pdf_path, start, stop, clean))
+                for text in texts:
+                    if writer:
+                        writer.add(text)
+                    yield text
+        if writer:
+            writer.commit()
+            writer = None
+    finally:
+        # Corte antes de terminar (GeneratorExit) o error: cancelar lo pendiente sin esperarlo
+        if writer:
+            writer.discard()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
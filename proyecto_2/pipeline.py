@@ -0,0 +1,96 @@
+"""
+Transcripción y examen en una sola pasada: los segmentos que va terminando Whisper
+entran directamente al segmentador y a la generación de preguntas a través de
+colas acotadas, así la transcripción (CPU) se superpone con el LLM (Ollama).
+
+    python pipeline.py clase.mp4 --whisper-model base --model llama3
+
+Comparte checkpoints y manifiesto con transcribe_videos.py, y recuperación y caché
+con generate_quiz.py (sobre el .txt de la transcripción): si se corta, al volver a
+ejecutarlo cada etapa retoma donde quedó.
+"""
+import argparse
+import os
+import sys
+import traceback
+from pathlib import Path
+
+import input_handler
+import generate_quiz
+import media_manifest
+import transcribe_videos
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe audio/video y genera el examen en paralelo.")
+    parser.add_argument('path', nargs='?', help="Archivo o carpeta. Si se omite, se abre el selector.")
+    parser.add_argument('--whisper-model', default="base", help="Tamaño del modelo Whisper.")
+    parser.add_argument('--threads', type=int, default=None, help="Hilos de torch para Whisper.")
+    parser.add_argument('--segment-minutes', type=float, default=5,
+                        help="Minutos por segmento de transcripción (cada uno pasa al examen al terminar).")
+    parser.add_argument('--timestamps', action='store_true',
+                        help="Guardar también '<nombre>.srt' con marcas de tiempo.")
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help="Segmentos transcritos que pueden esperar a la generación.")
+    generate_quiz.add_quiz_arguments(parser)
+    return parser.parse_args(argv)
+
+def process_media(video_path, get_model, manifest, args):
+    """
+    Transcribe 'video_path' y genera su examen a la vez: cada segmento que termina
+    Whisper pasa al segmentador, que cierra un bloque en el borde del segmento si ya
+    está suficientemente lleno, y la IA empieza sin esperar al resto de la grabación.
+    """
+    # Etapa 1 (hilo de fondo): Whisper -> cola acotada de segmentos de texto
+    pieces = input_handler.prefetch(
+        transcribe_videos.iter_transcript(
+            video_path, get_model, args.whisper_model, manifest,
+            segment_seconds=args.segment_minutes * 60, timestamps=args.timestamps
+        ),
+        maxsize=args.queue_size
+    )
+    # Etapa 2: segmentación y generación sobre el texto a medida que llega
+    generate_quiz.generate_exam(pieces, str(transcribe_videos.output_path_for(video_path)), args,
+                                flush_pieces=True)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print("--- TRANSCRIPCIÓN + EXAMEN ---")
+    target_path = transcribe_videos.get_input_target(args.path)
+    if not target_path or not os.path.exists(target_path):
+        print("No se seleccionó ninguna ruta válida.")
+        return
+
+    sys.stdout.reconfigure(encoding='utf-8')
+    media = transcribe_videos.find_media_files(target_path)
+    if not media:
+        print("No se encontraron archivos multimedia compatibles.")
+        return
+
+    manifest = media_manifest.TranscriptManifest(media_manifest.manifest_root(target_path))
+    loaded = {}
+
+    def get_model():
+        # El modelo se carga la primera vez que hace falta transcribir algo
+        if 'model' not in loaded:
+            print(f"\nCargando modelo Whisper '{args.whisper_model}'...")
+            loaded['model'] = transcribe_videos.load_model(args.whisper_model, args.threads)
+        return loaded['model']
+
+    failed = []
+    for video_path, _, _ in media:
+        print(f"\n=== {Path(video_path).name} ===")
+        try:
+            process_media(video_path, get_model, manifest, args)
+        except generate_quiz.DocumentReadError:
+            failed.append(video_path)
+        except Exception as e:
+            print(f"Error procesando {video_path}: {e}")
+            traceback.print_exc()
+            failed.append(video_path)
+    if failed:
+        print(f"\n{len(failed)} de {len(media)} archivos con errores: "
+              + ", ".join(Path(p).name for p in failed))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
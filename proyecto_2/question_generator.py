@@ -1,7 +1,12 @@
 
-import ollama
 import json
-import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import input_handler
+import llm_cache
+import quiz_json
 
 # Configuración del Prompt Maestro
 SYSTEM_PROMPT = """
@@ -31,44 +36,313 @@ FORMATO JSON ESPERADO:
 }
 """
 
-def generate_questions_from_chunk(chunk_text, model="llama3"):
+# Modo por lotes: varios fragmentos en una sola petición, un bloque de preguntas por fragmento
+BATCH_SYSTEM_PROMPT = """
+Eres un profesor universitario experto y exigente. Tu tarea es evaluar la comprensión profunda de varios textos.
+Recibirás varios textos numerados. Para CADA texto genera un cuestionario basado EXCLUSIVAMENTE en ese texto.
+
+REGLAS:
+1. Para cada texto, genera 3 preguntas de opción múltiple (Multiple Choice) difíciles.
+2. Para cada texto, genera 1 pregunta de desarrollo (Open Ended) que requiera síntesis.
+3. Devuelve exactamente un bloque por texto, con el mismo número ("id") del texto.
+4. El formato de salida debe ser JSON puro, sin texto adicional.
+
+FORMATO JSON ESPERADO:
+{
+  "blocks": [
+    {
+      "id": 1,
+      "multiple_choice": [
+        {
+          "question": "¿Pregunta 1?",
+          "options": ["A) ...", "B) ...", "C) ...", "D) ..."],
+          "answer": "B",
+          "explanation": "Explicación breve de por qué es la correcta."
+        },
+        ...
+      ],
+      "open_ended": {
+        "question": "¿Pregunta de desarrollo?",
+        "key_points": ["Punto clave 1", "Punto clave 2"]
+      }
+    },
+    ...
+  ]
+}
+"""
+
+# Tokens de respuesta reservados por cada bloque de un lote (3 preguntas + 1 de desarrollo)
+RESPONSE_TOKENS_PER_BLOCK = 600
+MAX_BATCH = 8
+
+# Uso acumulado reportado por Ollama (para comparar modos)
+_usage_lock = threading.Lock()
+_usage = {'requests': 0, 'prompt_tokens': 0, 'eval_tokens': 0}
+
+def _record_usage(response):
+    with _usage_lock:
+        _usage['requests'] += 1
+        _usage['prompt_tokens'] += response.get('prompt_eval_count') or 0
+        _usage['eval_tokens'] += response.get('eval_count') or 0
+
+def usage_stats():
+    """Peticiones y tokens (prompt/respuesta) acumulados desde el último reset_usage()."""
+    with _usage_lock:
+        return dict(_usage)
+
+def reset_usage():
+    with _usage_lock:
+        for k in _usage:
+            _usage[k] = 0
+
+def get_client(host=None, timeout=None):
+    """
+    Cliente Ollama con timeout por petición (ollama.chat a nivel de módulo no tiene timeout).
+    'host' None usa OLLAMA_HOST o el servidor local por defecto.
+    """
+    # ollama (httpx, pydantic) se importa recién al primer uso: los scripts arrancan antes
+    import ollama
+    return ollama.Client(host=host, timeout=timeout)
+
+def _chat_function(client):
+    if client is not None:
+        return client.chat
+    import ollama
+    return ollama.chat
+
+def generate_questions_from_chunk(chunk_text, model="llama3", client=None, num_ctx=None, metrics=None, attempt=0):
     """
     Envía un fragmento de texto a Ollama y retorna las preguntas generadas en formato dict.
+    'client' permite usar un ollama.Client propio (host/timeout); por defecto ollama.chat.
+    'num_ctx' fija la ventana de contexto del modelo (necesario si los bloques superan
+    el contexto por defecto de Ollama).
+    'metrics' (llm_metrics.MetricsRecorder) anota los tiempos y tokens de la respuesta
+    y si falló la conexión o el parseo ('attempt' = número de intento).
+
+    La respuesta se valida contra el esquema del cuestionario (quiz_json): las
+    preguntas mal formadas se descartan y si el JSON viene rodeado de texto o
+    cortado se recupera la parte válida. Retorna None si no queda ninguna pregunta.
     """
     user_message = f"TEXTO A EVALUAR:\n---\n{chunk_text}\n---\n\nGenera el cuestionario en JSON:"
+    chat = _chat_function(client)
+    t0 = time.perf_counter()
+    response = None
+    quiz_data = None
+    status = 'request_error'
     
     try:
-        response = ollama.chat(model=model, messages=[
+        response = chat(model=model, messages=[
             {'role': 'system', 'content': SYSTEM_PROMPT},
             {'role': 'user', 'content': user_message},
-        ], format='json') # Forzamos salida JSON nativa de Ollama si está soportada, o parseamos.
+        ], format='json', options={'num_ctx': num_ctx} if num_ctx else None) # Forzamos salida JSON nativa de Ollama si está soportada, o parseamos.
+        _record_usage(response)
         
         content = response['message']['content']
+        status = 'parse_error'
         
-        # Parsear JSON
-        try:
-            quiz_data = json.loads(content)
-            
-            # Basic Schema Validation
-            if not isinstance(quiz_data, dict):
-                return None
-            if 'multiple_choice' in quiz_data and not isinstance(quiz_data['multiple_choice'], list):
-                # Try to fix scalar value or discard
-                quiz_data['multiple_choice'] = []
-            
-            return quiz_data
-        except json.JSONDecodeError:
-            # Fallback simple si el modelo añade texto extra
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(0))
-            else:
-                print(f"Error parseando JSON de Ollama. Respuesta cruda: {content[:100]}...")
-                return None
+        # Parsear JSON (tolerante a texto extra y respuestas cortadas) y validar el esquema
+        quiz_data, status = quiz_json.parse_quiz(content)
+        if quiz_data is None:
+            print(f"Error parseando JSON de Ollama ({status}). Respuesta cruda: {content[:100]}...")
+        return quiz_data
                 
     except Exception as e:
-        print(f"Error comunicando con Ollama: {e}")
+        if status == 'parse_error':
+            print(f"Error parseando JSON de Ollama: {e}")
+        else:
+            print(f"Error comunicando con Ollama: {e}")
         return None
+    finally:
+        if metrics is not None:
+            metrics.record_response(model, response, status, time.perf_counter() - t0,
+                                    attempt=attempt, chunks=1, chunk_chars=len(chunk_text),
+                                    questions=quiz_json.count_questions(quiz_data))
+
+def generate_with_retry(chunk_text, model="llama3", client=None, retries=2, backoff=2.0, num_ctx=None,
+                        metrics=None, prior_attempts=0, deferred=False):
+    """
+    Como generate_questions_from_chunk, pero reintenta (con espera exponencial)
+    si la respuesta falla o no se puede parsear. Retorna None si se agotan los intentos.
+    'prior_attempts' cuenta intentos previos hechos por otra vía (p. ej. dentro de un lote).
+    'deferred' marca en las métricas los reintentos de la cola de bloques fallidos.
+    """
+    quiz_data = None
+    attempt = 0
+    for attempt in range(retries + 1):
+        quiz_data = generate_questions_from_chunk(chunk_text, model=model, client=client, num_ctx=num_ctx,
+                                                  metrics=metrics, attempt=prior_attempts + attempt)
+        if quiz_data:
+            break
+        if attempt < retries:
+            time.sleep(backoff * (2 ** attempt))
+    if metrics is not None:
+        metrics.record('chunk', model=model, ok=bool(quiz_data), attempts=prior_attempts + attempt + 1,
+                       chunk_chars=len(chunk_text), questions=quiz_json.count_questions(quiz_data),
+                       deferred=deferred)
+    return quiz_data or None
+
+def prompt_overhead_tokens(count_tokens):
+    """Tokens fijos de cada petición (prompt de sistema + envoltorio del mensaje de usuario)."""
+    wrapper = "TEXTO A EVALUAR:\n---\n\n---\n\nGenera el cuestionario en JSON:"
+    # Margen por los tokens de plantilla del chat (roles, separadores)
+    return count_tokens(SYSTEM_PROMPT) + count_tokens(wrapper) + 32
+
+def build_batch_message(chunks):
+    """Mensaje de usuario con los fragmentos numerados (1..n)."""
+    parts = [f"TEXTO {i}:\n---\n{chunk}\n---" for i, chunk in enumerate(chunks, 1)]
+    return "\n\n".join(parts) + f"\n\nGenera un cuestionario JSON por cada uno de los {len(chunks)} textos:"
+
+def generate_questions_from_batch(chunks, model="llama3", client=None, num_ctx=None, metrics=None):
+    """
+    Genera los cuestionarios de varios fragmentos en una sola petición (el prompt de
+    sistema se paga una vez). Retorna una lista alineada con 'chunks' (None = falló).
+    """
+    chat = _chat_function(client)
+    t0 = time.perf_counter()
+    response = None
+    results = [None] * len(chunks)
+    status = 'request_error'
+    try:
+        response = chat(model=model, messages=[
+            {'role': 'system', 'content': BATCH_SYSTEM_PROMPT},
+            {'role': 'user', 'content': build_batch_message(chunks)},
+        ], format='json', options={'num_ctx': num_ctx} if num_ctx else None)
+        _record_usage(response)
+        results, status = quiz_json.parse_batch(response['message']['content'], len(chunks))
+    except Exception as e:
+        print(f"Error comunicando con Ollama (lote de {len(chunks)}): {e}")
+    if metrics is not None:
+        metrics.record_response(model, response, status, time.perf_counter() - t0, attempt=0,
+                                chunks=len(chunks), chunk_chars=sum(len(c) for c in chunks),
+                                blocks_ok=sum(1 for r in results if r),
+                                questions=sum(quiz_json.count_questions(r) for r in results))
+    return results
+
+def batch_fits(chunk_tokens, num_ctx, count_tokens=input_handler.estimate_tokens):
+    """
+    True si los fragmentos (lista de tokens de cada uno) caben juntos en 'num_ctx':
+    prompt de lote + envoltorio por texto + respuesta reservada por bloque.
+    """
+    overhead = count_tokens(BATCH_SYSTEM_PROMPT) + count_tokens(build_batch_message([""])) + 32
+    per_chunk = count_tokens("TEXTO 00:\n---\n\n---\n\n") + RESPONSE_TOKENS_PER_BLOCK
+    return overhead + sum(chunk_tokens) + per_chunk * len(chunk_tokens) <= num_ctx
+
+def _generate_batch_and_store(items, model, client, retries, backoff, cache, num_ctx, metrics=None):
+    """
+    Genera un lote [(fragmento, clave)]. Los bloques que el modelo no devolvió bien
+    (o el lote entero, si la respuesta es inválida) se piden de a uno con reintentos.
+    En la caché, lo que salió del lote se guarda con la clave de BATCH_SYSTEM_PROMPT
+    y lo pedido de a uno con la de SYSTEM_PROMPT ('clave').
+    """
+    if len(items) > 1:
+        results = generate_questions_from_batch([chunk for chunk, _ in items], model=model, client=client,
+                                                num_ctx=num_ctx, metrics=metrics)
+    else:
+        results = [None]
+    for i, (chunk, key) in enumerate(items):
+        if results[i]:
+            if metrics is not None:
+                metrics.record('chunk', model=model, ok=True, attempts=1, chunk_chars=len(chunk), batched=True,
+                               questions=quiz_json.count_questions(results[i]))
+            key = llm_cache.make_key(chunk, model, BATCH_SYSTEM_PROMPT) if cache is not None else None
+        else:
+            results[i] = generate_with_retry(chunk, model=model, client=client, retries=retries, backoff=backoff,
+                                             num_ctx=num_ctx, metrics=metrics, prior_attempts=1 if len(items) > 1 else 0)
+        if cache is not None:
+            cache.put(key, model, results[i])
+    return results
+
+def _generate_and_store(chunk_text, model, client, retries, backoff, cache, key, num_ctx=None, metrics=None):
+    quiz_data = generate_with_retry(chunk_text, model=model, client=client, retries=retries, backoff=backoff,
+                                    num_ctx=num_ctx, metrics=metrics)
+    if cache is not None:
+        cache.put(key, model, quiz_data)
+    return quiz_data
+
+def generate_concurrently(chunks, model="llama3", workers=2, retries=2, backoff=2.0, timeout=300, host=None,
+                          cache=None, num_ctx=None, batch_ctx=None, max_batch=MAX_BATCH, metrics=None):
+    """
+    Genera cuestionarios para varios fragmentos con hasta 'workers' peticiones en vuelo.
+    Mientras el servidor procesa unas, Python parsea y guarda las anteriores.
+
+    Los resultados se entregan en el MISMO ORDEN que 'chunks' (aunque terminen
+    desordenados), así el archivo de recuperación sigue siendo posicional.
+    'chunks' puede ser cualquier iterable; se consume a medida que avanza.
+
+    Si se pasa 'cache' (llm_cache.LLMCache), cada fragmento se busca primero por
+    hash de (texto, modelo, SYSTEM_PROMPT) (y con lotes, también con BATCH_SYSTEM_PROMPT)
+    y solo los ausentes llegan a Ollama.
+    'num_ctx' se pasa a Ollama como ventana de contexto (ver input_handler.chunk_token_budget).
+
+    Con 'batch_ctx' (ventana de contexto en tokens), los fragmentos consecutivos se
+    agrupan en lotes de hasta 'max_batch' mientras quepan en ese contexto (ver batch_fits)
+    y cada lote es una sola petición; si el lote falla se vuelve a pedir de a uno.
+
+    'metrics' (llm_metrics.MetricsRecorder) recibe un evento por petición, por
+    fragmento terminado y por acierto de caché.
+
+    Yields:
+        dict | None: Cuestionario de cada fragmento, en orden.
+    """
+    client = get_client(host=host, timeout=timeout)
+    # Fragmentos enviados pero aún no entregados
+    window = max(1, workers) * 2 * (max(1, max_batch) if batch_ctx else 1)
+    if batch_ctx:
+        num_ctx = batch_ctx
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = deque()       # [future, posición en el lote (None = resultado directo)]
+        open_batch = []         # (fragmento, clave, tokens) aún sin enviar
+        open_slots = []
+
+        def flush():
+            if not open_batch:
+                return
+            future = pool.submit(_generate_batch_and_store, [(c, k) for c, k, _ in open_batch],
+                                 model, client, retries, backoff, cache, num_ctx, metrics)
+            for slot in open_slots:
+                slot[0] = future
+            open_batch.clear()
+            open_slots.clear()
+
+        def take():
+            slot = pending.popleft()
+            if slot[0] is None:
+                flush()
+            result = slot[0].result()
+            return result if slot[1] is None else result[slot[1]]
+
+        for chunk in chunks:
+            key = llm_cache.make_key(chunk, model, SYSTEM_PROMPT) if cache is not None else None
+            cached = None
+            if cache is not None:
+                # Con lotes sirve tanto una respuesta individual como una de lote
+                batch_keys = (llm_cache.make_key(chunk, model, BATCH_SYSTEM_PROMPT),) if batch_ctx else ()
+                cached = cache.get(key, *batch_keys)
+            if cached is not None:
+                if metrics is not None:
+                    metrics.record('cache_hit', model=model, chunk_chars=len(chunk))
+                future = Future()
+                future.set_result(cached)
+                pending.append([future, None])
+            elif batch_ctx:
+                tokens = input_handler.estimate_tokens(chunk)
+                if open_batch and (len(open_batch) >= max_batch or
+                                   not batch_fits([t for _, _, t in open_batch] + [tokens], batch_ctx)):
+                    flush()
+                slot = [None, len(open_batch)]
+                open_batch.append((chunk, key, tokens))
+                open_slots.append(slot)
+                pending.append(slot)
+            else:
+                future = pool.submit(_generate_and_store, chunk, model, client, retries, backoff, cache, key, num_ctx,
+                                     metrics)
+                pending.append([future, None])
+            if len(pending) >= window:
+                yield take()
+        flush()
+        while pending:
+            yield take()
 
 if __name__ == "__main__":
     # Test simple
@@ -0,0 +1,329 @@
+"""
+Extracción tolerante del JSON que devuelve el modelo y validación del cuestionario.
+
+El modelo a veces agrega texto antes o después del JSON, devuelve varios objetos o
+se corta a mitad de la respuesta (límite de tokens). JSONScanner recorre la respuesta
+una sola vez, saltando de un carácter estructural al siguiente, y entrega los objetos
+completos y, si quedó uno abierto, la versión cerrada en el último punto seguro. De
+todos los candidatos se queda con el que tiene más preguntas válidas.
+
+    quiz, status = parse_quiz(content)   # status: ok | recovered | parse_error | schema_error
+"""
+import json
+import re
+from collections import deque
+
+# Caracteres que cambian el estado del escáner (el resto se salta de una vez)
+_STRUCTURAL = re.compile(r'[\\"{}\[\],]')
+_CLOSERS = {'{': '}', '[': ']'}
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+# Puntos de corte que se prueban (del último hacia atrás) para cerrar un objeto cortado
+MAX_REPAIR_TRIES = 6
+# Veces que se vuelve a buscar después de una '{' suelta del texto que rodea al JSON
+MAX_RESTARTS = 3
+
+class JSONScanner:
+    """
+    Escáner incremental de objetos JSON de primer nivel dentro de texto libre.
+    Se le puede pasar la respuesta entera o por partes (feed), p. ej. mientras llega
+    en streaming; no vuelve a recorrer lo ya leído.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.spans = []         # (inicio, fin) de cada objeto de primer nivel completo
+        self.open_start = None  # inicio del objeto que sigue abierto, si lo hay
+        self._pos = 0
+        self._skip = 0
+        # Pila de cierres pendientes como lista enlazada (cierre, resto): guardar
+        # una copia en cada punto seguro no cuesta nada aunque el anidamiento sea profundo
+        self._stack = None
+        self._in_string = False
+        # Últimos puntos (posición, pila) donde el objeto abierto se puede cerrar
+        self._safe = deque(maxlen=MAX_REPAIR_TRIES)
+
+    def _reset(self):
+        self._stack = None
+        self._safe.clear()
+        self._in_string = False
+        self.open_start = None
+
+    def feed(self, text):
+        self.text += text
+        for m in _STRUCTURAL.finditer(self.text, self._pos):
+            i = m.start()
+            if i < self._skip:
+                continue
+            c = m.group()
+            if self._in_string:
+                if c == '\\':
+                    self._skip = i + 2
+                elif c == '"':
+                    self._in_string = False
+                continue
+            if self._stack is None:
+                # Fuera de un objeto solo importa dónde empieza el siguiente
+                if c == '{':
+                    self.open_start = i
+                    self._stack = ('}', None)
+                continue
+            if c == '"':
+                self._in_string = True
+            elif c in _CLOSERS:
+                self._stack = (_CLOSERS[c], self._stack)
+            elif c in '}]':
+                if c != self._stack[0]:
+                    # Cierre que no corresponde: no es JSON, se descarta este objeto
+                    self._reset()
+                    continue
+                self._stack = self._stack[1]
+                if self._stack is not None:
+                    self._safe.append((i + 1, self._stack))
+                else:
+                    self.spans.append((self.open_start, i + 1))
+                    self._safe.clear()
+                    self.open_start = None
+            elif c == ',':
+                self._safe.append((i, self._stack))
+        self._pos = len(self.text)
+
+    def candidates(self):
+        """
+        Objetos decodificados: los completos en orden y al final, si la respuesta
+        quedó cortada, el objeto abierto cerrado en el último punto seguro que parsea.
+
+        Yields:
+            tuple: (objeto, completo)
+        """
+        for start, end in self.spans:
+            data = _loads(self.text[start:end])
+            if data is not None:
+                yield data, True
+        if self.open_start is not None:
+            for pos, stack in reversed(self._safe):
+                closers = []
+                while stack is not None:
+                    closers.append(stack[0])
+                    stack = stack[1]
+                data = _loads(self.text[self.open_start:pos] + ''.join(closers))
+                if data is not None:
+                    yield data, False
+                    break
+
+def _loads(text):
+    # RecursionError: anidamiento demasiado profundo (respuesta degenerada)
+    try:
+        return json.loads(text)
+    except (ValueError, RecursionError):
+        pass
+    # Comas finales ("[1, 2,]"), frecuentes en modelos chicos
+    fixed = _TRAILING_COMMA.sub(r'\1', text)
+    if fixed != text:
+        try:
+            return json.loads(fixed)
+        except (ValueError, RecursionError):
+            pass
+    return None
+
+def extract_json(content, convert=None):
+    """
+    El mejor valor JSON de la respuesta del modelo.
+
+    Args:
+        content (str): Respuesta cruda.
+        convert (callable): obj -> (valor, puntaje). Se devuelve el valor de mayor
+            puntaje (> 0); por defecto el primer objeto encontrado, tal cual.
+
+    Returns:
+        tuple: (valor o None, estado) con estado 'ok' (la respuesta era JSON válido),
+        'recovered' (se extrajo de texto extra o se cerró un objeto cortado),
+        'parse_error' (no hay JSON) o 'schema_error' (hay JSON pero nada utilizable).
+    """
+    convert = convert or (lambda obj: (obj, 1))
+    try:
+        value, score = convert(json.loads(content))
+        if score > 0:
+            return value, 'ok'
+        found = True
+    except (ValueError, RecursionError):
+        found = False
+
+    best, best_score = None, 0
+    text = content
+    for _ in range(MAX_RESTARTS + 1):
+        scanner = JSONScanner()
+        scanner.feed(text)
+        for data, _complete in scanner.candidates():
+            found = True
+            value, score = convert(data)
+            if score > best_score:
+                best, best_score = value, score
+        if best_score > 0 or scanner.open_start is None:
+            break
+        # Una '{' del texto que rodea al JSON puede haber "tragado" el objeto real
+        text = text[scanner.open_start + 1:]
+    if best_score > 0:
+        return best, 'recovered'
+    return None, 'schema_error' if found else 'parse_error'
+
+# --- Validación ---------------------------------------------------------------
+
+INVALID = object()
+
+class _Optional:
+    def __init__(self, spec, default=None):
+        self.spec = spec
+        self.default = default
+
+def optional(spec, default=None):
+    """Campo opcional: si falta o es inválido se usa 'default' (None = se omite)."""
+    return _Optional(spec, default)
+
+class _ListOf:
+    def __init__(self, spec, min_items=0):
+        self.spec = spec
+        self.min_items = min_items
+
+def list_of(spec, min_items=0):
+    """Lista de 'spec'; los elementos inválidos se descartan y debe quedar al menos 'min_items'."""
+    return _ListOf(spec, min_items)
+
+def compile_schema(spec):
+    """
+    Convierte un esquema declarativo en una función de validación (se arma una vez,
+    sin recorrer el esquema en cada llamada). Tipos: str, int, dict (campos),
+    list_of(...) y optional(...).
+
+    Returns:
+        callable: valor -> valor limpio, o INVALID.
+    """
+    if spec is str:
+        def check(value):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            if isinstance(value, str) and value.strip():
+                return value.strip()
+            return INVALID
+        return check
+
+    if spec is int:
+        def check(value):
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+            if isinstance(value, str) and value.strip().isdigit():
+                return int(value)
+            return INVALID
+        return check
+
+    if isinstance(spec, _ListOf):
+        item = compile_schema(spec.spec)
+        min_items = spec.min_items
+
+        def check(value):
+            if not isinstance(value, list):
+                return INVALID
+            kept = [v for v in map(item, value) if v is not INVALID]
+            return kept if len(kept) >= min_items else INVALID
+        return check
+
+    if isinstance(spec, dict):
+        fields = []
+        for key, field in spec.items():
+            if isinstance(field, _Optional):
+                fields.append((key, compile_schema(field.spec), True, field.default))
+            else:
+                fields.append((key, compile_schema(field), False, None))
+
+        def check(value):
+            if not isinstance(value, dict):
+                return INVALID
+            out = {}
+            for key, checker, is_optional, default in fields:
+                result = checker(value[key]) if key in value else INVALID
+                if result is INVALID:
+                    if not is_optional:
+                        return INVALID
+                    if default is None:
+                        continue
+                    result = list(default) if isinstance(default, list) else default
+                out[key] = result
+            return out
+        return check
+
+    raise TypeError(f"Esquema no soportado: {spec!r}")
+
+# Formato de SYSTEM_PROMPT (question_generator)
+QUESTION_SCHEMA = {
+    'question': str,
+    'options': list_of(str, min_items=2),
+    'answer': str,
+    'explanation': optional(str, ''),
+}
+QUIZ_SCHEMA = {
+    'multiple_choice': optional(list_of(QUESTION_SCHEMA), []),
+    'open_ended': optional({'question': str, 'key_points': optional(list_of(str), [])}),
+}
+_check_quiz = compile_schema(QUIZ_SCHEMA)
+_check_block_id = compile_schema(int)
+
+def count_questions(quiz):
+    """Preguntas utilizables de un cuestionario validado."""
+    if not quiz:
+        return 0
+    return len(quiz.get('multiple_choice') or []) + (1 if quiz.get('open_ended') else 0)
+
+def validate_quiz(data):
+    """
+    Cuestionario con solo las preguntas bien formadas (las demás se descartan),
+    o None si no queda ninguna.
+    """
+    quiz = _check_quiz(data)
+    if quiz is INVALID or not count_questions(quiz):
+        return None
+    return quiz
+
+def _quiz_candidate(data):
+    quiz = validate_quiz(data)
+    return quiz, count_questions(quiz)
+
+def parse_quiz(content):
+    """
+    Cuestionario validado de la respuesta del modelo.
+
+    Returns:
+        tuple: (cuestionario o None, estado) (ver extract_json)
+    """
+    return extract_json(content, _quiz_candidate)
+
+def parse_batch(content, n):
+    """
+    Separa la respuesta de un lote ({"blocks": [{"id": k, ...}]}) en n cuestionarios
+    validados, en el orden de los fragmentos (None = ausente o sin preguntas válidas).
+    Los bloques se asignan por 'id' si viene bien numerado; si no, por posición
+    cuando la cantidad coincide.
+
+    Returns:
+        tuple: (lista de n cuestionarios o None, estado) (ver extract_json)
+    """
+    def convert(data):
+        blocks = data.get('blocks') if isinstance(data, dict) else data
+        results = [None] * n
+        if not isinstance(blocks, list):
+            return results, 0
+        for pos, block in enumerate(blocks):
+            if not isinstance(block, dict):
+                continue
+            block_id = _check_block_id(block.get('id'))
+            if block_id is not INVALID and 1 <= block_id <= n:
+                idx = block_id - 1
+            elif len(blocks) == n:
+                idx = pos
+            else:
+                continue
+            quiz = validate_quiz(block)
+            if quiz and results[idx] is None:
+                results[idx] = quiz
+        return results, sum(count_questions(r) for r in results)
+
+    results, status = extract_json(content, convert)
+    return results or [None] * n, status
@@ -0,0 +1,166 @@
+"""
+Perfil de arranque de los scripts: costo de importación de cada módulo
+(python -X importtime) y tiempo hasta la primera salida de cada punto de entrada,
+sin GUI ni servidores (los scripts se lanzan con --help o sin argumentos).
+
+    python startup_profile.py --output arranque_base.json
+    python startup_profile.py --compare arranque_base.json
+
+Con --root se mide otra copia del proyecto (p. ej. una versión anterior).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (nombre, módulo a importar o None, argumentos para medir la primera salida o None)
+ENTRY_POINTS = [
+    ('generate_quiz', 'generate_quiz', ['generate_quiz.py', '--help']),
+    ('pipeline', 'pipeline', ['pipeline.py', '--help']),
+    ('transcribe_videos', 'transcribe_videos', ['transcribe_videos.py', '--help']),
+    ('question_generator', 'question_generator', None),
+    ('input_handler', 'input_handler', None),
+    ('llm_metrics', 'llm_metrics', ['llm_metrics.py', '--help']),
+    ('benchmark_quiz', 'benchmark_quiz', ['benchmark_quiz.py', '--help']),
+    # Streamlit en modo "bare": la primera salida es el aviso del primer st.*
+    ('app', None, ['app.py']),
+]
+# Dependencias pesadas o de GUI que interesa ver si se cargan al arrancar
+HEAVY_MODULES = ('tkinter', 'whisper', 'torch', 'ollama', 'geopandas', 'folium', 'streamlit_folium',
+                 'pypdf', 'tqdm', 'numpy', 'pandas')
+
+def import_profile(module, root, timeout=300):
+    """
+    Importa 'module' en un proceso nuevo con -X importtime.
+
+    Returns:
+        dict: total_ms, paquetes de primer nivel más caros y dependencias pesadas cargadas.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=root, capture_output=True, text=True, timeout=timeout)
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time:   self [us] | cumulative | paquete" (la sangría marca el anidamiento)
+        try:
+            _, cumulative_us, name = line.split(':', 1)[1].split('|')
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(cumulative_us)))
+
+    loaded = {name.split('.')[0] for name, _, _ in entries}
+    # Primer nivel = lo que importa directamente el módulo medido
+    top = sorted(((us, name) for name, depth, us in entries if depth == 1 and name != module), reverse=True)
+    total = next((us for name, depth, us in entries if name == module), None)
+    result = {
+        'ok': proc.returncode == 0,
+        'total_ms': round(total / 1000, 1) if total is not None else None,
+        'top': [(name, round(us / 1000, 1)) for us, name in top[:6]],
+        'heavy_loaded': [m for m in HEAVY_MODULES if m in loaded],
+    }
+    if proc.returncode != 0:
+        result['error'] = (proc.stderr.strip().splitlines() or ['?'])[-1]
+    return result
+
+def first_output_time(args, root, timeout=120):
+    """
+    Segundos desde que se lanza el script hasta su primera línea de salida
+    (stdout o stderr). El proceso se termina apenas escribe.
+
+    Returns:
+        tuple: (segundos o None si no escribió nada, primera línea)
+    """
+    env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable] + args, cwd=root, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+    first = {}
+
+    def read_first_line():
+        line = proc.stdout.readline()
+        first['t'] = time.perf_counter() - t0
+        first['line'] = line.decode('utf-8', errors='ignore').strip()
+
+    reader = threading.Thread(target=read_first_line, daemon=True)
+    reader.start()
+    reader.join(timeout)
+    proc.kill()
+    proc.wait()
+    return first.get('t'), first.get('line', '')
+
+def profile(root, repeat=3):
+    results = {}
+    for name, module, args in ENTRY_POINTS:
+        entry = {}
+        if module:
+            print(f"  importando {module}...", flush=True)
+            runs = [import_profile(module, root) for _ in range(repeat)]
+            entry['import'] = runs[-1]
+            totals = [r['total_ms'] for r in runs if r['total_ms'] is not None]
+            entry['import']['total_ms'] = round(statistics.median(totals), 1) if totals else None
+        if args and os.path.exists(os.path.join(root, args[0])):
+            print(f"  arrancando {' '.join(args)}...", flush=True)
+            times, line = [], ''
+            for _ in range(repeat):
+                t, line = first_output_time(args, root)
+                if t is not None:
+                    times.append(t)
+            entry['first_output_ms'] = round(statistics.median(times) * 1000, 1) if times else None
+            entry['first_line'] = line[:80]
+        results[name] = entry
+    return results
+
+def _fmt(value):
+    return f"{value:,.0f}" if value is not None else "-"
+
+def print_report(results, baseline=None):
+    print(f"\n{'script':<20}{'import (ms)':>14}{'1ª salida (ms)':>17}  dependencias cargadas al importar")
+    for name, entry in results.items():
+        imp = entry.get('import', {})
+        row = f"{name:<20}{_fmt(imp.get('total_ms')):>14}{_fmt(entry.get('first_output_ms')):>17}  "
+        row += ", ".join(imp.get('heavy_loaded', [])) if imp.get('ok', True) else f"ERROR: {imp.get('error')}"
+        print(row)
+        if baseline and name in baseline:
+            old = baseline[name]
+            old_imp = old.get('import', {})
+            print(f"{'  antes':<20}{_fmt(old_imp.get('total_ms')):>14}{_fmt(old.get('first_output_ms')):>17}  "
+                  + (", ".join(old_imp.get('heavy_loaded', [])) if old_imp.get('ok', True)
+                     else f"ERROR: {old_imp.get('error')}"))
+    print("\nImportaciones más caras (primer nivel):")
+    for name, entry in results.items():
+        top = entry.get('import', {}).get('top')
+        if top:
+            print(f"  {name}: " + ", ".join(f"{mod} {ms:,.0f} ms" for mod, ms in top))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perfil de arranque (importaciones y primera salida) de los scripts.")
+    parser.add_argument('--root', default=BASE_DIR, help="Carpeta del proyecto a medir.")
+    parser.add_argument('--repeat', type=int, default=3, help="Repeticiones por medición (se informa la mediana).")
+    parser.add_argument('--output', default=None, help="Guardar los resultados en JSON.")
+    parser.add_argument('--compare', default=None, help="JSON de una corrida anterior para comparar.")
+    args = parser.parse_args()
+
+    print(f"Midiendo arranque en {args.root} ({args.repeat} repeticiones)...")
+    results = profile(args.root, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)['results']
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                                'date': datetime.now(timezone.utc).isoformat(), 'root': args.root},
+                       'results': results}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.output}")
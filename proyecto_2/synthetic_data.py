@@ -0,0 +1,114 @@
+import os
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+
+# Caja envolvente aproximada de Perú (lon_min, lat_min, lon_max, lat_max)
+PERU_BBOX = (-81.33, -18.35, -68.65, -0.04)
+
+DEPARTAMENTOS = [
+    'AMAZONAS', 'ANCASH', 'APURIMAC', 'AREQUIPA', 'AYACUCHO', 'CAJAMARCA', 'CALLAO',
+    'CUSCO', 'HUANCAVELICA', 'HUANUCO', 'ICA', 'JUNIN', 'LA LIBERTAD', 'LAMBAYEQUE',
+    'LIMA', 'LORETO', 'MADRE DE DIOS', 'MOQUEGUA', 'PASCO', 'PIURA', 'PUNO',
+    'SAN MARTIN', 'TACNA', 'TUMBES', 'UCAYALI'
+]
+PROVINCIAS_POR_DEPTO = 8
+DISTRITOS_POR_PROV = 10
+
+def _random_admin(rng, n):
+    """Genera departamento/provincia/distrito jerárquicamente consistentes."""
+    deptos = np.array(DEPARTAMENTOS)[rng.integers(0, len(DEPARTAMENTOS), n)]
+    prov_k = rng.integers(0, PROVINCIAS_POR_DEPTO, n).astype(str)
+    dist_k = rng.integers(0, DISTRITOS_POR_PROV, n).astype(str)
+    provincias = np.char.add(np.char.add(deptos, ' P'), prov_k)
+    distritos = np.char.add(np.char.add(provincias, ' D'), dist_k)
+    return deptos, provincias, distritos
+
+def _random_points(rng, n):
+    lon_min, lat_min, lon_max, lat_max = PERU_BBOX
+    return rng.uniform(lon_min, lon_max, n), rng.uniform(lat_min, lat_max, n)
+
+def make_bdpi_frame(n, seed=0):
+    """
+    DataFrame con el mismo esquema de columnas que la hoja '1. BDPI - CC.PP'.
+    """
+    rng = np.random.default_rng(seed)
+    lon, lat = _random_points(rng, n)
+    deptos, provincias, distritos = _random_admin(rng, n)
+    return pd.DataFrame({
+        'Nombre del centro poblado': [f"CP {i:07d}" for i in range(n)],
+        'Departamento': deptos,
+        'Provincia': provincias,
+        'Distrito': distritos,
+        'Coordenadas Latitud (Y)': lat,
+        'Coordenadas Longitud (X)': lon,
+        'Población Total (aprox.)': rng.integers(10, 2000, n),
+    })
+
+def make_minas_frame(n, seed=1):
+    """
+    DataFrame con el mismo esquema de columnas que la hoja '2024' de minas.xlsx.
+    """
+    rng = np.random.default_rng(seed)
+    lon, lat = _random_points(rng, n)
+    deptos, provincias, distritos = _random_admin(rng, n)
+    return pd.DataFrame({
+        'OPERADOR': [f"OPERADOR {i % 50:02d}" for i in range(n)],
+        'UNIDAD MINERA EN PRODUCCIÓN': [f"MINA {i:07d}" for i in range(n)],
+        'DEPARTAMENTO': deptos,
+        'PROVINCIA': provincias,
+        'DISTRITO': distritos,
+        'LONGITUD': lon,
+        'LATITUD': lat,
+    })
+
+def write_bdpi_excel(df, filepath):
+    """Escribe respetando la hoja y el encabezado (fila 7) que espera data_loader.load_bdpi."""
+    df.to_excel(filepath, sheet_name='1. BDPI - CC.PP', startrow=6, index=False)
+
+def write_minas_excel(df, filepath):
+    """Escribe respetando la hoja y el encabezado (fila 3) que espera data_loader.load_minas."""
+    df.to_excel(filepath, sheet_name='2024', startrow=2, index=False)
+
+def make_bdpi_gdf(n, seed=0):
+    """GeoDataFrame ya normalizado, equivalente a la salida de load_bdpi (sin pasar por Excel)."""
+    df = make_bdpi_frame(n, seed).rename(columns={
+        'Coordenadas Latitud (Y)': 'lat',
+        'Coordenadas Longitud (X)': 'lon',
+        'Población Total (aprox.)': 'poblacion',
+        'Nombre del centro poblado': 'nombre_cp',
+        'Departamento': 'departamento',
+        'Provincia': 'provincia',
+        'Distrito': 'distrito'
+    })
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.lon, df.lat), crs="EPSG:4326")
+
+def make_minas_gdf(n, seed=1):
+    """GeoDataFrame ya normalizado, equivalente a la salida de load_minas (sin pasar por Excel)."""
+    df = make_minas_frame(n, seed).rename(columns={
+        'LATITUD': 'lat',
+        'LONGITUD': 'lon',
+        'UNIDAD MINERA EN PRODUCCIÓN': 'unidad_minera',
+        'DEPARTAMENTO': 'departamento',
+        'PROVINCIA': 'provincia',
+        'DISTRITO': 'distrito'
+    })
+    return gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.lon, df.lat), crs="EPSG:4326")
+
+def ensure_excel_dataset(n, data_dir, seed=0):
+    """
+    Genera (o reutiliza si ya existen) los Excel sintéticos de 'n' filas.
+
+    Returns:
+        tuple: (ruta_bdpi, ruta_minas)
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    bdpi_path = os.path.join(data_dir, f"bdpi_{n}_s{seed}.xlsx")
+    minas_path = os.path.join(data_dir, f"minas_{n}_s{seed}.xlsx")
+    if not os.path.exists(bdpi_path):
+        print(f"Generando {bdpi_path}...")
+        write_bdpi_excel(make_bdpi_frame(n, seed), bdpi_path)
+    if not os.path.exists(minas_path):
+        print(f"Generando {minas_path}...")
+        write_minas_excel(make_minas_frame(n, seed + 1), minas_path)
+    return bdpi_path, minas_path
@@ -0,0 +1,92 @@
+import wave
+
+import numpy as np
+
+import audio_segments
+import transcribe_videos
+
+RATE = audio_segments.SAMPLE_RATE
+
+def _noise(seconds, silences):
+    """Ruido con tramos de silencio digital en 'silences' [(inicio, fin)] segundos."""
+    audio = np.random.default_rng(0).uniform(-0.5, 0.5, int(seconds * RATE)).astype(np.float32)
+    for a, b in silences:
+        audio[int(a * RATE):int(b * RATE)] = 0.0
+    return audio
+
+def _reader(audio):
+    return lambda start, length: audio[int(start * RATE):int((start + length) * RATE)]
+
+def _write_wav(path, audio):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes((audio * 32767).astype(np.int16).tobytes())
+
+def test_cuts_land_in_silences():
+    silences = [(17.0, 17.6), (41.2, 41.8), (58.5, 59.1), (83.0, 83.6)]
+    audio = _noise(100, silences)
+    segments = audio_segments.find_split_points(_reader(audio), 100.0, 20, search_seconds=5)
+    assert segments[0][0] == 0.0 and segments[-1][1] == 100.0
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+    cuts = [end for _, end in segments[:-1]]
+    assert len(cuts) == len(silences)
+    assert all(a <= cut <= b for cut, (a, b) in zip(cuts, silences))
+
+def test_search_window_is_clamped_to_half_segment():
+    # Silencios lejos de los cortes ideales: con ±30 s cada corte saltaría a ellos
+    audio = _noise(60, [(2.0, 2.5), (27.0, 27.5), (52.0, 52.5)])
+    segments = audio_segments.find_split_points(_reader(audio), 60.0, 10)
+    lengths = [b - a for a, b in segments]
+    assert min(lengths[:-1]) >= 5 - audio_segments.FRAME_SECONDS
+    assert max(lengths) <= 15 + audio_segments.FRAME_SECONDS
+
+class FakeWhisper:
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio, verbose=None):
+        self.calls += 1
+        n = len(audio) // RATE
+        return {'text': f" Segmento de {n} s.", 'segments': [{'start': 0.0, 'end': float(n), 'text': "x"}]}
+
+def test_resume_after_deleted_checkpoint(tmp_path):
+    media = tmp_path / "clase.wav"
+    _write_wav(media, _noise(100, [(19.0, 19.6), (39.5, 40.1), (61.0, 61.6), (79.0, 79.6)]))
+    plan = audio_segments.plan_segments(str(media), 20, "base")
+    model = FakeWhisper()
+    for i in audio_segments.pending_segments(str(media), plan):
+        audio_segments.transcribe_segment(model, str(media), plan, i)
+    text, segments, _ = audio_segments.stitch(str(media), plan)
+    assert model.calls == len(plan['segments']) == 5
+    assert segments[1]['start'] == plan['segments'][1][0]
+
+    audio_segments.segment_file(str(media), 2).unlink()
+    # El plan se reutiliza y solo falta el segmento borrado
+    assert audio_segments.plan_segments(str(media), 20, "base") == plan
+    assert audio_segments.pending_segments(str(media), plan) == [2]
+    audio_segments.transcribe_segment(model, str(media), plan, 2)
+    assert audio_segments.stitch(str(media), plan)[0] == text
+    assert model.calls == 6
+
+    # Otro modelo invalida el plan y sus checkpoints
+    audio_segments.plan_segments(str(media), 20, "small")
+    assert len(audio_segments.pending_segments(str(media), plan)) == 5
+
+def test_finish_segmented_lengths_skip_leading_whitespace(tmp_path):
+    media = tmp_path / "clase.wav"
+    _write_wav(media, _noise(3, []))
+    texts = ["  \n Primer segmento.", " Segundo.", " Tercero.\n "]
+    plan = {'segments': [[0.0, 1.0], [1.0, 2.0], [2.0, 3.0]]}
+    audio_segments.checkpoint_dir(str(media)).mkdir()
+    for i, text in enumerate(texts):
+        audio_segments._write_json(audio_segments.segment_file(str(media), i),
+                                   {'index': i, 'text': text, 'segments': []})
+    lengths = transcribe_videos.finish_segmented(str(media), plan)
+    saved = transcribe_videos.output_path_for(str(media)).read_text(encoding="utf-8")
+    assert saved == "".join(texts).strip()
+    assert sum(lengths) == len(saved)
+    blocks = list(transcribe_videos._read_blocks(transcribe_videos.output_path_for(str(media)), segments=lengths))
+    assert blocks == ["Primer segmento.", " Segundo.", " Tercero."]
+    assert not audio_segments.checkpoint_dir(str(media)).exists()
@@ -0,0 +1,72 @@
+import json
+import os
+import re
+
+import exam_writer
+
+def _quiz(n):
+    return {"multiple_choice": [{"question": f"¿Pregunta {n}.{k}?", "options": ["A) Sí", "B) No"],
+                                 "answer": "A", "explanation": ""} for k in range(2)],
+            "open_ended": {"question": f"Desarrolla el tema {n}.", "key_points": ["Idea"]}}
+
+def _write(path, batches, per_page=4):
+    with exam_writer.ExamWriter(str(path), "doc.pdf", questions_per_page=per_page) as writer:
+        for batch in batches:
+            writer.write(batch)
+    return writer
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _links(path):
+    return re.findall(r'<a href="([^"]+)">', _read(path))
+
+def test_pages_link_to_each_other(tmp_path):
+    out = tmp_path / "EXAMEN_doc.html"
+    writer = _write(out, [_quiz(n) for n in range(5)])
+    # 2 preguntas de opción múltiple por bloque, página llena a partir de 4: dos bloques por página
+    assert (writer.page, writer.blocks, writer.questions) == (3, 5, 10)
+    pages = [exam_writer.page_path(str(out), p) for p in (1, 2, 3)]
+    names = [os.path.basename(p) for p in pages]
+    assert _links(pages[0]) == [names[1]]
+    assert _links(pages[1]) == [names[0], names[0], names[2]]
+    assert _links(pages[2]) == [names[1], names[1]]
+    assert not os.path.exists(exam_writer.page_path(str(out), 4))
+
+def test_shrinking_exam_removes_stale_pages(tmp_path):
+    out = tmp_path / "EXAMEN_doc.html"
+    _write(out, [_quiz(n) for n in range(8)])
+    assert os.path.exists(exam_writer.page_path(str(out), 4))
+    _write(out, [_quiz(n) for n in range(3)])
+    assert os.path.exists(exam_writer.page_path(str(out), 2))
+    assert not os.path.exists(exam_writer.page_path(str(out), 3))
+    assert not os.path.exists(exam_writer.page_path(str(out), 4))
+
+def test_question_text_is_escaped(tmp_path):
+    out = tmp_path / "EXAMEN_doc.html"
+    quiz = {"multiple_choice": [{"question": "¿<script>alert(1)</script>?", "options": ["A) x < y & z"],
+                                 "answer": "<b>A</b>", "explanation": "</div>"}],
+            "open_ended": {"question": "<img src=x>", "key_points": ["<i>clave</i>"]}}
+    with exam_writer.ExamWriter(str(out), "<doc>.pdf") as writer:
+        writer.write(quiz)
+    page = _read(out)
+    for raw in ("<script>alert", "<b>A</b>", "<img", "<i>clave", "<doc>", "x < y"):
+        assert raw not in page
+    assert "&lt;script&gt;" in page and "x &lt; y &amp; z" in page
+
+def test_build_from_recovery_matches_live_writer(tmp_path):
+    batches = [_quiz(0), {}, _quiz(2), {"multiple_choice": "mal formado"}, _quiz(4), _quiz(5)]
+    recovery = tmp_path / "doc.pdf.recovery.jsonl"
+    with open(recovery, "w", encoding="utf-8") as f:
+        for batch in batches:
+            f.write(json.dumps(batch, ensure_ascii=False) + "\n")
+
+    live = _write(tmp_path / "live.html", batches)
+    rebuilt = exam_writer.build_from_recovery(str(recovery), str(tmp_path / "rebuilt.html"), "doc.pdf",
+                                              questions_per_page=4)
+    assert (rebuilt.page, rebuilt.blocks, rebuilt.questions) == (live.page, live.blocks, live.questions)
+    for p in range(1, live.page + 1):
+        live_page = _read(exam_writer.page_path(str(tmp_path / "live.html"), p))
+        rebuilt_page = _read(exam_writer.page_path(str(tmp_path / "rebuilt.html"), p))
+        assert rebuilt_page == live_page.replace("live.", "rebuilt.")
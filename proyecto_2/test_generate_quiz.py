@@ -0,0 +1,145 @@
+import random
+import re
+import threading
+
+import pytest
+
+import exam_writer
+import fake_ollama_server
+import generate_quiz
+import llm_metrics
+import question_generator
+
+PAGE = ("La minería formal en la región andina requiere estudios de impacto ambiental. " * 40).strip()
+
+@pytest.fixture
+def server_url():
+    server, url = fake_ollama_server.start_server(delay=0.0)
+    yield url
+    server.shutdown()
+
+def _args(url, *extra):
+    return generate_quiz.parse_args(['--host', url, '--chunker', 'chars', '--no-cache', '--no-metrics',
+                                     '--no-open', '--no-dedup', '--retry-failed', '0', *extra])
+
+def _recovery_lines(path):
+    with open(f"{path}.recovery.jsonl", "r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+def test_read_error_keeps_recovery(tmp_path, monkeypatch, server_url):
+    # El examen HTML se escribe en la carpeta actual
+    monkeypatch.chdir(tmp_path)
+    target = str(tmp_path / "doc.pdf")
+    pages = ["\n" + PAGE] * 12
+    generate_quiz.generate_exam(iter(pages), target, _args(server_url))
+    complete = _recovery_lines(target)
+    assert complete > 2
+
+    def failing_pages():
+        yield from pages[:3]
+        raise OSError("página ilegible")
+
+    with pytest.raises(generate_quiz.DocumentReadError):
+        generate_quiz.generate_exam(failing_pages(), target, _args(server_url))
+    assert _recovery_lines(target) == complete
+
+def test_write_error_propagates(tmp_path, monkeypatch, server_url):
+    monkeypatch.chdir(tmp_path)
+    target = str(tmp_path / "doc.pdf")
+    calls = []
+
+    def failing_write(self, batch):
+        calls.append(batch)
+        if len(calls) > 1:
+            raise OSError("disco lleno")
+
+    monkeypatch.setattr(exam_writer.ExamWriter, 'write', failing_write)
+    # No es un error de lectura: sale tal cual y la recuperación queda
+    with pytest.raises(OSError, match="disco lleno"):
+        generate_quiz.generate_exam(iter(["\n" + PAGE] * 12), target, _args(server_url))
+    assert _recovery_lines(target) == 2
+
+class ScriptedRandom:
+    """Sustituye a 'random' en el servidor falso: la primera petición falla, el resto no."""
+
+    def __init__(self):
+        self.calls = 0
+        self.jitter = random.Random(0)
+        self.lock = threading.Lock()
+
+    def random(self):
+        # Cada petición consulta primero fail_rate: la primera consulta de todas es un fallo
+        with self.lock:
+            self.calls += 1
+            return 0.0 if self.calls == 1 else 0.99
+
+    def uniform(self, a, b):
+        with self.lock:
+            return self.jitter.uniform(a, b)
+
+def _first_number(batch):
+    return int(re.search(r"\d{4}", batch["multiple_choice"][0]["question"]).group())
+
+def test_concurrent_recovery_in_chunk_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Latencias aleatorias: las respuestas terminan desordenadas
+    server, url = fake_ollama_server.start_server(delay=0.02, jitter=0.02, parallel=4)
+    try:
+        text = " ".join(f"Oración {n:04d} del documento." for n in range(1200))
+        pages = ["\n" + text[i:i + 2000] for i in range(0, len(text), 2000)]
+        target = str(tmp_path / "doc.pdf")
+        generate_quiz.generate_exam(iter(pages), target, _args(url, '--workers', '4'))
+    finally:
+        server.shutdown()
+    numbers = [_first_number(b) for b in exam_writer.iter_recovery(f"{target}.recovery.jsonl")]
+    assert len(numbers) > 4
+    assert numbers == sorted(numbers)
+
+def test_retry_recovers_failed_response(monkeypatch):
+    monkeypatch.setattr(fake_ollama_server, 'random', ScriptedRandom())
+    server, url = fake_ollama_server.start_server(delay=0.01, jitter=0.01, fail_rate=0.5)
+    metrics = llm_metrics.MetricsRecorder()
+    try:
+        chunks = [f"Fragmento {n} sobre minería." for n in range(6)]
+        results = list(question_generator.generate_concurrently(
+            chunks, workers=3, retries=2, backoff=0.01, host=url, metrics=metrics))
+    finally:
+        server.shutdown()
+    assert all(results)
+    assert [r["open_ended"]["question"] for r in results] == \
+        [f"Sintetiza el fragmento '{c}'." for c in chunks]
+    requests = [r for r in metrics.records if r['event'] == 'request']
+    assert sum(r['status'] != 'ok' for r in requests) == 1
+    assert sorted(r['attempts'] for r in metrics.records if r['event'] == 'chunk') == [1] * 5 + [2]
+
+def test_request_timeout():
+    server, url = fake_ollama_server.start_server(delay=1.0)
+    metrics = llm_metrics.MetricsRecorder()
+    try:
+        results = list(question_generator.generate_concurrently(
+            ["Fragmento lento."], retries=0, timeout=0.2, host=url, metrics=metrics))
+    finally:
+        server.shutdown()
+    assert results == [None]
+    assert [r['status'] for r in metrics.records if r['event'] == 'request'] == ['request_error']
+
+def test_question_deduper_removes_repeated_questions():
+    def question(text):
+        return {"question": text, "options": ["A) Sí", "B) No"], "answer": "A", "explanation": ""}
+
+    first = {"multiple_choice": [question("¿Qué exige la ley minera para operar en la región?")],
+             "open_ended": {"question": "Explica el proceso de consulta previa a las comunidades.",
+                            "key_points": []}}
+    second = {"multiple_choice": [question("¿Qué exige la ley minera para operar en la región?"),
+                                  question("¿Cuántas localidades quedan dentro del radio de influencia?")],
+              "open_ended": {"question": "Explica el proceso de consulta previa a las comunidades.",
+                             "key_points": []}}
+    dedupe = generate_quiz.QuestionDeduper()
+    assert dedupe(first) == first
+    result = dedupe(second)
+    assert [q["question"] for q in result["multiple_choice"]] == [
+        "¿Cuántas localidades quedan dentro del radio de influencia?"]
+    assert "open_ended" not in result
+    assert dedupe.removed == 2
+    # El bloque recibido no se modifica (la recuperación lo guarda completo)
+    assert len(second["multiple_choice"]) == 2 and "open_ended" in second
@@ -0,0 +1,51 @@
+import random
+
+import input_handler
+
+PAGE = ("La minería formal en la región andina requiere estudios de impacto ambiental. " * 40).strip()
+
+def test_token_chunks_stream_before_input_ends():
+    # Páginas unidas con "\n" y sin líneas en blanco (como un PDF o una transcripción)
+    consumed = []
+
+    def pages():
+        for i in range(300):
+            consumed.append(i)
+            yield PAGE if i == 0 else "\n" + PAGE
+
+    chunks = input_handler.iter_token_chunks(pages(), max_tokens=1500, overlap_tokens=100,
+                                             count_tokens=lambda t: len(t) // 4 + 1)
+    next(chunks)
+    assert len(consumed) < 10
+
+def test_token_chunks_respect_budget_without_paragraphs():
+    count = lambda t: len(t) // 4 + 1
+    text = "\n".join([PAGE] * 50)
+    chunks = list(input_handler.iter_token_chunks([text], max_tokens=500, overlap_tokens=50, count_tokens=count))
+    assert len(chunks) > 1
+    assert all(count(c) <= 500 for c in chunks)
+
+def test_calibrate_chars_per_token_discounts_fixed_prompt():
+    # Tokens de Ollama = 500 del prompt fijo + 1 cada 4 caracteres del fragmento
+    samples = [(chars, 500 + chars // 4) for chars in (800, 2000, 3600, 5200)]
+    assert abs(input_handler.calibrate_chars_per_token(samples) - 4.0) < 0.01
+    assert input_handler.calibrate_chars_per_token([(2000, 1000), (2000, 1000)]) is None
+
+def test_token_chunks_with_chars_per_token():
+    text = "\n".join([PAGE] * 50)
+    chunks = list(input_handler.iter_token_chunks([text], max_tokens=500, overlap_tokens=50, chars_per_token=4.0))
+    assert all(input_handler.estimate_tokens(c, 4.0) <= 500 for c in chunks)
+    assert max(len(c) for c in chunks) > 500 * input_handler.CHARS_PER_TOKEN
+
+def _words(seed, n=300):
+    rng = random.Random(seed)
+    return " ".join(f"palabra{rng.randrange(5000)}" for _ in range(n))
+
+def test_unique_chunks_skip_near_duplicates():
+    chunk = _words(1)
+    edited = chunk.replace(chunk.split()[150], "cambiada", 1)
+    other = _words(2)
+    stats = {}
+    kept = list(input_handler.iter_unique_chunks([chunk, chunk, edited, other], threshold=0.8, stats=stats))
+    assert kept == [chunk, other]
+    assert stats == {'kept': 2, 'skipped': 2}
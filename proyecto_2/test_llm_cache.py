@@ -0,0 +1,96 @@
+import itertools
+import json
+import types
+
+import fake_ollama_server
+import generate_quiz
+import llm_cache
+
+def _paragraph(p, topic="impacto ambiental"):
+    return " ".join(f"Párrafo {p:02d}, oración {s}: la minería formal requiere estudios de {topic} en la región."
+                    for s in range(5))
+
+def _generate(tmp_path, url, name, paragraphs, *extra):
+    """Genera el examen de un documento y devuelve cuántas peticiones llegaron a Ollama."""
+    target = str(tmp_path / name)
+    metrics = str(tmp_path / f"{name}.metrics.jsonl")
+    args = generate_quiz.parse_args(['--host', url, '--cache', str(tmp_path / "cache.sqlite"),
+                                     '--metrics', metrics, '--no-open', '--no-dedup', '--retry-failed', '0',
+                                     '--max-tokens', '170', *extra])
+    generate_quiz.generate_exam(iter(["\n\n".join(paragraphs)]), target, args)
+    with open(metrics, "r", encoding="utf-8") as f:
+        return sum(1 for line in f if json.loads(line)['event'] == 'request')
+
+def test_cache_hits_skip_ollama(tmp_path, monkeypatch):
+    # El examen HTML se escribe en la carpeta actual
+    monkeypatch.chdir(tmp_path)
+    server, url = fake_ollama_server.start_server(delay=0.0)
+    try:
+        paragraphs = [_paragraph(p) for p in range(8)]
+        assert _generate(tmp_path, url, "a.pdf", paragraphs) == 8
+        # Otro tamaño de bloque que produce los mismos fragmentos: todo sale de la caché
+        assert _generate(tmp_path, url, "b.pdf", paragraphs, '--max-tokens', '190') == 0
+        # Documento editado: solo el párrafo que cambió vuelve a Ollama
+        edited = paragraphs[:3] + [_paragraph(3, "suelos")] + paragraphs[4:]
+        assert _generate(tmp_path, url, "c.pdf", edited) == 1
+        # Otro modelo no reutiliza respuestas
+        assert _generate(tmp_path, url, "d.pdf", paragraphs, '--model', 'mistral') == 8
+    finally:
+        server.shutdown()
+
+def _clock(monkeypatch):
+    # Marcas de tiempo distintas y crecientes para cada put/get
+    ticks = itertools.count(1)
+    monkeypatch.setattr(llm_cache, 'time', types.SimpleNamespace(time=lambda: float(next(ticks))))
+
+def _entry(n):
+    return {"texto": f"{n:03d}" + "x" * 94}     # 110 bytes en JSON
+
+def test_eviction_to_ninety_percent(tmp_path, monkeypatch):
+    _clock(monkeypatch)
+    size = len(json.dumps(_entry(0)))
+    cache = llm_cache.LLMCache(str(tmp_path / "cache.sqlite"), max_bytes=size * 5)
+    for n in range(5):
+        cache.put(f"k{n}", "llama3", _entry(n))
+    assert cache.stats()['entries'] == 5
+    # Usar k0 lo vuelve el más reciente: se eliminan k1 y k2
+    assert cache.get("k0") == _entry(0)
+    cache.put("k5", "llama3", _entry(5))
+    stats = cache.stats()
+    assert stats['bytes'] <= size * 5 * 0.9
+    assert cache.get("k1") is None and cache.get("k2") is None
+    assert all(cache.get(f"k{n}") == _entry(n) for n in (0, 3, 4, 5))
+    cache.close()
+
+def test_total_tracks_table_size(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = llm_cache.LLMCache(path, max_bytes=10 ** 6)
+    cache.put("a", "llama3", _entry(1))
+    cache.put("b", "llama3", _entry(2))
+    # Reemplazar una clave descuenta el tamaño anterior
+    cache.put("a", "llama3", {"texto": "corto"})
+    cache.put("c", "llama3", None)
+    assert cache._total == cache._sum_sizes() == cache.stats()['bytes']
+
+    # Otro proceso agrega entradas: al limpiar se vuelve a sumar la tabla
+    other = llm_cache.LLMCache(path, max_bytes=10 ** 6)
+    other.put("d", "llama3", _entry(4))
+    other.close()
+    cache.max_bytes = cache._total
+    cache.put("e", "llama3", _entry(5))
+    assert cache._total == cache._sum_sizes() <= cache.max_bytes * 0.9
+    cache.close()
+    reopened = llm_cache.LLMCache(path)
+    assert reopened._total == cache._total
+    reopened.close()
+
+def test_get_with_alternative_keys(tmp_path):
+    cache = llm_cache.LLMCache(str(tmp_path / "cache.sqlite"))
+    cache.put("lote", "llama3", _entry(1))
+    assert cache.get("simple") is None
+    assert cache.get("simple", "lote") == _entry(1)
+    cache.put("simple", "llama3", _entry(2))
+    # Gana la primera clave presente
+    assert cache.get("simple", "lote") == _entry(2)
+    assert (cache.hits, cache.misses) == (2, 1)
+    cache.close()
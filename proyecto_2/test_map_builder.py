@@ -0,0 +1,14 @@
+import analysis
+import map_builder
+import synthetic_data
+
+def test_rendered_payload_size():
+    bdpi = synthetic_data.make_bdpi_gdf(200, seed=0)
+    minas = synthetic_data.make_minas_gdf(200, seed=1).iloc[:20]
+    results = analysis.calculate_impact(minas, bdpi, 10.0)
+    zone = analysis.dissolved_influence_zone(minas, 10.0)
+    m = map_builder.build_map(None, bdpi, results['affected_localities'], zone, minas)
+    size = map_builder.rendered_payload_size(m)
+    # Las capas (zona, localidades, minas) van en el payload
+    empty = map_builder.build_map(None, bdpi.iloc[:0], results['affected_localities'].iloc[:0], None, minas.iloc[:0])
+    assert size > map_builder.rendered_payload_size(empty) > 0
@@ -0,0 +1,66 @@
+import os
+
+import media_manifest
+import transcribe_videos
+
+def _select(root, model="base"):
+    manifest = media_manifest.TranscriptManifest(str(root))
+    media = media_manifest.scan_media(str(root), media_manifest.MEDIA_EXTENSIONS)
+    pending, hashes, duplicates = transcribe_videos.select_pending(media, manifest, model)
+    return [os.path.basename(p) for p in pending], hashes, duplicates, manifest
+
+def _transcribe(path, hashes, manifest, model="base"):
+    """Lo que hace transcribe_videos al terminar una grabación."""
+    txt = transcribe_videos.output_path_for(str(path))
+    txt.write_text(f"Transcripción de {path.name}", encoding="utf-8")
+    manifest.record(hashes[str(path)], model, txt)
+    manifest.save()
+
+def test_copies_renames_and_changes(tmp_path):
+    clase = tmp_path / "clase.mp4"
+    clase.write_bytes(b"audio original" * 100)
+    pending, hashes, _, manifest = _select(tmp_path)
+    assert pending == ["clase.mp4"]
+    _transcribe(clase, hashes, manifest)
+    assert _select(tmp_path)[0] == []
+
+    # Copia con otro nombre: se copia la transcripción
+    copia = tmp_path / "copia.mp4"
+    copia.write_bytes(clase.read_bytes())
+    assert _select(tmp_path)[0] == []
+    assert (tmp_path / "copia.txt").read_text(encoding="utf-8") == "Transcripción de clase.mp4"
+
+    # Otro modelo: se rehace una vez para las dos copias
+    pending, _, duplicates, _ = _select(tmp_path, model="small")
+    assert pending == ["clase.mp4"]
+    assert duplicates == {str(clase): [str(copia)]}
+
+    # La grabación cambió: solo esa vuelve a transcribirse
+    clase.write_bytes(b"audio nuevo" * 100)
+    assert _select(tmp_path)[0] == ["clase.mp4"]
+
+def test_transcript_before_manifest_is_adopted(tmp_path):
+    vieja = tmp_path / "vieja.mp3"
+    vieja.write_bytes(b"grabacion" * 100)
+    (tmp_path / "vieja.txt").write_text("Texto de antes del manifiesto", encoding="utf-8")
+    pending, hashes, _, _ = _select(tmp_path)
+    assert pending == []
+    reloaded = media_manifest.TranscriptManifest(str(tmp_path))
+    assert reloaded.output_source(tmp_path / "vieja.txt") == (hashes[str(vieja)], "base")
+
+def test_same_stem_media_get_own_transcripts(tmp_path):
+    (tmp_path / "clase.mp4").write_bytes(b"video" * 100)
+    (tmp_path / "clase.m4a").write_bytes(b"audio" * 100)
+    pending, _, _, _ = _select(tmp_path)
+    assert sorted(pending) == ["clase.m4a", "clase.mp4"]
+    outputs = {transcribe_videos.output_path_for(str(tmp_path / name)).name for name in pending}
+    assert outputs == {"clase.mp4.txt", "clase.m4a.txt"}
+
+def test_scan_skips_checkpoints_and_hidden_folders(tmp_path):
+    (tmp_path / "clase.wav").write_bytes(b"x")
+    (tmp_path / "notas.txt").write_text("no es una grabación", encoding="utf-8")
+    for folder, name in (("clase.segments", "seg.wav"), (".oculta", "a.mp4"), ("sub", "b.MP3")):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / name).write_bytes(b"x")
+    found = media_manifest.scan_media(str(tmp_path), media_manifest.MEDIA_EXTENSIONS)
+    assert [path for path, _, _ in found] == [str(tmp_path / "clase.wav"), str(tmp_path / "sub" / "b.MP3")]
@@ -0,0 +1,55 @@
+import threading
+import time
+import wave
+
+import media_manifest
+import pipeline
+import question_generator
+
+SENTENCE = "La minería formal en la región andina requiere estudios de impacto ambiental."
+
+class FakeWhisper:
+    """Modelo que tarda un poco por segmento y anota cuándo termina cada uno."""
+
+    def __init__(self, events, lock):
+        self.events = events
+        self.lock = lock
+
+    def transcribe(self, audio, verbose=None):
+        time.sleep(0.2)
+        with self.lock:
+            self.events.append('segmento')
+        return {'text': " " + " ".join([SENTENCE] * 10), 'segments': []}
+
+def test_generation_starts_before_transcription_ends(tmp_path, monkeypatch):
+    media = tmp_path / "clase.wav"
+    with wave.open(str(media), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(b"\0\0" * 16000 * 300)
+
+    events, lock = [], threading.Lock()
+    model = FakeWhisper(events, lock)
+
+    def fake_generate(chunk_text, **kwargs):
+        with lock:
+            events.append('pregunta')
+        return {'multiple_choice': [{'question': "¿Qué requiere la minería formal?",
+                                     'options': ["Estudios", "Nada"], 'answer': "Estudios"}]}
+
+    monkeypatch.setattr(question_generator, 'generate_questions_from_chunk', fake_generate)
+    monkeypatch.chdir(tmp_path)
+    args = pipeline.parse_args([str(media), '--segment-minutes', '1', '--max-tokens', '300',
+                                '--no-cache', '--no-metrics', '--no-open', '--no-dedup'])
+    manifest = media_manifest.TranscriptManifest(str(tmp_path))
+    pipeline.process_media(str(media), lambda: model, manifest, args)
+
+    assert events.count('segmento') > 3
+    assert 'pregunta' in events
+    assert events.index('pregunta') < len(events) - 1 - events[::-1].index('segmento')
+
+    # Con la transcripción ya guardada se leen los mismos segmentos: nada que regenerar
+    del events[:]
+    pipeline.process_media(str(media), lambda: model, manifest, args)
+    assert events == []
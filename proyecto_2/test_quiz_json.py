@@ -0,0 +1,64 @@
+import json
+import time
+
+import quiz_json
+
+QUESTION = {"question": "¿Qué exige la minería formal?", "options": ["A) Permisos", "B) Nada"],
+            "answer": "A", "explanation": "Lo dice el texto."}
+QUIZ = {"multiple_choice": [QUESTION, dict(QUESTION, question="¿Dónde se aplica?")],
+        "open_ended": {"question": "Resume el texto.", "key_points": ["Permisos"]}}
+
+def test_valid_json_is_ok():
+    quiz, status = quiz_json.parse_quiz(json.dumps(QUIZ))
+    assert status == 'ok'
+    assert quiz == QUIZ
+
+def test_truncated_json_keeps_complete_questions():
+    content = json.dumps(QUIZ, ensure_ascii=False)
+    cut = content[:content.index('"open_ended"') + 20]
+    quiz, status = quiz_json.parse_quiz(cut)
+    assert status == 'recovered'
+    assert quiz['multiple_choice'] == QUIZ['multiple_choice']
+    assert 'open_ended' not in quiz
+
+def test_json_inside_prose_and_fences():
+    content = ("Claro, {aquí} tienes el cuestionario:\n```json\n"
+               + json.dumps(QUIZ, ensure_ascii=False, indent=2) + "\n```\nEspero que sirva.")
+    quiz, status = quiz_json.parse_quiz(content)
+    assert status == 'recovered'
+    assert quiz == QUIZ
+
+def test_schema_drops_extra_and_wrong_typed_keys():
+    data = {"multiple_choice": [dict(QUESTION, extra="ignorado"),
+                                dict(QUESTION, options="A) Una sola"),
+                                dict(QUESTION, question=["no es texto"])],
+            "open_ended": {"question": 42},
+            "comentario": "fuera del esquema"}
+    quiz, status = quiz_json.parse_quiz(json.dumps(data))
+    assert status == 'ok'
+    assert quiz == {"multiple_choice": [QUESTION], "open_ended": {"question": "42", "key_points": []}}
+
+    quiz, status = quiz_json.parse_quiz(json.dumps({"multiple_choice": "nada", "open_ended": []}))
+    assert (quiz, status) == (None, 'schema_error')
+    assert quiz_json.parse_quiz("Lo siento, no puedo generar el JSON.") == (None, 'parse_error')
+
+def test_batch_with_one_malformed_block():
+    blocks = [dict(QUIZ, id=1), {"id": 2, "multiple_choice": [{"question": "¿Sin opciones?"}]}, dict(QUIZ, id=3)]
+    results, status = quiz_json.parse_batch(json.dumps({"blocks": blocks}), 3)
+    assert status == 'ok'
+    assert results == [QUIZ, None, QUIZ]
+
+    # Sin ids se asignan por posición si la cantidad coincide
+    results, _ = quiz_json.parse_batch(json.dumps({"blocks": [QUIZ, QUIZ]}), 2)
+    assert results == [QUIZ, QUIZ]
+    assert quiz_json.parse_batch("sin JSON", 2) == ([None, None], 'parse_error')
+
+def test_large_malformed_output_is_fast():
+    # Antes una expresión regular codiciosa tardaba mucho con texto así
+    nested = "{ \"a\": [" * 20000 + "texto sin cerrar " * 20000 + "}" * 5
+    braces = "Según el texto {ver anexo " * 20000 + json.dumps(QUIZ)[:-40]
+    t0 = time.perf_counter()
+    assert quiz_json.parse_quiz(nested)[0] is None
+    # Tras MAX_RESTARTS llaves sueltas se deja de buscar
+    assert quiz_json.parse_quiz(braces) == (None, 'parse_error')
+    assert time.perf_counter() - t0 < 2.0
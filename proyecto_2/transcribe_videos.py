@@ -1,22 +1,32 @@
 import traceback
 import sys
 import os
-import whisper
-import glob
+import argparse
+import json
+import multiprocessing
+import shutil
+import time
+import audio_segments
+import media_manifest
 from pathlib import Path
-import tkinter as tk
-from tkinter import filedialog, messagebox
 
-def get_input_target():
+# Lista ampliada de extensiones (Video + Audio)
+VALID_EXTENSIONS = media_manifest.MEDIA_EXTENSIONS
+
+def get_input_target(path=None):
     """Obtiene archivo o carpeta de entrada desde argumentos o GUI"""
     # 1. Drag & Drop (Argumentos)
-    if len(sys.argv) > 1:
-        path = sys.argv[1]
+    if path:
         if os.path.exists(path):
             return path
+        # Con una ruta explícita no se abre la GUI (ejecuciones sin pantalla)
+        print(f"No existe: {path}")
+        return None
     
-    # 2. Selección Manual (GUI)
+    # 2. Selección Manual (GUI); tkinter solo se carga aquí
     print("Seleccionando entrada...")
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
     root = tk.Tk()
     root.withdraw() # Ocultar ventana principal
     
@@ -31,47 +41,345 @@ def get_input_target():
     else:
         return filedialog.askopenfilename(title="Selecciona el archivo de audio/video")
 
-def transcribe_videos():
-    target_path = get_input_target()
+def find_media_files(target_path):
+    """
+    Archivo único, o archivos multimedia de la carpeta y sus subcarpetas (una sola
+    pasada con os.scandir).
+
+    Returns:
+        list: [(ruta, tamaño, mtime_ns)]
+    """
+    # Lógica para Archivo Único vs Carpeta
+    if os.path.isfile(target_path):
+        # Caso: Archivo único
+        path_obj = Path(target_path)
+        if path_obj.suffix.lower() not in VALID_EXTENSIONS:
+            print(f"Advertencia: El archivo '{path_obj.name}' tiene una extensión no común ({path_obj.suffix}), pero intentaremos procesarlo.")
+        st = os.stat(target_path)
+        return [(target_path, st.st_size, st.st_mtime_ns)]
+
+    # Caso: Carpeta
+    print(f"Escaneando carpeta: {target_path}")
+    return media_manifest.scan_media(target_path, VALID_EXTENSIONS)
+
+def output_path_for(video_path):
+    """
+    Transcripción '<nombre>.txt' junto al archivo multimedia ('<nombre>.<ext>.txt'
+    si otra grabación de la carpeta tiene el mismo nombre, ver media_manifest.output_base).
+    """
+    return Path(media_manifest.output_base(video_path) + ".txt")
+
+def order_longest_first(files):
+    """
+    Ordena de mayor a menor duración (los archivos largos primero, así no queda uno
+    solo al final con los demás workers ociosos). Sin duración se usa el tamaño.
+
+    Returns:
+        list: [(ruta, duración_segundos | None)]
+    """
+    items = [(f, audio_segments.media_duration(f)) for f in files]
+
+    def sort_key(item):
+        path, duration = item
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        return (duration is not None, duration or 0, size)
+
+    return sorted(items, key=sort_key, reverse=True)
+
+def default_threads_per_worker(workers):
+    """Núcleos repartidos entre los workers para no sobresuscribir la CPU."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def timestamps_path_for(video_path):
+    """Subtítulos '<nombre>.srt' (opcionales) junto al archivo multimedia (ver output_path_for)."""
+    return Path(media_manifest.output_base(video_path) + ".srt")
+
+def transcribe_file(model, video_path, verbose=True, timestamps=False):
+    """
+    Transcribe un archivo y guarda '<nombre>.txt' a su lado (y '<nombre>.srt' si 'timestamps').
+
+    Returns:
+        float: Segundos de audio transcritos (fin del último segmento).
+    """
+    output_path = output_path_for(video_path)
+
+    # Transcribir con progreso visible
+    result = model.transcribe(video_path, verbose=verbose)
+    text = result["text"]
+
+    # Guardar
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(text.strip())
+
+    segments = result.get("segments") or []
+    if timestamps:
+        audio_segments.write_srt(timestamps_path_for(video_path), segments)
+    return segments[-1]["end"] if segments else 0.0
+
+def copy_transcript(source_txt, video_path):
+    """Copia una transcripción existente (y su .srt, si hay) para otra grabación con el mismo contenido."""
+    shutil.copyfile(source_txt, output_path_for(video_path))
+    source_srt = Path(source_txt).with_suffix(".srt")
+    if source_srt.exists():
+        shutil.copyfile(source_srt, timestamps_path_for(video_path))
+
+def select_pending(media, manifest, model_size, prune=True):
+    """
+    Decide qué transcribir usando el manifiesto (hash del contenido + modelo):
+    - se salta si su .txt ya salió de este mismo contenido y modelo (o es previo al manifiesto);
+    - se rehace si el .txt es de una versión anterior de la grabación o de otro modelo;
+    - se copia si el mismo contenido ya se transcribió con otro nombre;
+    - las copias idénticas dentro de la misma tanda se transcriben una sola vez;
+    - las grabaciones con el mismo nombre y otra extensión (clase.mp4, clase.m4a)
+      se avisan y cada una va a su propio .txt (ver output_path_for).
+
+    Returns:
+        tuple: (pendientes, {ruta: hash}, {ruta pendiente: [rutas con el mismo contenido]})
+    """
+    pending, hashes, duplicates, first_by_hash = [], {}, {}, {}
+    for video_path, size, mtime_ns in media:
+        name = Path(video_path).name
+        txt = output_path_for(video_path)
+        same_stem = media_manifest.same_stem_media(video_path)
+        if same_stem and same_stem[0] == name:
+            print(f"{', '.join(same_stem)} tienen el mismo nombre: cada una se transcribe "
+                  f"en su propio '<nombre>.<extensión>.txt'.")
+        try:
+            digest = manifest.media_hash(video_path, size, mtime_ns)
+        except OSError as e:
+            print(f"No se pudo leer {name}: {e}")
+            continue
+        hashes[video_path] = digest
+
+        if txt.exists():
+            source = manifest.output_source(txt)
+            if source is None:
+                # Transcripción anterior al manifiesto: se adopta como está
+                manifest.record(digest, model_size, txt)
+                print(f"Saltando {name} - La transcripción ya existe.")
+                continue
+            if source == (digest, model_size):
+                print(f"Saltando {name} - La transcripción ya existe.")
+                continue
+            reason = "la grabación cambió" if source[0] != digest else f"era del modelo '{source[1]}'"
+            print(f"Transcripción desactualizada de {name} ({reason}); se vuelve a generar.")
+
+        copy_from = manifest.find_transcript(digest, model_size)
+        if copy_from:
+            copy_transcript(copy_from, video_path)
+            manifest.record(digest, model_size, txt, manifest.output_segments(copy_from))
+            print(f"{name}: mismo contenido que {Path(copy_from).name}; se copia su transcripción.")
+            continue
+        if digest in first_by_hash:
+            duplicates.setdefault(first_by_hash[digest], []).append(video_path)
+            print(f"{name}: duplicado de {Path(first_by_hash[digest]).name}; se transcribe una sola vez.")
+            continue
+        first_by_hash[digest] = video_path
+        pending.append(video_path)
+
+    if prune:
+        manifest.prune([path for path, _, _ in media])
+    manifest.save()
+    return pending, hashes, duplicates
+
+def finish_segmented(video_path, plan, timestamps=False):
+    """
+    Une los segmentos de un archivo, guarda el .txt (igual que sin segmentar) y borra los checkpoints.
+
+    Returns:
+        list: Largo de cada segmento en el .txt (para volver a leerlo por segmentos).
+    """
+    text, segments, lengths = audio_segments.stitch(video_path, plan)
+    saved = text.strip()
+    with open(output_path_for(video_path), "w", encoding="utf-8") as f:
+        f.write(saved)
+    if timestamps:
+        audio_segments.write_srt(timestamps_path_for(video_path), segments)
+    audio_segments.clear_checkpoints(video_path)
+    # Bordes de los segmentos en el texto guardado (sin los espacios que quitó strip)
+    lead = len(text) - len(text.lstrip())
+    bounds, end = [], 0
+    for length in lengths:
+        end += length
+        bounds.append(min(max(end - lead, 0), len(saved)))
+    return [b - a for a, b in zip([0] + bounds, bounds)]
+
+def _read_blocks(path, block_size=1024 * 1024, segments=None):
+    """
+    Lee el .txt por bloques; si se conocen los largos de sus segmentos, segmento a
+    segmento (así pipeline.py corta los bloques del examen igual que al transcribir).
+    """
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for length in segments or []:
+            yield f.read(length)
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            yield block
+
+def iter_transcript(video_path, get_model, model_size, manifest, segment_seconds=300, timestamps=False):
+    """
+    Genera el texto de la transcripción segmento a segmento, a medida que Whisper
+    termina cada uno (para pipeline.py). Usa los mismos checkpoints y manifiesto que
+    transcribe_videos: los segmentos ya transcritos se leen del disco, y si el .txt
+    ya está al día (o el mismo contenido se transcribió con otro nombre) se lee
+    directamente sin cargar el modelo. Al final deja el mismo .txt que transcribe_videos.
+
+    Args:
+        get_model (callable): Devuelve el modelo Whisper (se llama solo si hace falta).
+    """
+    st = os.stat(video_path)
+    digest = manifest.media_hash(video_path, st.st_size, st.st_mtime_ns)
+    txt = output_path_for(video_path)
+    source = manifest.output_source(txt) if txt.exists() else False
+    if source is None or source == (digest, model_size):
+        if source is None:
+            manifest.record(digest, model_size, txt)
+            manifest.save()
+        print(f"{Path(video_path).name}: la transcripción ya existe, se usa directamente.")
+        yield from _read_blocks(txt, segments=manifest.output_segments(txt))
+        return
+    copy_from = manifest.find_transcript(digest, model_size)
+    if copy_from:
+        copy_transcript(copy_from, video_path)
+        manifest.record(digest, model_size, txt, manifest.output_segments(copy_from))
+        manifest.save()
+        print(f"{Path(video_path).name}: mismo contenido que {Path(copy_from).name}; se usa su transcripción.")
+        yield from _read_blocks(txt, segments=manifest.output_segments(txt))
+        return
+
+    plan = audio_segments.plan_segments(video_path, segment_seconds, model_size)
+    total = len(plan['segments'])
+    for index in range(total):
+        checkpoint = audio_segments.segment_file(video_path, index)
+        if not checkpoint.exists():
+            audio_seconds = audio_segments.transcribe_segment(get_model(), video_path, plan, index)
+            print(f"\n{Path(video_path).name}: segmento {index + 1}/{total} transcrito "
+                  f"({audio_seconds / 60:.1f} min de audio)")
+        with open(checkpoint, "r", encoding="utf-8") as f:
+            yield json.load(f)['text']
+    lengths = finish_segmented(video_path, plan, timestamps)
+    manifest.record(digest, model_size, txt, lengths)
+    manifest.save()
+
+def run_job(model, job, verbose=None, timestamps=False):
+    """
+    Ejecuta un trabajo (ruta, índice de segmento o None, plan) y devuelve
+    (ruta, índice, segundos de audio, segundos de reloj, error).
+    """
+    video_path, index, plan = job
+    t0 = time.perf_counter()
+    try:
+        if index is None:
+            audio_seconds = transcribe_file(model, video_path, verbose=verbose, timestamps=timestamps)
+        else:
+            audio_seconds = audio_segments.transcribe_segment(model, video_path, plan, index)
+        return video_path, index, audio_seconds, time.perf_counter() - t0, None
+    except Exception as e:
+        return video_path, index, 0.0, time.perf_counter() - t0, f"{e}\n{traceback.format_exc()}"
+
+def load_model(model_size, threads=None):
+    """Carga el modelo Whisper limitando los hilos de torch de este proceso."""
+    # whisper arrastra torch (segundos de importación): solo cuando hay algo que transcribir
+    import whisper
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except Exception:
+            pass
+    return whisper.load_model(model_size)
+
+# --- Pool de workers: cada proceso carga el modelo una sola vez ---
+_worker_model = None
+_worker_error = None
+_worker_timestamps = False
+
+def _init_worker(model_size, threads, timestamps=False):
+    global _worker_model, _worker_error, _worker_timestamps
+    _worker_timestamps = timestamps
+    try:
+        _worker_model = load_model(model_size, threads)
+    except Exception as e:
+        # Si el initializer fallara, el pool reiniciaría el proceso indefinidamente
+        _worker_error = f"Error cargando el modelo: {e}"
+
+def _worker_run(job):
+    if _worker_model is None:
+        return job[0], job[1], 0.0, 0.0, _worker_error
+    return run_job(_worker_model, job, verbose=None, timestamps=_worker_timestamps)
+
+def print_throughput(audio_seconds, wall_seconds, files_done, workers):
+    """Reporte de rendimiento: horas de audio por hora de reloj."""
+    if wall_seconds <= 0:
+        return
+    ratio = audio_seconds / wall_seconds
+    print(f"Rendimiento: {files_done} archivos, {audio_seconds / 3600:.2f} h de audio en "
+          f"{wall_seconds / 3600:.2f} h de reloj -> {ratio:.2f} h de audio por hora "
+          f"({workers} worker{'s' if workers > 1 else ''})")
+
+def plan_jobs(ordered, segment_seconds, model_size):
+    """
+    Trabajos a ejecutar: archivo completo, o un trabajo por segmento pendiente si el
+    archivo dura más de 1,5 segmentos. Los segmentos con checkpoint se saltan (reanudación).
+
+    Returns:
+        tuple: (trabajos [(ruta, índice | None, plan | None)], {ruta: plan})
+    """
+    jobs, plans = [], {}
+    for video_path, duration in ordered:
+        if segment_seconds and duration and duration > segment_seconds * 1.5:
+            try:
+                plan = audio_segments.plan_segments(video_path, segment_seconds, model_size)
+            except Exception as e:
+                print(f"No se pudo segmentar {Path(video_path).name} ({e}); se transcribe completo.")
+                plan = None
+            if plan and len(plan['segments']) > 1:
+                todo = audio_segments.pending_segments(video_path, plan)
+                total = len(plan['segments'])
+                if len(todo) < total:
+                    first = todo[0] + 1 if todo else total
+                    print(f"Retomando {Path(video_path).name}: {total - len(todo)}/{total} segmentos listos, "
+                          f"sigue en el segmento {first}.")
+                plans[video_path] = plan
+                jobs.extend((video_path, i, plan) for i in todo)
+                continue
+        jobs.append((video_path, None, None))
+    return jobs, plans
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe audio/video con Whisper a archivos .txt.")
+    parser.add_argument('path', nargs='?', help="Archivo o carpeta. Si se omite, se abre el selector.")
+    parser.add_argument('--model', default="base", help="Tamaño del modelo Whisper (tiny, base, small, ...).")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Procesos en paralelo; cada uno carga su propio modelo (solo CPU; en GPU usar 1).")
+    parser.add_argument('--threads-per-worker', type=int, default=None,
+                        help="Hilos de torch por worker (por defecto, núcleos / workers).")
+    parser.add_argument('--segment-minutes', type=float, default=10,
+                        help="Dividir grabaciones largas en segmentos de ~N minutos cortados en silencios, "
+                             "con checkpoint por segmento (0 = no segmentar).")
+    parser.add_argument('--timestamps', action='store_true',
+                        help="Guardar también '<nombre>.srt' con marcas de tiempo.")
+    return parser.parse_args(argv)
+
+def transcribe_videos(argv=None):
+    args = parse_args(argv)
+    target_path = get_input_target(args.path)
     
     if not target_path or not os.path.exists(target_path):
         print("No se seleccionó ninguna ruta válida.")
         return
 
-    # Lista ampliada de extensiones (Video + Audio)
-    # Nota: Usamos set para búsqueda rápida y lista para glob
-    valid_extensions = {".mp4", ".mkv", ".avi", ".mov", ".mp3", ".wav", ".m4a", ".flac", ".ogg", ".wma"}
-    model_size = "base"
+    model_size = args.model
     
     # Forzar salida inmediata
     sys.stdout.reconfigure(encoding='utf-8')
 
-    print(f"Cargando modelo Whisper '{model_size}'...")
-    try:
-        model = whisper.load_model(model_size)
-    except Exception as e:
-        print(f"Error cargando el modelo: {e}")
-        traceback.print_exc()
-        return
-
-    files_to_process = []
-
-    # Lógica para Archivo Único vs Carpeta
-    if os.path.isfile(target_path):
-        # Caso: Archivo único
-        path_obj = Path(target_path)
-        if path_obj.suffix.lower() in valid_extensions:
-            files_to_process.append(target_path)
-        else:
-            print(f"Advertencia: El archivo '{path_obj.name}' tiene una extensión no común ({path_obj.suffix}), pero intentaremos procesarlo.")
-            files_to_process.append(target_path)
-    else:
-        # Caso: Carpeta
-        print(f"Escaneando carpeta: {target_path}")
-        for ext in valid_extensions:
-            # glob pattern example: C:/path/*.mp4
-            pattern = os.path.join(target_path, f"*{ext}")
-            files_to_process.extend(glob.glob(pattern))
+    files_to_process = find_media_files(target_path)
 
     if not files_to_process:
         print("No se encontraron archivos multimedia compatibles.")
@@ -79,33 +387,102 @@ def transcribe_videos():
 
     print(f"Se encontraron {len(files_to_process)} archivos para procesar.")
 
-    for video_path in files_to_process:
+    manifest = media_manifest.TranscriptManifest(media_manifest.manifest_root(target_path))
+    # Con un solo archivo no se olvidan los hashes del resto de la carpeta
+    pending, hashes, duplicates = select_pending(files_to_process, manifest, model_size,
+                                                 prune=os.path.isdir(target_path))
+    if not pending:
+        print("Proceso completado.")
+        return
+
+    ordered = order_longest_first(pending)
+    jobs, plans = plan_jobs(ordered, args.segment_minutes * 60, model_size)
+    remaining = {path: 0 for path in plans}
+    for video_path, index, _ in jobs:
+        if index is not None:
+            remaining[video_path] += 1
+
+    workers = max(1, min(args.workers, len(jobs) or 1))
+    threads = args.threads_per_worker or default_threads_per_worker(workers)
+    audio_total = 0.0
+    done = 0
+    t0 = time.perf_counter()
+
+    def completed(video_path, lengths=None):
+        """Registra la transcripción en el manifiesto y la copia a los duplicados."""
+        digest = hashes[video_path]
+        manifest.record(digest, model_size, output_path_for(video_path), lengths)
+        for duplicate in duplicates.get(video_path, []):
+            try:
+                copy_transcript(output_path_for(video_path), duplicate)
+                manifest.record(digest, model_size, output_path_for(duplicate), lengths)
+                print(f"Copiado a: {output_path_for(duplicate).name} (mismo contenido)")
+            except OSError as e:
+                print(f"Error copiando la transcripción a {duplicate}: {e}")
+        manifest.save()
+
+    def finish(video_path):
+        nonlocal done
         try:
-            # Construir nombre de archivo de salida
-            path_obj = Path(video_path)
-            output_filename = path_obj.stem + ".txt"
-            output_path = path_obj.parent / output_filename
-            
-            if output_path.exists():
-                print(f"Saltando {path_obj.name} - La transcripción ya existe.")
-                continue
+            lengths = finish_segmented(video_path, plans[video_path], args.timestamps)
+            done += 1
+            print(f"Guardado en: {output_path_for(video_path).name} ({len(plans[video_path]['segments'])} segmentos)")
+            completed(video_path, lengths)
+        except Exception as e:
+            print(f"Error uniendo segmentos de {video_path}: {e}")
+            traceback.print_exc()
+
+    def handle(result):
+        nonlocal audio_total, done
+        video_path, index, audio_seconds, elapsed, error = result
+        name = Path(video_path).name
+        if error:
+            print(f"Error procesando {video_path}: {error}")
+            return
+        audio_total += audio_seconds
+        if index is None:
+            done += 1
+            print(f"Guardado en: {output_path_for(video_path).name} "
+                  f"({audio_seconds / 60:.1f} min de audio en {elapsed / 60:.1f} min)")
+            completed(video_path)
+            return
+        total = len(plans[video_path]['segments'])
+        print(f"{name}: segmento {index + 1}/{total} listo "
+              f"({audio_seconds / 60:.1f} min de audio en {elapsed / 60:.1f} min)")
+        remaining[video_path] -= 1
+        if remaining[video_path] == 0:
+            finish(video_path)
+
+    # Archivos cuyos segmentos ya estaban todos transcritos (se cortó justo antes de unirlos)
+    for video_path, count in remaining.items():
+        if count == 0:
+            finish(video_path)
 
-            print(f"Transcribiendo: {path_obj.name} ...")
-            
-            # Transcribir con progreso visible
-            result = model.transcribe(video_path, verbose=True)
-            text = result["text"]
-            
-            # Guardar
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(text.strip())
-            
-            print(f"Guardado en: {output_filename}")
-            
+    if jobs and workers == 1:
+        print(f"Cargando modelo Whisper '{model_size}'...")
+        try:
+            model = load_model(model_size, args.threads_per_worker)
         except Exception as e:
-            print(f"Error procesando {video_path}: {e}")
+            print(f"Error cargando el modelo: {e}")
             traceback.print_exc()
+            return
+
+        for job in jobs:
+            video_path, index, _ = job
+            if index is None or index == 0 or job is jobs[0]:
+                print(f"Transcribiendo: {Path(video_path).name} ...")
+            # Progreso visible solo para archivos completos (en segmentos los tiempos serían relativos)
+            handle(run_job(model, job, verbose=True if index is None else None, timestamps=args.timestamps))
+    elif jobs:
+        print(f"Cargando modelo Whisper '{model_size}' en {workers} workers ({threads} hilos cada uno)...")
+        # Cola compartida (chunksize=1): cada worker toma el siguiente trabajo al quedar libre;
+        # los segmentos de un archivo largo se reparten entre todos los workers
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(model_size, threads, args.timestamps)) as pool:
+            for result in pool.imap_unordered(_worker_run, jobs, chunksize=1):
+                handle(result)
 
+    print_throughput(audio_total, time.perf_counter() - t0, done, workers)
     print("Proceso completado.")
 
 if __name__ == "__main__":